@@ -0,0 +1,343 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Headless batch export of skin weights, for running on the farm under mayapy.
+
+Each worker process runs its own maya.standalone and exports one scene file at a time, so the throughput scales
+with the number of workers / cores. A summary report is printed and optionally written to json.
+
+usage:
+mayapy batchExportSkinWeights.py rigA.mb rigB.mb -o /jobs/weights -w 8
+mayapy batchExportSkinWeights.py --scene-list rigs.txt -m "*:*_geo" -m "body" -o /jobs/weights --report report.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+## The workers are spawned and re-import this file, so the pluginUtils have to be findable from here.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+## Encoding threads per worker process, the processes are already one per core
+WRITER_THREADS = 1
+
+
+def initializeWorker():
+    """
+    Pool initializer, brings up one standalone Maya per worker process.
+    """
+    import maya.standalone
+
+    maya.standalone.initialize(name="python")
+
+
+def outputPaths(scenes, outDir, fmt):
+    """
+    :param scenes: list of `str` paths to the maya scenes
+    :param outDir: `str` directory for the weight files
+    :param fmt: `str` FORMAT_JSON or FORMAT_BINARY
+    :return: list of `str` path for each scene's weight file, named after the scene. Scenes with the same name
+             from different directories get a _2, _3.. suffix.
+    """
+    from pluginUtils import weightFiles as u_weightFiles
+
+    ext = (
+        u_weightFiles.BINARY_EXTENSIONS[0]
+        if fmt == u_weightFiles.FORMAT_BINARY
+        else ".json"
+    )
+    paths = []
+    counts = {}
+    for scenePath in scenes:
+        name = os.path.splitext(os.path.basename(scenePath))[0]
+        counts[name] = counts.get(name, 0) + 1
+        if counts[name] > 1:
+            name = "{}_{}".format(name, counts[name])
+        paths.append(os.path.join(outDir, name + ext))
+
+    return paths
+
+
+def findSkinnedGeo(meshPatterns):
+    """
+    :param meshPatterns: list of `str` maya ls patterns for the geo transforms
+    :return: `MSelectionList` of the matching geo that has a skinCluster
+    """
+    import maya.api.OpenMaya as om2
+    import maya.cmds as cmds
+
+    from pluginUtils import skinCluster as u_skinCluster
+
+    ## Only the transforms with a mesh / curve under them, not every rig control
+    transforms = cmds.ls(meshPatterns, type="transform", long=True) or []
+    shapes = []
+    if transforms:
+        shapes = cmds.listRelatives(
+            transforms,
+            shapes=True,
+            noIntermediate=True,
+            type=("mesh", "nurbsCurve"),
+            fullPath=True,
+        ) or []
+    geoTransforms = set()
+    if shapes:
+        geoTransforms.update(
+            cmds.listRelatives(shapes, parent=True, fullPath=True) or []
+        )
+
+    candidates = om2.MSelectionList()
+    for geoName in transforms:
+        if geoName in geoTransforms:
+            candidates.add(geoName)
+
+    geo = om2.MSelectionList()
+    for geoName, skinClusters in u_skinCluster.findSkinClusters(candidates).items():
+        if skinClusters:
+            geo.add(geoName)
+
+    return geo
+
+
+def exportScene(task):
+    """
+    Runs in a worker. Opens the scene and streams the weights of the matching geo to the weight file.
+
+    :param task: `dict` with index, scene, output, meshPatterns, format, compression, quantize, skipZeroWeights
+    :return: `dict` report entry for the scene
+    """
+    start = time.time()
+    result = {
+        "index": task["index"],
+        "scene": task["scene"],
+        "status": STATUS_FAILED,
+        "output": None,
+        "geo": 0,
+        "skinClusters": 0,
+        "vertices": 0,
+        "seconds": 0.0,
+        "error": None,
+    }
+    try:
+        import maya.cmds as cmds
+
+        from pluginUtils import skinCluster as u_skinCluster
+        from pluginUtils import weightFiles as u_weightFiles
+
+        cmds.file(task["scene"], open=True, force=True, prompt=False)
+        geo = findSkinnedGeo(task["meshPatterns"])
+        result["geo"] = geo.length()
+        if not geo.length():
+            result["status"] = STATUS_SKIPPED
+            result["error"] = "No skinned geo matching {}".format(task["meshPatterns"])
+            return result
+
+        filepath = task["output"]
+        with u_weightFiles.openWriter(
+            filepath,
+            fmt=task["format"],
+            compression=task["compression"],
+            quantize=task["quantize"],
+            workers=WRITER_THREADS,
+        ) as writer:
+            for chunks in u_skinCluster.iterSkinWeightData(
+                geo=geo, skipZeroWeights=task["skipZeroWeights"], chunkRows=u_weightFiles.CHUNK_ROWS
+            ):
+                counted = _countRows(chunks, result)
+                writer.writeRecord(counted)
+                result["skinClusters"] += 1
+
+        result["output"] = filepath
+        result["status"] = STATUS_OK
+    except Exception:
+        result["error"] = traceback.format_exc()
+    finally:
+        result["seconds"] = time.time() - start
+        try:
+            import maya.cmds as cmds
+
+            from pluginUtils import skinCluster as u_skinCluster
+
+            u_skinCluster.clearSkinClusterInfoCache()
+            cmds.file(new=True, force=True)
+        except Exception:
+            pass
+
+    return result
+
+
+def _countRows(chunks, result):
+    for skData in chunks:
+        result["vertices"] += len(skData)
+        yield skData
+
+
+def readSceneList(filepath):
+    """
+    :param filepath: `str` text file with a scene path per line. Blank lines and # comments are skipped.
+    :return: list of `str`
+    """
+    with open(filepath) as infile:
+        lines = [line.strip() for line in infile]
+
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def runBatch(
+    scenes,
+    outDir,
+    meshPatterns=None,
+    workers=None,
+    fmt=None,
+    compression=None,
+    quantize=False,
+    skipZeroWeights=True,
+):
+    """
+    :param scenes: list of `str` scene paths
+    :param outDir: `str` directory for the weight files, one per scene
+    :param meshPatterns: list of `str` maya ls patterns for the geo. None for all the skinned geo.
+    :param workers: `int` number of worker processes. None for one per core.
+    :return: `dict` summary report
+    """
+    from pluginUtils import weightFiles as u_weightFiles
+
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+
+    fmt = fmt or u_weightFiles.FORMAT_BINARY
+    tasks = [
+        {
+            "index": x,
+            "scene": scene,
+            "output": output,
+            "meshPatterns": meshPatterns or ["*"],
+            "format": fmt,
+            "compression": compression,
+            "quantize": quantize,
+            "skipZeroWeights": skipZeroWeights,
+        }
+        for x, (scene, output) in enumerate(zip(scenes, outputPaths(scenes, outDir, fmt)))
+    ]
+    workers = min(workers or multiprocessing.cpu_count(), max(len(tasks), 1))
+
+    start = time.time()
+    results = []
+    ## spawn so each worker gets a clean interpreter for its standalone Maya, fork isn't safe with Maya.
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(processes=workers, initializer=initializeWorker)
+    try:
+        for result in pool.imap_unordered(exportScene, tasks):
+            logger.info(
+                "{status}: {scene} in {seconds:.2f} secs".format(**result)
+            )
+            results.append(result)
+    finally:
+        pool.close()
+        pool.join()
+
+    results.sort(key=lambda r: r["index"])
+    elapsed = time.time() - start
+
+    return {
+        "workers": workers,
+        "seconds": elapsed,
+        "scenes": len(results),
+        "ok": len([r for r in results if r["status"] == STATUS_OK]),
+        "skipped": len([r for r in results if r["status"] == STATUS_SKIPPED]),
+        "failed": len([r for r in results if r["status"] == STATUS_FAILED]),
+        "vertices": sum(r["vertices"] for r in results),
+        "scenesPerMinute": 60.0 * len(results) / elapsed if elapsed else 0.0,
+        "results": results,
+    }
+
+
+def formatReport(report):
+    """
+    :param report: `dict` from runBatch()
+    :return: `str` human readable summary
+    """
+    lines = []
+    for result in report["results"]:
+        lines.append(
+            "{status:8} {seconds:8.2f}s {skinClusters:5} skCls {vertices:10} verts  {scene}".format(
+                **result
+            )
+        )
+        if result["status"] != STATUS_OK and result["error"]:
+            lines.append("         {}".format(result["error"].strip().splitlines()[-1]))
+
+    lines.append(
+        "{scenes} scenes, {ok} ok, {skipped} skipped, {failed} failed on {workers} workers in {seconds:.2f} secs "
+        "({scenesPerMinute:.1f} scenes/min, {vertices} verts)".format(**report)
+    )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export skin weights from maya scenes with a pool of standalone Maya workers."
+    )
+    parser.add_argument("scenes", nargs="*", help="Maya scene files to export.")
+    parser.add_argument("--scene-list", help="Text file with a scene path per line.")
+    parser.add_argument("-o", "--out-dir", required=True, help="Directory for the weight files.")
+    parser.add_argument(
+        "-m",
+        "--meshes",
+        action="append",
+        help="ls pattern for the geo transforms, can be used more than once. Defaults to all skinned geo.",
+    )
+    parser.add_argument("-w", "--workers", type=int, help="Worker processes, defaults to one per core.")
+    parser.add_argument("--format", choices=["json", "binary"], default="binary")
+    parser.add_argument("--compression", help="zlib, lz4 or zstd. Binary only.")
+    parser.add_argument("--quantize", action="store_true", help="uint16 weights. Binary only.")
+    parser.add_argument("--keep-zero-weights", action="store_true", help="Store the 0.0 weights too.")
+    parser.add_argument("--report", help="Write the summary report to this json file.")
+    args = parser.parse_args(argv)
+
+    scenes = list(args.scenes)
+    if args.scene_list:
+        scenes.extend(readSceneList(args.scene_list))
+    if not scenes:
+        parser.error("No scenes to export!")
+
+    from pluginUtils import weightFiles as u_weightFiles
+
+    if args.compression and args.compression not in u_weightFiles.availableCompression():
+        parser.error(
+            "Compression {} is not available! Use one of {}".format(
+                args.compression, u_weightFiles.availableCompression()
+            )
+        )
+    if (args.compression or args.quantize) and args.format != u_weightFiles.FORMAT_BINARY:
+        parser.error("Compression and quantizing are only supported for binary files!")
+
+    report = runBatch(
+        scenes,
+        args.out_dir,
+        meshPatterns=args.meshes,
+        workers=args.workers,
+        fmt=args.format,
+        compression=args.compression,
+        quantize=args.quantize,
+        skipZeroWeights=not args.keep_zero_weights,
+    )
+    print(formatReport(report))
+    if args.report:
+        with open(args.report, "w") as outfile:
+            json.dump(report, outfile, indent=2)
+
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,507 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Save / load / transfer benchmarks that run on a plain python install, no Maya needed.
+
+The commands run against the in-process stand-in for maya.api.OpenMaya / maya.cmds in benchmarks/standin, on a
+synthetic rig from syntheticRig.py. Each case is timed on its own (best of --repeat) and then run once more under
+tracemalloc for the peak python memory, so the timings aren't slowed down by the tracing.
+
+The stand-in keeps the weights in python dicts, so the numbers are for comparing the plugin code between commits
+and between serializers / code paths, not for predicting the times in Maya.
+
+usage:
+python benchmarks/runBenchmarks.py
+python benchmarks/runBenchmarks.py --vertices 50000 --influences 120 --meshes 8 --json results.json
+python benchmarks/runBenchmarks.py -k load -k binary --repeat 5
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+## The stand-in goes first so a real Maya on the path isn't picked up instead.
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "standin"))
+
+import maya.api.OpenMaya as om2  # noqa: E402
+import maya.cmds as cmds  # noqa: E402
+
+import loadSkinWeights  # noqa: E402
+import saveSkinWeights  # noqa: E402
+import skinTo  # noqa: E402
+import syntheticRig  # noqa: E402
+from pluginUtils import plugs as u_plugs  # noqa: E402
+from pluginUtils import skinCluster as u_skinCluster  # noqa: E402
+from pluginUtils import weightFiles as u_weightFiles  # noqa: E402
+
+## name: (file extension, save flags)
+SERIALIZERS = [
+    ("json", (".json", {})),
+    ("binary", (".skwb", {})),
+    ("binary-zlib", (".skwb", {"cmp": "zlib"})),
+    ("binary-quantized", (".skwb", {"qt": True})),
+]
+
+
+class Case(object):
+    def __init__(self, group, name, run, setup=None, vertices=0, output=None):
+        """
+        :param group: `str` save, load, transfer or plugs
+        :param name: `str`
+        :param run: callable, the part that is timed
+        :param setup: callable run before each timed run, not timed
+        :param vertices: `int` vertices handled by a run, for the throughput
+        :param output: `str` file written by the run, its size is reported
+        """
+        self.group = group
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.vertices = vertices
+        self.output = output
+
+
+def _copyWeights(weights):
+    return dict((vertexId, dict(row)) for vertexId, row in weights.items())
+
+
+class Benchmarks(object):
+    def __init__(self, vertices, influences, meshes, influencesPerVertex, workDir):
+        self.vertices = vertices
+        self.influences = influences
+        self.meshes = meshes
+        self.influencesPerVertex = influencesPerVertex
+        self.workDir = workDir
+        self.geoNames = syntheticRig.buildRig(
+            vertices=vertices,
+            influences=influences,
+            meshes=meshes,
+            influencesPerVertex=influencesPerVertex,
+        )
+        self.savedWeights = self.snapshotWeights()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Scene state
+    def snapshotWeights(self):
+        return dict(
+            (name, _copyWeights(om2._SCENE.nodes["{}_skCls".format(name)].weights))
+            for name in self.geoNames
+        )
+
+    def restoreWeights(self):
+        for name, weights in self.savedWeights.items():
+            om2._SCENE.nodes["{}_skCls".format(name)].weights = _copyWeights(weights)
+        u_skinCluster.clearSkinClusterInfoCache()
+
+    def scrambleWeights(self):
+        syntheticRig.scrambleWeights(self.geoNames)
+        u_skinCluster.clearSkinClusterInfoCache()
+
+    def path(self, name, ext):
+        return os.path.join(self.workDir, name + ext)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Runs
+    def save(self, filepath, **flags):
+        flags["fp"] = filepath
+        cmds.select(self.geoNames)
+        saveSkinWeights.SaveSkinWeights().doIt(om2.MArgList(flags))
+
+    def load(self, filepath, selection=None, **flags):
+        flags["fp"] = filepath
+        cmds.select(selection or self.geoNames)
+        loadSkinWeights.LoadSkinWeights().doIt(om2.MArgList(flags))
+
+    def selectedVerts(self):
+        count = max(self.vertices // 10, 1)
+        return ["{}.vtx[0:{}]".format(name, count - 1) for name in self.geoNames], count * len(self.geoNames)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Cases
+    def cases(self):
+        total = self.vertices * len(self.geoNames)
+        cases = []
+        for serializer, (ext, flags) in SERIALIZERS:
+            filepath = self.path(serializer, ext)
+            cases.append(
+                Case(
+                    "save",
+                    serializer,
+                    lambda f=filepath, k=flags: self.save(f, **k),
+                    setup=self.restoreWeights,
+                    vertices=total,
+                    output=filepath,
+                )
+            )
+            inlinePath = self.path(serializer + "_inline", ext)
+            cases.append(
+                Case(
+                    "save",
+                    serializer + " th=0",
+                    setup=self.restoreWeights,
+                    run=lambda f=inlinePath, k=flags: self.save(f, th=0, **k),
+                    vertices=total,
+                    output=inlinePath,
+                )
+            )
+            streamPath = self.path(serializer + "_stream", ext)
+            cases.append(
+                Case(
+                    "save",
+                    serializer + " st=True",
+                    setup=self.restoreWeights,
+                    run=lambda f=streamPath, k=flags: self.save(f, st=True, **k),
+                    vertices=total,
+                    output=streamPath,
+                )
+            )
+
+        basePath = self.path("binary", ".skwb")
+        ## One changed mesh against the base file
+        patchPath = self.path("patch", ".skwb")
+        cases.append(
+            Case(
+                "save",
+                "binary rf=patch",
+                lambda: self.save(patchPath, rf=basePath),
+                setup=self.changeOneMesh,
+                vertices=total,
+                output=patchPath,
+            )
+        )
+        updatePath = self.path("update", ".skwb")
+        cases.append(
+            Case(
+                "save",
+                "binary su=True",
+                lambda: self.save(updatePath, su=True),
+                setup=lambda: self.prepareUpdate(basePath, updatePath),
+                vertices=total,
+                output=updatePath,
+            )
+        )
+        ## The timings include tracemalloc measuring the peak, as they would in use
+        budgetPath = self.path("budget", ".skwb")
+        cases.append(
+            Case(
+                "save",
+                "binary mb=8",
+                lambda: self.save(budgetPath, mb=8),
+                setup=self.restoreWeights,
+                vertices=total,
+                output=budgetPath,
+            )
+        )
+
+        svSelection, svCount = self.selectedVerts()
+        for serializer, (ext, flags) in SERIALIZERS:
+            filepath = self.path(serializer, ext)
+            cases.append(
+                Case("load", serializer, lambda f=filepath: self.load(f), setup=self.scrambleWeights, vertices=total)
+            )
+            cases.append(
+                Case(
+                    "load",
+                    serializer + " th=0 pf=0",
+                    lambda f=filepath: self.load(f, th=0, pf=0),
+                    setup=self.scrambleWeights,
+                    vertices=total,
+                )
+            )
+            cases.append(
+                Case(
+                    "load",
+                    serializer + " sv=True",
+                    lambda f=filepath: self.load(f, selection=svSelection, sv=True),
+                    setup=self.scrambleWeights,
+                    vertices=svCount,
+                )
+            )
+
+        cases.append(
+            Case("load", "binary nc=True", lambda: self.load(basePath, nc=True), setup=self.scrambleWeights, vertices=total)
+        )
+        cases.append(
+            Case(
+                "load",
+                "binary pr=True mi=2",
+                lambda: self.load(basePath, pr=True, mi=2),
+                setup=self.scrambleWeights,
+                vertices=total,
+            )
+        )
+        cases.append(
+            Case("load", "binary su=True", lambda: self.load(basePath, su=True), setup=self.restoreWeights, vertices=total)
+        )
+        cases.append(
+            Case("load", "binary rf=patch", lambda: self.load(patchPath), setup=self.scrambleWeights, vertices=total)
+        )
+        cases.append(
+            Case("load", "binary mb=8", lambda: self.load(basePath, mb=8), setup=self.scrambleWeights, vertices=total)
+        )
+        cases.append(
+            Case(
+                "load",
+                "binary mb=8 nu=True",
+                lambda: self.load(basePath, mb=8, nu=True),
+                setup=self.scrambleWeights,
+                vertices=total,
+            )
+        )
+
+        cases.append(
+            Case("transfer", "skinTo", self.transfer, setup=self.prepareTransfer, vertices=self.vertices)
+        )
+
+        plugRows = min(self.vertices, 2000)
+        cases.append(
+            Case("plugs", "read weightList", lambda: self.readPlugs(plugRows), setup=self.restoreWeights, vertices=plugRows)
+        )
+        cases.append(
+            Case(
+                "plugs",
+                "read weightList getMPlugValues",
+                lambda: self.readPlugs(plugRows, bulk=True),
+                setup=self.restoreWeights,
+                vertices=plugRows,
+            )
+        )
+        cases.append(
+            Case("plugs", "fetchIndexedPlugData", lambda: self.plugData(plugRows), setup=self.restoreWeights, vertices=plugRows)
+        )
+        ## Each plug path fetched twice, the second is from the cache
+        cases.append(
+            Case(
+                "plugs",
+                "fetchMPlugFromConnectionData",
+                lambda: self.plugPaths(plugRows),
+                setup=self.restoreWeights,
+                vertices=plugRows * 2,
+            )
+        )
+        cases.append(
+            Case("plugs", "fetchSkinWeights", self.fetchWeights, setup=self.restoreWeights, vertices=total)
+        )
+        ## Before / after for the bulk getWeights read, the same skinClusters walked one weightList plug at a time
+        cases.append(
+            Case(
+                "plugs",
+                "fetchSkinWeights from plugs",
+                lambda: self.fetchWeights(plugs=True),
+                setup=self.restoreWeights,
+                vertices=total,
+            )
+        )
+
+        return cases
+
+    def changeOneMesh(self):
+        self.restoreWeights()
+        weights = om2._SCENE.nodes["{}_skCls".format(self.geoNames[0])].weights
+        for vertexId in range(0, self.vertices, 97):
+            weights[vertexId] = {0: 1.0}
+
+    def prepareUpdate(self, basePath, updatePath):
+        self.changeOneMesh()
+        shutil.copyfile(basePath, updatePath)
+
+    def prepareTransfer(self):
+        self.restoreWeights()
+        if cmds.objExists("xfer_skCls"):
+            cmds.delete("xfer_skCls")
+        if not cmds.objExists("xfer"):
+            syntheticRig.makeMesh("xfer", self.vertices)
+
+    def transfer(self):
+        cmds.select([self.geoNames[0], "xfer"])
+        skinTo.SkinTo().doIt(om2.MArgList())
+
+    def readPlugs(self, rows, bulk=False):
+        sel = om2.MSelectionList()
+        sel.add("{}_skCls".format(self.geoNames[0]))
+        weightList = u_plugs.findPlugOnNode(om2.MObjectHandle(sel.getDependNode(0)), "weightList")
+        for vertexId in range(rows):
+            weights = weightList.elementByLogicalIndex(vertexId).child(0)
+            if bulk:
+                u_plugs.getMPlugValues(
+                    [weights.elementByLogicalIndex(i) for i in weights.getExistingArrayAttributeIndices()]
+                )
+                continue
+
+            for logicalIndex in weights.getExistingArrayAttributeIndices():
+                u_plugs.getMPlugValue(weights.elementByLogicalIndex(logicalIndex))
+
+    def plugData(self, rows):
+        sel = om2.MSelectionList()
+        sel.add("{}_skCls".format(self.geoNames[0]))
+        weightList = u_plugs.findPlugOnNode(om2.MObjectHandle(sel.getDependNode(0)), "weightList")
+        for vertexId in range(rows):
+            weights = weightList.elementByLogicalIndex(vertexId).child(0)
+            u_plugs.fetchIndexedPlugData(weights.elementByLogicalIndex(0))
+
+    def plugPaths(self, rows):
+        skName = "{}_skCls".format(self.geoNames[0])
+        sel = om2.MSelectionList()
+        sel.add(skName)
+        weightList = u_plugs.findPlugOnNode(om2.MObjectHandle(sel.getDependNode(0)), "weightList")
+        plugData = [u_plugs.fetchIndexedPlugData(weightList.elementByLogicalIndex(v).child(0)) for v in range(rows)]
+        u_plugs.clearPlugPathCache()
+        for _ in range(2):
+            for data in plugData:
+                u_plugs.fetchMPlugFromConnectionData(skName, data)
+
+    def fetchWeights(self, plugs=False):
+        geo = om2.MSelectionList()
+        for name in self.geoNames:
+            geo.add(name)
+        if not plugs:
+            u_skinCluster.fetchSkinWeights(geo=geo)
+            return
+
+        for geoName, skinClusters in u_skinCluster.findSkinClusters(geo).items():
+            for skinClusterMObjH in skinClusters:
+                u_skinCluster._fetchSkinClusterWeightsFromPlugs(
+                    skinClusterMObjH,
+                    geoName,
+                    om2.MFnDependencyNode(skinClusterMObjH.object()).name(),
+                    None,
+                )
+
+
+def runCase(case, repeat, memory):
+    """
+    :return: `dict` result row for the case
+    """
+    best = None
+    for _ in range(repeat):
+        if case.setup is not None:
+            case.setup()
+        start = time.perf_counter()
+        case.run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if memory:
+        if case.setup is not None:
+            case.setup()
+        tracemalloc.start()
+        try:
+            case.run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "group": case.group,
+        "case": case.name,
+        "seconds": best,
+        "vertices": case.vertices,
+        "verticesPerSecond": case.vertices / best if best else 0.0,
+        "peakMB": peak / (1024.0 * 1024.0) if peak is not None else None,
+        "fileMB": (
+            os.path.getsize(case.output) / (1024.0 * 1024.0)
+            if case.output and os.path.isfile(case.output)
+            else None
+        ),
+    }
+
+
+def gitCommit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def formatResults(report):
+    """
+    :param report: `dict` from main()
+    :return: `str` table of the results
+    """
+    lines = [
+        "commit {commit}, {vertices} verts x {meshes} meshes, {influences} influences, "
+        "{influencesPerVertex} per vertex, python {python}".format(**report),
+        "{:9} {:28} {:>10} {:>14} {:>10} {:>10}".format("group", "case", "secs", "verts/sec", "peak MB", "file MB"),
+    ]
+    for result in report["results"]:
+        lines.append(
+            "{:9} {:28} {:>10.4f} {:>14,.0f} {:>10} {:>10}".format(
+                result["group"],
+                result["case"],
+                result["seconds"],
+                result["verticesPerSecond"],
+                "-" if result["peakMB"] is None else "{:.2f}".format(result["peakMB"]),
+                "-" if result["fileMB"] is None else "{:.2f}".format(result["fileMB"]),
+            )
+        )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the skin weight plugins against the Maya stand-in.")
+    parser.add_argument("--vertices", type=int, default=10000, help="Vertices per mesh.")
+    parser.add_argument("--influences", type=int, default=60, help="Joints every mesh is bound to.")
+    parser.add_argument("--meshes", type=int, default=4, help="Number of skinned meshes.")
+    parser.add_argument("--influences-per-vertex", type=int, default=4, help="Non zero weights per vertex.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case, the best is reported.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run of each case.")
+    parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        help="Only run the cases with this in '{group} {case}'. Can be repeated, they all have to match.",
+    )
+    parser.add_argument("--json", help="Write the results to this json file.")
+    args = parser.parse_args(argv)
+
+    workDir = tempfile.mkdtemp(prefix="skinWeightBenchmarks")
+    try:
+        benchmarks = Benchmarks(
+            args.vertices, args.influences, args.meshes, args.influences_per_vertex, workDir
+        )
+        results = []
+        for case in benchmarks.cases():
+            if not args.filter or all(f in "{} {}".format(case.group, case.name) for f in args.filter):
+                results.append(runCase(case, max(args.repeat, 1), not args.no_memory))
+            elif case.group == "save":
+                ## The load cases read the files the save cases write, so those always run, just not timed.
+                if case.setup is not None:
+                    case.setup()
+                case.run()
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    report = {
+        "commit": gitCommit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "compression": u_weightFiles.availableCompression(),
+        "vertices": args.vertices,
+        "influences": args.influences,
+        "meshes": args.meshes,
+        "influencesPerVertex": args.influences_per_vertex,
+        "results": results,
+    }
+    print(formatResults(report))
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump(report, outfile, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
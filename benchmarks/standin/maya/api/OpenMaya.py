@@ -0,0 +1,1130 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+In-process stand-in for the subset of maya.api.OpenMaya the plugins use, so the benchmarks run without Maya.
+
+The scene is a plain python model, skinClusters keep their weights as {vertexId: {logicalIndex: weight}}.
+"""
+import re
+from collections import OrderedDict
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Constants
+class MFn(object):
+    kInvalid = 0
+    kTransform = 110
+    kJoint = 121
+    kMesh = 296
+    kNurbsCurve = 267
+    kSkinClusterFilter = 682
+    kDagPose = 677
+    kMeshVertComponent = 550
+    kCurveCVComponent = 536
+    kSingleIndexedComponent = 541
+    kComponent = 531
+    kNumericAttribute = 566
+    kMatrixAttribute = 575
+    kTypedAttribute = 574
+    kCompoundAttribute = 571
+    kMessageAttribute = 573
+    kEnumAttribute = 572
+    kGenericAttribute = 576
+    kAttribute3Double = 560
+    kAttribute3Float = 561
+    kDoubleLinearAttribute = 563
+    kFloatLinearAttribute = 564
+    kDoubleAngleAttribute = 565
+    kFloatAngleAttribute = 567
+    kDependencyNode = 4
+    kDagNode = 107
+    kGeometryFilt = 340
+    kGroupParts = 348
+
+    _HIERARCHY = {
+        kSkinClusterFilter: (kSkinClusterFilter, kGeometryFilt, kDependencyNode),
+        kMesh: (kMesh, kDagNode, kDependencyNode),
+        kNurbsCurve: (kNurbsCurve, kDagNode, kDependencyNode),
+        kTransform: (kTransform, kDagNode, kDependencyNode),
+        kJoint: (kJoint, kTransform, kDagNode, kDependencyNode),
+    }
+
+
+class MFnNumericData(object):
+    kBoolean = 1
+    kByte = 2
+    kShort = 4
+    kInt = 7
+    kLong = 7
+    kFloat = 11
+    kDouble = 12
+    kAddr = 14
+
+
+class MFnData(object):
+    kString = 4
+    kMatrix = 5
+
+
+class MDoubleArray(list):
+    pass
+
+
+class MIntArray(list):
+    pass
+
+
+class MDagPathArray(list):
+    pass
+
+
+class MObjectArray(list):
+    pass
+
+
+class MMatrix(object):
+    def __init__(self, values=None):
+        self.values = list(values or [1.0, 0, 0, 0, 0, 1.0, 0, 0, 0, 0, 1.0, 0, 0, 0, 0, 1.0])
+
+
+class MDistance(object):
+    def __init__(self, value):
+        self._value = value
+
+    def asCentimeters(self):
+        return self._value
+
+
+class MAngle(object):
+    def __init__(self, value):
+        self._value = value
+
+    def asDegrees(self):
+        return self._value
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Scene model
+class _Attr(object):
+    def __init__(self, name, apiType, isArray=False, children=None, numericType=None, dataType=None):
+        self.name = name
+        self.apiType = apiType
+        self.isArray = isArray
+        self.children = children or []
+        self.numericType = numericType
+        self.dataType = dataType
+
+
+def _numeric(name, numericType=MFnNumericData.kFloat, isArray=False):
+    return _Attr(name, MFn.kNumericAttribute, isArray=isArray, numericType=numericType)
+
+
+def _matrix(name, isArray=False):
+    return _Attr(name, MFn.kMatrixAttribute, isArray=isArray)
+
+
+_NODE_ATTRS = {
+    MFn.kSkinClusterFilter: [
+        _Attr("weightList", MFn.kCompoundAttribute, isArray=True,
+              children=[_numeric("weights", isArray=True)]),
+        _matrix("matrix", isArray=True),
+        _matrix("bindPreMatrix", isArray=True),
+        _Attr("bindPose", MFn.kMessageAttribute),
+        _numeric("maxInfluences", MFnNumericData.kInt),
+        _Attr("normalizeWeights", MFn.kEnumAttribute),
+        _Attr("outputGeometry", MFn.kGenericAttribute, isArray=True),
+        _Attr("input", MFn.kCompoundAttribute, isArray=True, children=[
+            _Attr("inputGeometry", MFn.kGenericAttribute),
+            _numeric("groupId", MFnNumericData.kInt),
+        ]),
+    ],
+    MFn.kMesh: [_Attr("inMesh", MFn.kTypedAttribute), _Attr("outMesh", MFn.kTypedAttribute)],
+    MFn.kNurbsCurve: [_Attr("create", MFn.kTypedAttribute), _Attr("local", MFn.kTypedAttribute)],
+    MFn.kJoint: [
+        _matrix("worldMatrix", isArray=True),
+        _matrix("worldInverseMatrix", isArray=True),
+        _Attr("translate", MFn.kAttribute3Double, children=[
+            _Attr("translateX", MFn.kDoubleLinearAttribute),
+            _Attr("translateY", MFn.kDoubleLinearAttribute),
+            _Attr("translateZ", MFn.kDoubleLinearAttribute),
+        ]),
+        _numeric("visibility", MFnNumericData.kBoolean),
+        _Attr("message", MFn.kMessageAttribute),
+    ],
+    MFn.kTransform: [
+        _Attr("translate", MFn.kAttribute3Double, children=[
+            _Attr("translateX", MFn.kDoubleLinearAttribute),
+            _Attr("translateY", MFn.kDoubleLinearAttribute),
+            _Attr("translateZ", MFn.kDoubleLinearAttribute),
+        ]),
+        _numeric("visibility", MFnNumericData.kBoolean),
+        _Attr("message", MFn.kMessageAttribute),
+    ],
+    MFn.kDagPose: [_Attr("message", MFn.kMessageAttribute)],
+}
+
+
+class _Node(object):
+    def __init__(self, name, apiType, parent=None):
+        self.name = name
+        self.apiType = apiType
+        self.parent = parent
+        self.children = []
+        self.alive = True
+        self.values = {}
+        self.attrs = OrderedDict((a.name, a) for a in _NODE_ATTRS.get(apiType, []))
+        if parent is not None:
+            parent.children.append(self)
+
+        # skinCluster storage
+        self.weights = {}
+        self.matrix = {}
+        self.maxInfluences = 4
+        self.shape = None
+        # deformer feeding this one's input[0].inputGeometry, for stacked deformers
+        self.upstream = None
+
+    def attrSpec(self, path):
+        attr = self.attrs.get(path[0][0])
+        for name, _ in path[1:]:
+            attr = dict((c.name, c) for c in attr.children)[name]
+
+        return attr
+
+    def existingIndices(self, path):
+        names = tuple(p[0] for p in path)
+        if names == ("weightList",):
+            return sorted(self.weights)
+        if names == ("weightList", "weights"):
+            return sorted(self.weights.get(path[0][1], {}))
+        if names == ("matrix",):
+            return sorted(self.matrix)
+        if names == ("worldMatrix",) or names == ("worldInverseMatrix",) or names == ("outputGeometry",):
+            return [0]
+        if names == ("bindPreMatrix",):
+            return sorted(self.matrix)
+        return sorted(set(k[-1][1] for k in self.values if k[:-1] == path[:-1] and k[-1][0] == path[-1][0]))
+
+    def getValue(self, path):
+        names = tuple(p[0] for p in path)
+        if names == ("weightList", "weights"):
+            return self.weights.get(path[0][1], {}).get(path[1][1], 0.0)
+        if names == ("maxInfluences",):
+            return self.maxInfluences
+        if names in (("worldMatrix",), ("worldInverseMatrix",), ("matrix",), ("bindPreMatrix",)):
+            return MMatrix()
+        return self.values.get(path, 0.0)
+
+    def setValue(self, path, value):
+        names = tuple(p[0] for p in path)
+        if names == ("weightList", "weights"):
+            self.weights.setdefault(path[0][1], {})[path[1][1]] = value
+            return
+        if names == ("maxInfluences",):
+            self.maxInfluences = value
+            return
+        self.values[path] = value
+
+    def source(self, path):
+        names = tuple(p[0] for p in path)
+        if names == ("matrix",):
+            joint = self.matrix.get(path[0][1])
+            if joint is None:
+                return MPlug()
+            return MPlug._make(joint, (("worldMatrix", 0),))
+        if names == ("inMesh",) or names == ("create",):
+            sk = _SCENE.deformerFor.get(self)
+            if sk is None:
+                return MPlug()
+            return MPlug._make(sk, (("outputGeometry", 0),))
+        if names == ("input", "inputGeometry"):
+            if self.upstream is None:
+                return MPlug()
+            return MPlug._make(self.upstream, (("outputGeometry", 0),))
+        if names == ("bindPose",):
+            pose = _SCENE.nodes.get(self.name + "_bindPose")
+            if pose is None:
+                return MPlug()
+            return MPlug._make(pose, (("message", None),))
+        return MPlug()
+
+    def destinations(self):
+        """Downstream nodes."""
+        if self.apiType == MFn.kSkinClusterFilter and self.shape is not None:
+            return [self.shape]
+        if self.apiType == MFn.kJoint:
+            return [sk for sk in _SCENE.nodes.values() if sk.apiType == MFn.kSkinClusterFilter and self in sk.matrix.values()]
+        return []
+
+    def pathName(self):
+        names = []
+        node = self
+        while node is not None:
+            names.insert(0, node.name)
+            node = node.parent
+        return "|" + "|".join(names)
+
+
+class _Scene(object):
+    def __init__(self):
+        self.nodes = OrderedDict()
+        self.deformerFor = {}
+        self.selection = []
+        self.callbacks = {}
+        self.nextCallbackId = 1
+
+    def clear(self):
+        self.__init__()
+
+    def addNode(self, name, apiType, parent=None):
+        node = _Node(name, apiType, parent=parent)
+        self.nodes[name] = node
+        return node
+
+    def find(self, name):
+        name = name.split("|")[-1]
+        node = self.nodes.get(name)
+        if node is None:
+            node = self.nodes.get(name.split(":")[-1])
+        if node is None or not node.alive:
+            raise RuntimeError("(kInvalidParameter): Object does not exist: {}".format(name))
+        return node
+
+    def emit(self, kind, node, *args):
+        for cbId, (cbKind, cbNode, fn, clientData) in list(self.callbacks.items()):
+            if cbKind == kind and (cbNode is None or cbNode is node):
+                fn(*(args + (clientData,)))
+
+
+_SCENE = _Scene()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# MObject and friends
+class MObject(object):
+    kNullObj = None
+
+    def __init__(self, node=None, attr=None, component=None):
+        self._node = node
+        self._attr = attr
+        self._component = component
+
+    def apiType(self):
+        if self._node is not None:
+            return self._node.apiType
+        if self._attr is not None:
+            return self._attr.apiType
+        if self._component is not None:
+            return self._component.componentType
+        return MFn.kInvalid
+
+    def hasFn(self, fn):
+        if self._node is not None:
+            return fn in MFn._HIERARCHY.get(self._node.apiType, (self._node.apiType, MFn.kDependencyNode))
+        if self._component is not None:
+            return fn in (self._component.componentType, MFn.kSingleIndexedComponent, MFn.kComponent)
+        return self.apiType() == fn
+
+    def isNull(self):
+        return self._node is None and self._attr is None and self._component is None
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, MObject)
+            and self._node is other._node
+            and self._attr is other._attr
+            and self._component is other._component
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._node), id(self._attr), id(self._component)))
+
+
+MObject.kNullObj = MObject()
+
+
+class MObjectHandle(object):
+    def __init__(self, mobj=None):
+        self._mobj = mobj if mobj is not None else MObject()
+
+    def isValid(self):
+        return not self._mobj.isNull() and (self._mobj._node is None or self._mobj._node.alive)
+
+    def isAlive(self):
+        return self.isValid()
+
+    def object(self):
+        return self._mobj
+
+    def hashCode(self):
+        target = self._mobj._node if self._mobj._node is not None else self._mobj._attr
+        return id(target) & 0xFFFFFFFF
+
+    def __eq__(self, other):
+        return isinstance(other, MObjectHandle) and self._mobj == other._mobj
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._mobj)
+
+
+class _Component(object):
+    def __init__(self, componentType):
+        self.componentType = componentType
+        self.elements = []
+        self.complete = None
+
+
+class MFnSingleIndexedComponent(object):
+    def __init__(self, mobj=None):
+        self._component = mobj._component if mobj is not None else None
+
+    def create(self, componentType):
+        self._component = _Component(componentType)
+        return MObject(component=self._component)
+
+    def setCompleteData(self, count):
+        self._component.complete = count
+
+    def addElements(self, ids):
+        self._component.elements.extend(int(i) for i in ids)
+
+    def addElement(self, i):
+        self._component.elements.append(int(i))
+
+    def getElements(self):
+        if self._component.complete is not None:
+            return MIntArray(range(self._component.complete))
+        return MIntArray(self._component.elements)
+
+    @property
+    def elementCount(self):
+        return len(self.getElements())
+
+    @property
+    def componentType(self):
+        return self._component.componentType
+
+    def isComplete(self):
+        return self._component.complete is not None
+
+
+class MDagPath(object):
+    def __init__(self, node=None):
+        if isinstance(node, MDagPath):
+            node = node._node
+        self._node = node
+        self._component = None
+
+    @staticmethod
+    def getAPathTo(mobj):
+        return MDagPath(mobj._node)
+
+    def node(self):
+        return MObject(self._node)
+
+    def apiType(self):
+        return self._node.apiType
+
+    def hasFn(self, fn):
+        return self.node().hasFn(fn)
+
+    def numberOfShapesDirectlyBelow(self):
+        return len([c for c in self._node.children if c.apiType in (MFn.kMesh, MFn.kNurbsCurve)])
+
+    def extendToShape(self, index=0):
+        if self._node.apiType not in (MFn.kMesh, MFn.kNurbsCurve):
+            shapes = [c for c in self._node.children if c.apiType in (MFn.kMesh, MFn.kNurbsCurve)]
+            self._node = shapes[index]
+        return self
+
+    def transform(self):
+        node = self._node
+        if node.apiType in (MFn.kMesh, MFn.kNurbsCurve):
+            node = node.parent
+        return MObject(node)
+
+    def fullPathName(self):
+        return self._node.pathName()
+
+    def partialPathName(self):
+        return self._node.name
+
+    def isValid(self):
+        return self._node is not None and self._node.alive
+
+    def __eq__(self, other):
+        return isinstance(other, MDagPath) and self._node is other._node
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class MSelectionList(object):
+    _COMPONENT = re.compile(r"^(?P<node>[^.]+)\.(?P<kind>vtx|cv)\[(?P<start>\d+)(:(?P<end>\d+))?\]$")
+
+    def __init__(self, other=None):
+        self._items = list(other._items) if other is not None else []
+
+    def add(self, item, mergeWithExisting=True):
+        if isinstance(item, tuple):
+            dagPath, component = item
+            self._mergeComponent(dagPath._node, component._component.elements if not component.isNull() else None)
+            return self
+        if isinstance(item, MObject):
+            self._items.append((item._node, None))
+            return self
+        if isinstance(item, MDagPath):
+            self._items.append((item._node, None))
+            return self
+
+        match = self._COMPONENT.match(item)
+        if match:
+            node = _SCENE.find(match.group("node"))
+            start = int(match.group("start"))
+            end = int(match.group("end") or start)
+            self._mergeComponent(node, list(range(start, end + 1)))
+            return self
+
+        self._items.append((_SCENE.find(item), None))
+        return self
+
+    def _mergeComponent(self, node, ids):
+        if node.apiType == MFn.kTransform:
+            node = [c for c in node.children if c.apiType in (MFn.kMesh, MFn.kNurbsCurve)][0]
+        for i, (n, existing) in enumerate(self._items):
+            if n is node and existing is not None and ids is not None:
+                existing.extend(x for x in ids if x not in set(existing))
+                return
+        self._items.append((node, list(ids) if ids is not None else None))
+
+    def length(self):
+        return len(self._items)
+
+    def isEmpty(self):
+        return not self._items
+
+    def clear(self):
+        self._items = []
+
+    def getDependNode(self, index):
+        return MObject(self._items[index][0])
+
+    def getDagPath(self, index):
+        return MDagPath(self._items[index][0])
+
+    def getComponent(self, index):
+        node, ids = self._items[index]
+        if MFn.kDagNode not in MFn._HIERARCHY.get(node.apiType, ()):
+            raise TypeError("item is not a DAG path")
+        if ids is None:
+            return MDagPath(node), MObject()
+        fn = MFnSingleIndexedComponent()
+        comp = fn.create(MFn.kMeshVertComponent if node.apiType == MFn.kMesh else MFn.kCurveCVComponent)
+        fn.addElements(ids)
+        return MDagPath(node), comp
+
+    def getSelectionStrings(self, index=None):
+        items = self._items if index is None else [self._items[index]]
+        result = []
+        for node, ids in items:
+            if ids is None:
+                result.append(node.name)
+            else:
+                result.extend("{}.vtx[{}]".format(node.parent.name, i) for i in ids)
+        return result
+
+
+class MGlobal(object):
+    @staticmethod
+    def getActiveSelectionList():
+        sel = MSelectionList()
+        sel._items = list(_SCENE.selection)
+        return sel
+
+    @staticmethod
+    def displayInfo(msg):
+        pass
+
+    @staticmethod
+    def displayWarning(msg):
+        print("Warning: " + str(msg))
+
+    @staticmethod
+    def displayError(msg):
+        print("Error: " + str(msg))
+
+
+class MNamespace(object):
+    @staticmethod
+    def stripNamespaceFromName(name):
+        return name.split(":")[-1]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Function sets
+class MFnBase(object):
+    def __init__(self, mobj=None):
+        if isinstance(mobj, MDagPath):
+            mobj = mobj.node()
+        self._mobj = mobj
+        self._node = mobj._node if mobj is not None else None
+
+    def object(self):
+        return self._mobj
+
+
+class MFnDependencyNode(MFnBase):
+    def name(self):
+        return self._node.name
+
+    def absoluteName(self):
+        return ":" + self._node.name
+
+    def hasUniqueName(self):
+        return True
+
+    def typeName(self):
+        return {
+            MFn.kSkinClusterFilter: "skinCluster",
+            MFn.kJoint: "joint",
+            MFn.kMesh: "mesh",
+            MFn.kTransform: "transform",
+        }.get(self._node.apiType, "unknown")
+
+    def _findAttr(self, name):
+        stack = list(self._node.attrs.values())
+        while stack:
+            attr = stack.pop(0)
+            if attr.name == name:
+                return attr
+            stack.extend(attr.children)
+
+    def attribute(self, name):
+        attr = self._findAttr(name)
+        if attr is None:
+            return MObject()
+        return MObject(attr=attr)
+
+    def hasAttribute(self, name):
+        return self._findAttr(name) is not None
+
+    def findPlug(self, name, wantNetworkedPlug=False):
+        if isinstance(name, MObject):
+            return MPlug(self._mobj, name)
+        if name not in self._node.attrs:
+            raise RuntimeError("(kInvalidParameter): Cannot find the plug {}".format(name))
+        return MPlug._make(self._node, ((name, None),))
+
+    def setName(self, name):
+        old = self._node.name
+        del _SCENE.nodes[old]
+        self._node.name = name
+        _SCENE.nodes[name] = self._node
+        _SCENE.emit("nameChanged", self._node, MObject(self._node), old)
+        return name
+
+
+class MFnDagNode(MFnDependencyNode):
+    def fullPathName(self):
+        return self._node.pathName()
+
+    def partialPathName(self):
+        return self._node.name
+
+    @property
+    def isIntermediateObject(self):
+        return bool(self._node.values.get("intermediateObject", False))
+
+    def getPath(self):
+        return MDagPath(self._node)
+
+
+class MFnAttribute(MFnBase):
+    @property
+    def name(self):
+        return self._mobj._attr.name
+
+
+class MFnCompoundAttribute(MFnAttribute):
+    def numChildren(self):
+        return len(self._mobj._attr.children)
+
+    def child(self, index):
+        return MObject(attr=self._mobj._attr.children[index])
+
+
+class MFnNumericAttribute(MFnAttribute):
+    def numericType(self):
+        return self._mobj._attr.numericType
+
+
+class MFnTypedAttribute(MFnAttribute):
+    def attrType(self):
+        return self._mobj._attr.dataType
+
+
+class MFnMatrixData(MFnBase):
+    def __init__(self, mobj=None):
+        self._matrix = getattr(mobj, "_matrix", MMatrix())
+
+    def matrix(self):
+        return self._matrix
+
+
+class MItGeometry(object):
+    def __init__(self, dagPath, component=None):
+        node = dagPath._node
+        if node.apiType == MFn.kTransform:
+            node = [c for c in node.children if c.apiType in (MFn.kMesh, MFn.kNurbsCurve)][0]
+        self._count = node.values.get("vertexCount", 0)
+
+    def count(self):
+        return self._count
+
+
+class MFnMesh(MFnDagNode):
+    @property
+    def numVertices(self):
+        return self._node.values.get("vertexCount", 0)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Plugs
+class MPlug(object):
+    def __init__(self, node=None, attribute=None):
+        self._owner = None
+        self._path = ()
+        if isinstance(node, MPlug):
+            self._owner = node._owner
+            self._path = node._path
+        elif node is not None and attribute is not None:
+            self._owner = node._node
+            self._path = ((attribute._attr.name, None),)
+
+    @classmethod
+    def _make(cls, owner, path):
+        plug = cls()
+        plug._owner = owner
+        plug._path = tuple(path)
+        return plug
+
+    @property
+    def isNull(self):
+        return self._owner is None
+
+    def _spec(self):
+        return self._owner.attrSpec(self._path)
+
+    @property
+    def isArray(self):
+        return self._spec().isArray and self._path[-1][1] is None
+
+    @property
+    def isElement(self):
+        return self._path[-1][1] is not None
+
+    @property
+    def isChild(self):
+        return len(self._path) > 1 and self._path[-1][1] is None
+
+    @property
+    def isCompound(self):
+        return bool(self._spec().children)
+
+    @property
+    def isConnected(self):
+        return not self.source().isNull
+
+    def node(self):
+        return MObject(self._owner)
+
+    def attribute(self):
+        return MObject(attr=self._spec())
+
+    def name(self):
+        return "{}.{}".format(self._owner.name, self.partialName())
+
+    def partialName(self, *args):
+        parts = []
+        for name, index in self._path:
+            parts.append(name if index is None else "{}[{}]".format(name, index))
+        return ".".join(parts)
+
+    def logicalIndex(self):
+        return self._path[-1][1]
+
+    def numChildren(self):
+        return len(self._spec().children)
+
+    def child(self, index):
+        if isinstance(index, MObject):
+            child = index._attr
+        else:
+            child = self._spec().children[index]
+        return MPlug._make(self._owner, self._path + ((child.name, None),))
+
+    def parent(self):
+        return MPlug._make(self._owner, self._path[:-1])
+
+    def array(self):
+        return MPlug._make(self._owner, self._path[:-1] + ((self._path[-1][0], None),))
+
+    def elementByLogicalIndex(self, index):
+        return MPlug._make(self._owner, self._path[:-1] + ((self._path[-1][0], int(index)),))
+
+    def elementByPhysicalIndex(self, index):
+        return self.elementByLogicalIndex(self.getExistingArrayAttributeIndices()[index])
+
+    def numElements(self):
+        return len(self.getExistingArrayAttributeIndices())
+
+    def getExistingArrayAttributeIndices(self):
+        return MIntArray(self._owner.existingIndices(self._path))
+
+    def source(self):
+        return self._owner.source(self._path)
+
+    def connectedTo(self, asDst, asSrc):
+        src = self.source()
+        return [src] if asDst and not src.isNull else []
+
+    def asDouble(self):
+        return float(self._owner.getValue(self._path))
+
+    def asFloat(self):
+        return float(self._owner.getValue(self._path))
+
+    def asInt(self):
+        return int(self._owner.getValue(self._path))
+
+    def asBool(self):
+        return bool(self._owner.getValue(self._path))
+
+    def asString(self):
+        return str(self._owner.getValue(self._path))
+
+    def asMObject(self):
+        obj = MObject()
+        obj._matrix = self._owner.getValue(self._path)
+        return obj
+
+    def asMDistance(self):
+        return MDistance(self.asDouble())
+
+    def asMAngle(self):
+        return MAngle(self.asDouble())
+
+    def setFloat(self, value):
+        self._owner.setValue(self._path, float(value))
+
+    def setDouble(self, value):
+        self._owner.setValue(self._path, float(value))
+
+    def setInt(self, value):
+        self._owner.setValue(self._path, int(value))
+
+    def setBool(self, value):
+        self._owner.setValue(self._path, bool(value))
+
+    def setString(self, value):
+        self._owner.setValue(self._path, str(value))
+
+    def setMObject(self, value):
+        self._owner.setValue(self._path, value)
+
+    def __eq__(self, other):
+        return isinstance(other, MPlug) and self._owner is other._owner and self._path == other._path
+
+    def __ne__(self, other):
+        return not self == other
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Graph iteration / modifiers / messages
+class MItDependencyGraph(object):
+    kDownstream = 0
+    kUpstream = 1
+    kNodeLevel = 0
+    kPlugLevel = 1
+    kDepthFirst = 0
+    kBreadthFirst = 1
+
+    def __init__(self, root, direction=0, level=0, *args):
+        self._order = []
+        seen = set()
+        todo = [root._node] if root is not None and root._node is not None else []
+        while todo:
+            node = todo.pop(0)
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            self._order.append(node)
+            todo.extend(node.destinations())
+        self._i = 0
+
+    def isDone(self):
+        return self._i >= len(self._order)
+
+    def currentNode(self):
+        return MObject(self._order[self._i])
+
+    def next(self):
+        self._i += 1
+
+    def prune(self):
+        pass
+
+
+class MDGModifier(object):
+    def __init__(self):
+        self._ops = []
+        self._done = 0
+        self._undo = []
+
+    def newPlugValue(self, plug, value):
+        self._ops.append(("plug", plug, value))
+
+    def commandToExecute(self, command):
+        self._ops.append(("cmd", command, None))
+
+    def doIt(self):
+        import shlex
+        from maya import cmds
+        for kind, target, value in self._ops[self._done:]:
+            if kind == "plug":
+                self._undo.append(("plug", target, target._owner.getValue(target._path)))
+                target._owner.setValue(target._path, value)
+                continue
+            words = shlex.split(target)
+            assert words[0] == "skinCluster"
+            kwargs = {}
+            items = []
+            i = 1
+            while i < len(words):
+                if words[i] in ("-n", "-mi"):
+                    kwargs[words[i][1:]] = words[i + 1] if words[i] == "-n" else int(words[i + 1])
+                    i += 2
+                elif words[i] == "-foc":
+                    kwargs["foc"] = words[i + 1] == "true"
+                    i += 2
+                else:
+                    items.append(words[i].lstrip(":"))
+                    i += 1
+            name = cmds.skinCluster(items, **kwargs)[0]
+            self._undo.append(("cmd", name, None))
+        self._done = len(self._ops)
+
+    def undoIt(self):
+        from maya import cmds
+        for kind, target, value in reversed(self._undo):
+            if kind == "plug":
+                target._owner.setValue(target._path, value)
+            else:
+                cmds.delete(target)
+        self._undo = []
+        self._done = 0
+
+
+class MDagModifier(MDGModifier):
+    pass
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallback(cbId):
+        _SCENE.callbacks.pop(cbId, None)
+
+    @staticmethod
+    def removeCallbacks(ids):
+        for cbId in ids:
+            _SCENE.callbacks.pop(cbId, None)
+
+
+def _addCallback(kind, node, fn, clientData):
+    cbId = _SCENE.nextCallbackId
+    _SCENE.nextCallbackId += 1
+    _SCENE.callbacks[cbId] = (kind, node, fn, clientData)
+    return cbId
+
+
+class MNodeMessage(MMessage):
+    kConnectionMade = 0x01
+    kConnectionBroken = 0x02
+    kAttributeSet = 0x08
+    kAttributeArrayAdded = 0x1000
+    kAttributeArrayRemoved = 0x2000
+
+    @staticmethod
+    def addAttributeChangedCallback(node, fn, clientData=None):
+        return _addCallback("attributeChanged", node._node, fn, clientData)
+
+    @staticmethod
+    def addNodePreRemovalCallback(node, fn, clientData=None):
+        return _addCallback("preRemoval", node._node, fn, clientData)
+
+    @staticmethod
+    def addNodeAboutToDeleteCallback(node, fn, clientData=None):
+        return _addCallback("aboutToDelete", node._node, fn, clientData)
+
+    @staticmethod
+    def addNameChangedCallback(node, fn, clientData=None):
+        return _addCallback("nameChanged", node._node if not node.isNull() else None, fn, clientData)
+
+
+class MDagMessage(MMessage):
+    @staticmethod
+    def addParentAddedCallback(fn, clientData=None):
+        ## Nothing reparents in the stand-in, it's never called
+        return _addCallback("parentAdded", None, fn, clientData)
+
+
+class MDGMessage(MMessage):
+    @staticmethod
+    def addNodeRemovedCallback(fn, nodeType="dependNode", clientData=None):
+        return _addCallback("nodeRemoved", None, fn, clientData)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Command plumbing
+class MArgList(object):
+    def __init__(self, flags=None):
+        """
+        :param flags: `dict` {flag: value} to hand to a command's doIt(), short or long flag names.
+        """
+        self._flags = flags or {}
+
+    def length(self):
+        return len(self._flags)
+
+    def asString(self, index):
+        return str(self._values[index])
+
+    def asInt(self, index):
+        return int(self._values[index])
+
+
+class MSyntax(object):
+    kNoArg = 0
+    kBoolean = 1
+    kLong = 2
+    kDouble = 3
+    kString = 4
+    kUnsigned = 5
+    kSelectionItem = 6
+
+    def __init__(self):
+        self.enableQuery = False
+        self.enableEdit = False
+        self._flags = {}
+        self._multi = set()
+
+    def setMaxObjects(self, n):
+        pass
+
+    def setMinObjects(self, n):
+        pass
+
+    def setObjectType(self, *args):
+        pass
+
+    def useSelectionAsDefault(self, value):
+        pass
+
+    def addFlag(self, short, long, *argTypes):
+        self._flags[short] = long
+        return short
+
+    def makeFlagMultiUse(self, flag):
+        self._multi.add(flag)
+
+
+class MArgParser(object):
+    def __init__(self, syntax, args):
+        self._values = {}
+        longToShort = dict((v, k) for k, v in syntax._flags.items())
+        for key, value in args._flags.items():
+            short = longToShort.get(key, key)
+            if short not in syntax._flags:
+                raise RuntimeError("(kInvalidParameter): Invalid flag {}".format(key))
+            self._values[short] = value
+
+    def isFlagSet(self, flag):
+        return flag in self._values
+
+    def _value(self, flag, index):
+        value = self._values[flag]
+        if isinstance(value, list) and index is not None:
+            return value[0] if not isinstance(value[0], (list, tuple)) else value[0][index]
+        return value
+
+    def flagArgumentString(self, flag, index):
+        return str(self._value(flag, index))
+
+    def flagArgumentBool(self, flag, index):
+        return bool(self._value(flag, index))
+
+    def flagArgumentInt(self, flag, index):
+        return int(self._value(flag, index))
+
+    def flagArgumentDouble(self, flag, index):
+        return float(self._value(flag, index))
+
+    def numberOfFlagUses(self, flag):
+        value = self._values.get(flag)
+        if value is None:
+            return 0
+        return len(value) if isinstance(value, list) else 1
+
+    def getFlagArgumentList(self, flag, index):
+        value = self._values[flag]
+        values = value if isinstance(value, list) else [value]
+        argList = MArgList()
+        argList._values = [values[index]]
+        return argList
+
+
+class MPxCommand(object):
+    _messages = []
+
+    def __init__(self):
+        pass
+
+    def hasSyntax(self):
+        return hasattr(self, "syntax")
+
+    def displayInfo(self, msg):
+        MPxCommand._messages.append(("info", msg))
+
+    def displayWarning(self, msg):
+        MPxCommand._messages.append(("warning", msg))
+        print("Warning: " + str(msg))
+
+    def displayError(self, msg):
+        MPxCommand._messages.append(("error", msg))
+        print("Error: " + str(msg))
+
+    def setResult(self, value):
+        self._result = value
+
+    @staticmethod
+    def clearResult():
+        pass
+
+
+class MFnPlugin(object):
+    def __init__(self, mobj=None, vendor="", version="", apiVersion=""):
+        pass
+
+    def registerCommand(self, *args, **kwargs):
+        pass
+
+    def deregisterCommand(self, *args, **kwargs):
+        pass
+
+    def loadPath(self):
+        return ""
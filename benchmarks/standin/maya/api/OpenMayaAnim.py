@@ -0,0 +1,91 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Stand-in for maya.api.OpenMayaAnim.MFnSkinCluster, see OpenMaya.py.
+"""
+from maya.api import OpenMaya as om2
+
+
+class MFnSkinCluster(om2.MFnDependencyNode):
+    def __init__(self, mobj=None):
+        om2.MFnDependencyNode.__init__(self, mobj)
+        if self._node is None or self._node.apiType != om2.MFn.kSkinClusterFilter:
+            raise RuntimeError("(kInvalidParameter): Object is incompatible with this method")
+
+    def _sortedLogical(self):
+        return sorted(self._node.matrix)
+
+    def influenceObjects(self):
+        return om2.MDagPathArray(om2.MDagPath(self._node.matrix[i]) for i in self._sortedLogical())
+
+    def indexForInfluenceObject(self, dagPath):
+        for logical, joint in self._node.matrix.items():
+            if joint is dagPath._node:
+                return logical
+        raise RuntimeError("(kInvalidParameter): Object is not an influence")
+
+    def numOutputConnections(self):
+        return 1 if self._node.shape is not None else 0
+
+    def indexForOutputConnection(self, index):
+        if self._node.shape is None:
+            raise RuntimeError("(kFailure): No output connection")
+        return 0
+
+    def getPathAtIndex(self, index):
+        return om2.MDagPath(self._node.shape)
+
+    def getOutputGeometry(self):
+        return om2.MObjectArray([om2.MObject(self._node.shape)])
+
+    def _ids(self, shape, components):
+        fn = om2.MFnSingleIndexedComponent(components)
+        if fn.isComplete():
+            return range(fn._component.complete)
+        return fn._component.elements
+
+    def getWeights(self, shape, components, influences=None):
+        ids = self._ids(shape, components)
+        logical = self._sortedLogical()
+        if influences is not None:
+            if isinstance(influences, int):
+                influences = [influences]
+            logical = [logical[i] for i in influences]
+        weights = self._node.weights
+        result = om2.MDoubleArray()
+        empty = {}
+        for vid in ids:
+            row = weights.get(vid, empty)
+            result.extend([row.get(i, 0.0) for i in logical])
+        if influences is None:
+            return result, len(logical)
+        return result
+
+    def setWeights(self, shape, components, influences, values, normalize=True, returnOldWeights=False):
+        ids = list(self._ids(shape, components))
+        allLogical = self._sortedLogical()
+        if isinstance(influences, int):
+            influences = [influences]
+        logical = [allLogical[i] for i in influences]
+        if len(values) != len(ids) * len(logical):
+            raise RuntimeError("(kInvalidParameter): weight count mismatch")
+        old = om2.MDoubleArray() if returnOldWeights else None
+        n = len(logical)
+        ## Every influence is being set, so the rows can be replaced rather than merged.
+        replace = set(logical) == set(allLogical)
+        weights = self._node.weights
+        empty = {}
+        for r, vid in enumerate(ids):
+            row = weights.get(vid, empty)
+            if old is not None:
+                old.extend([row.get(i, 0.0) for i in logical])
+            newRow = dict((lg, float(v)) for lg, v in zip(logical, values[r * n:(r + 1) * n]) if v != 0.0)
+            if not replace:
+                merged = dict((k, v) for k, v in row.items() if k not in newRow and k not in logical)
+                merged.update(newRow)
+                newRow = merged
+            if normalize:
+                total = sum(newRow.values())
+                if total:
+                    newRow = dict((k, v / total) for k, v in newRow.items())
+            weights[vid] = newRow
+        return old
@@ -0,0 +1 @@
+#  Copyright (c) 2020.  James B Dunlop
@@ -0,0 +1,170 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Stand-in for the maya.cmds calls the plugins use, see api/OpenMaya.py.
+"""
+import fnmatch
+
+from maya.api import OpenMaya as om2
+
+_SCENE = om2._SCENE
+
+
+def _node(name):
+    return _SCENE.find(name)
+
+
+def ls(*args, **kwargs):
+    sl = kwargs.get("sl", kwargs.get("selection", False))
+    fl = kwargs.get("fl", kwargs.get("flatten", False))
+    long = kwargs.get("long", kwargs.get("l", False))
+    if sl:
+        result = []
+        for node, ids in _SCENE.selection:
+            if ids is None:
+                result.append(node.pathName() if long else node.name)
+            else:
+                owner = node.parent if node.parent is not None else node
+                if fl:
+                    result.extend("{}.vtx[{}]".format(owner.name, i) for i in ids)
+                else:
+                    result.append("{}.vtx[{}:{}]".format(owner.name, min(ids), max(ids)))
+        return result
+    names = args[0] if args else None
+    nodeType = kwargs.get("type")
+    if names is None or nodeType is not None:
+        patterns = [names] if isinstance(names, str) else (names or ["*"])
+        types = {"transform": (om2.MFn.kTransform, om2.MFn.kJoint), "joint": (om2.MFn.kJoint,),
+                 "mesh": (om2.MFn.kMesh,), "skinCluster": (om2.MFn.kSkinClusterFilter,)}.get(nodeType)
+        return [
+            n.pathName() if long else n.name
+            for n in _SCENE.nodes.values()
+            if n.alive and (types is None or n.apiType in types)
+            and any(fnmatch.fnmatchcase(n.name, p) for p in patterns)
+        ]
+    if isinstance(names, str):
+        names = [names]
+    return [n for n in names if n.split(":")[-1].split(".")[0] in _SCENE.nodes]
+
+
+def listRelatives(*args, **kwargs):
+    names = args[0] if args else []
+    if isinstance(names, str):
+        names = [names]
+    fullPath = kwargs.get("fullPath", kwargs.get("f", False))
+    types = {"mesh": om2.MFn.kMesh, "nurbsCurve": om2.MFn.kNurbsCurve, "transform": om2.MFn.kTransform}
+    nodeTypes = kwargs.get("type")
+    if isinstance(nodeTypes, str):
+        nodeTypes = [nodeTypes]
+    result = []
+    for name in names:
+        node = _node(name)
+        if kwargs.get("parent", kwargs.get("p", False)):
+            related = [node.parent] if node.parent is not None else []
+        else:
+            related = list(node.children)
+            if kwargs.get("shapes", kwargs.get("s", False)):
+                related = [c for c in related if c.apiType in (om2.MFn.kMesh, om2.MFn.kNurbsCurve)]
+            if kwargs.get("noIntermediate", kwargs.get("ni", False)):
+                related = [c for c in related if not c.values.get("intermediateObject", False)]
+        if nodeTypes:
+            related = [c for c in related if c.apiType in [types.get(t) for t in nodeTypes]]
+        result.extend(c.pathName() if fullPath else c.name for c in related)
+
+    return result or None
+
+
+def select(items=None, clear=False, add=False, **kwargs):
+    if clear or items is None:
+        _SCENE.selection = []
+        if items is None:
+            return
+    if not add:
+        _SCENE.selection = []
+    if isinstance(items, str):
+        items = [items]
+    sel = om2.MSelectionList()
+    for item in items:
+        sel.add(item)
+    _SCENE.selection.extend(sel._items)
+
+
+def objExists(name):
+    try:
+        _node(name)
+        return True
+    except RuntimeError:
+        return False
+
+
+def delete(items):
+    if isinstance(items, str):
+        items = [items]
+    for name in items:
+        node = _node(name)
+        _SCENE.emit("preRemoval", node, om2.MObject(node))
+        _SCENE.emit("nodeRemoved", None, om2.MObject(node))
+        node.alive = False
+        for geo, sk in list(_SCENE.deformerFor.items()):
+            if sk is node:
+                del _SCENE.deformerFor[geo]
+        del _SCENE.nodes[node.name]
+
+
+def skinCluster(*args, **kwargs):
+    q = kwargs.get("q", kwargs.get("query", False))
+    if q:
+        sk = _node(args[0])
+        if kwargs.get("maximumInfluences", kwargs.get("mi")):
+            return sk.maxInfluences
+        if kwargs.get("influence", kwargs.get("inf")):
+            return [sk.matrix[i].name for i in sorted(sk.matrix)]
+        return None
+
+    items = list(args[0]) if args else []
+    geo = _node(items[-1])
+    joints = [_node(j) for j in items[:-1]]
+    name = kwargs.get("n", kwargs.get("name", "skinCluster1"))
+    return [_bind(name, geo, joints, kwargs.get("maximumInfluences", kwargs.get("mi", 4)))]
+
+
+def _bind(name, transform, joints, maxInfluences=4):
+    shape = [c for c in transform.children if c.apiType in (om2.MFn.kMesh, om2.MFn.kNurbsCurve)][0]
+    sk = _SCENE.addNode(name, om2.MFn.kSkinClusterFilter)
+    sk.maxInfluences = maxInfluences
+    sk.shape = shape
+    for i, joint in enumerate(joints):
+        sk.matrix[i] = joint
+    for vid in range(shape.values.get("vertexCount", 0)):
+        sk.weights[vid] = {0: 1.0}
+    _SCENE.deformerFor[shape] = sk
+    _SCENE.addNode(name + "_bindPose", om2.MFn.kDagPose)
+    return sk.name
+
+
+def dagPose(*args, **kwargs):
+    return None
+
+
+def copySkinWeights(*args, **kwargs):
+    src = _node(kwargs["sourceSkin"])
+    dst = _node(kwargs["destinationSkin"])
+    byName = dict((j.name, i) for i, j in dst.matrix.items())
+    count = dst.shape.values.get("vertexCount", 0)
+    for vid in range(count):
+        row = src.weights.get(vid % max(1, len(src.weights)), {})
+        dst.weights[vid] = dict((byName[src.matrix[i].name], v) for i, v in row.items() if src.matrix[i].name in byName)
+
+
+def file(*args, **kwargs):
+    """
+    Only new=True, clearing the scene, is supported. Build the scene with benchmarks/syntheticRig.py.
+    """
+    if kwargs.get("new"):
+        _SCENE.clear()
+        return None
+    raise RuntimeError("(kNotImplemented): The stand-in can't open scene files!")
+
+
+def loadPlugin(*args, **kwargs):
+    return None
+
@@ -0,0 +1,12 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Stand-in for maya.standalone.
+"""
+
+
+def initialize(name="python"):
+    return None
+
+
+def uninitialize():
+    return None
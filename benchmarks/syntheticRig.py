@@ -0,0 +1,99 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Builds synthetic skinned rigs in the stand-in scene (benchmarks/standin) for the benchmarks.
+
+The weights are seeded so the same counts give the same rig, and the numbers can be compared from commit to commit.
+"""
+import random
+
+import maya.api.OpenMaya as om2
+import maya.cmds as cmds
+
+
+def makeJoints(count, prefix="jnt"):
+    """
+    :param count: `int` number of joints, made as a single chain
+    :param prefix: `str` joint name prefix
+    :return: list of `str` joint names
+    """
+    joints = []
+    parent = None
+    for x in range(count):
+        name = "{}_{:03d}".format(prefix, x)
+        if name not in om2._SCENE.nodes:
+            om2._SCENE.addNode(name, om2.MFn.kJoint, parent=parent)
+        parent = om2._SCENE.nodes[name]
+        joints.append(name)
+
+    return joints
+
+
+def makeMesh(name, vertexCount, shapeType=None):
+    """
+    :param name: `str` name of the geo transform, the shape is named {name}Shape
+    :param vertexCount: `int`
+    :param shapeType: om2.MFn.kMesh (default) or om2.MFn.kNurbsCurve
+    :return: `str` geo name
+    """
+    transform = om2._SCENE.addNode(name, om2.MFn.kTransform)
+    shape = om2._SCENE.addNode(name + "Shape", shapeType or om2.MFn.kMesh, parent=transform)
+    shape.values["vertexCount"] = vertexCount
+
+    return name
+
+
+def makeSkinnedMesh(name, vertexCount, joints, influencesPerVertex=4, seed=0, shapeType=None):
+    """
+    :param name: `str` name of the geo transform, the skinCluster is named {name}_skCls
+    :param vertexCount: `int`
+    :param joints: list of `str` joint names to bind to
+    :param influencesPerVertex: `int` non zero weights per vertex, normalized
+    :param seed: `int` for the random weights
+    :param shapeType: om2.MFn.kMesh (default) or om2.MFn.kNurbsCurve
+    :return: `str` skinCluster name
+    """
+    rng = random.Random(seed)
+    makeMesh(name, vertexCount, shapeType=shapeType)
+    skName = cmds.skinCluster(joints + [name], n="{}_skCls".format(name), mi=influencesPerVertex)[0]
+
+    weights = om2._SCENE.nodes[skName].weights
+    jointCount = len(joints)
+    perVertex = min(influencesPerVertex, jointCount)
+    for vertexId in range(vertexCount):
+        picks = rng.sample(range(jointCount), perVertex)
+        raw = [rng.random() + 0.01 for _ in picks]
+        total = sum(raw)
+        weights[vertexId] = dict((p, r / total) for p, r in zip(picks, raw))
+
+    return skName
+
+
+def buildRig(vertices=20000, influences=60, meshes=4, influencesPerVertex=4, seed=0):
+    """
+    Clears the scene and builds `meshes` meshes of `vertices` vertices, all bound to the same `influences` joints.
+
+    :return: list of `str` geo names
+    """
+    cmds.file(new=True, force=True)
+    joints = makeJoints(influences)
+    geoNames = []
+    for x in range(meshes):
+        name = "geo_{:03d}".format(x)
+        makeSkinnedMesh(name, vertices, joints, influencesPerVertex=influencesPerVertex, seed=seed + x)
+        geoNames.append(name)
+
+    return geoNames
+
+
+def scrambleWeights(geoNames, seed=1):
+    """
+    Replaces the weights on the geo with single influence weights, so a load has something to change.
+
+    :param geoNames: list of `str` from buildRig()
+    """
+    rng = random.Random(seed)
+    for name in geoNames:
+        skinCluster = om2._SCENE.nodes["{}_skCls".format(name)]
+        logicalIndices = sorted(skinCluster.matrix)
+        for vertexId in skinCluster.weights:
+            skinCluster.weights[vertexId] = {rng.choice(logicalIndices): 1.0}
@@ -1,18 +1,20 @@
 #  Copyright (c) 2020.  James B Dunlop
 ###################################################################################
 # The imports and defining the plugin name
+import itertools
 import sys
 import time
+from collections import OrderedDict
+from contextlib import closing
 
 import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
-try:
-    import simplejson as sjson
-except ImportError:
-    print("loadSkinWeights: simplejson not found!")
 from pluginUtils import skinCluster as u_skinCluster
 from pluginUtils import plugs as u_plugs
+from pluginUtils import profiling as u_profiling
+from pluginUtils import weightFiles as u_weightFiles
+from pluginUtils.weightData import SkinWeightData
 
 kPluginCmdName = "loadSkinWeights"
 
@@ -24,51 +26,117 @@ class LoadSkinWeights(om2.MPxCommand):
         self.namespace = ""
         self.selectedVerts = False
         self.forceNameCheck = False
+        self.threads = None
+        self.prefetch = 2
+        self.skipUnchanged = False
+        self.missingInfluences = OrderedDict()
+        self.prune = False
+        self.maxInfluences = 0
+        self.pruneEpsilon = 0.001
+        self.profile = None
+        self.memoryBudget = None
+        self.overBudget = []
+        self.noUndo = False
+
+        ## Undo, the skinClusters made along the way and the sparse weights before / after for each one set
+        self.myDGMod = om2.MDGModifier()
+        self.snapshots = []
+        self.snapshotBytes = 0
+        self.notUndoable = []
 
         if not self.hasSyntax():
             self.syntaxCreator()
 
     def resolve(self):
+        """
+        :return: (`dict` of geoName: `set` of selected vertex ids, list of `str` geo). The geo is None if the
+                 selection isn't valid.
+        """
         geoList = None
-        curSel = cmds.ls(sl=True)
-        ids = []
-        if not curSel:
+        ids = {}
+        selList = om2.MGlobal.getActiveSelectionList()
+        if selList.isEmpty():
             self.displayError(
                 "You must have a valid mesh or vtx selection to load weights!!"
             )
             return ids, geoList
 
         if self.selectedVerts:
-            if ".vtx" not in curSel[0]:
+            ids = self.resolveVertexIds(selList)
+            if not ids:
                 self.displayError("sv=True. You must have a valid vertex selection!")
                 return ids, geoList
 
-            ids = [
-                int(v.split(".vtx[")[-1].replace("]", ""))
-                for v in cmds.ls(sl=True, fl=True)
-            ]
-            geoList = [cmds.ls(sl=True)[0].split(".")[0]]
+            geoList = list(ids)
         else:
-            if ".vtx" in curSel[0]:
+            ## A set or DG node first isn't a DAG path, getComponent raises on it
+            try:
+                validGeo = selList.getComponent(0)[1].isNull()
+            except (RuntimeError, TypeError):
+                validGeo = False
+            if not validGeo:
                 self.displayError("sv=False. You must have a valid geo selection!")
                 return ids, geoList
-            geoList = curSel
+            geoList = cmds.ls(sl=True)
 
         return ids, geoList
 
+    @staticmethod
+    def resolveVertexIds(selList):
+        """
+        Reads the vertex ids straight off the selected components, for any number of meshes.
+
+        :param selList: `MSelectionList` with vertex / cv components
+        :return: `OrderedDict` of geoName: `set` of `int` vertex ids, in selection order
+        """
+        ids = OrderedDict()
+        for x in range(selList.length()):
+            try:
+                dagPath, components = selList.getComponent(x)
+            except (RuntimeError, TypeError):
+                continue
+            if components.isNull() or not components.hasFn(
+                om2.MFn.kSingleIndexedComponent
+            ):
+                continue
+
+            geoName = om2.MFnDagNode(dagPath.transform()).partialPathName()
+            ids.setdefault(geoName, set()).update(
+                om2.MFnSingleIndexedComponent(components).getElements()
+            )
+
+        return ids
+
     def doIt(self, args):
         """
-        :param fp: `str` path to the json including the fileName.json
+        :param fp: `str` path to the json or binary .skwb file, the format is detected from the file
         :param ns: `str` namespace for the influences if there is one, as saving strips namespaces from the joints
-        :param sv: `bool` load to selected verts or not?
+        :param sv: `bool` load to selected verts or not? The selection can hold verts from several meshes.
         :param nc: `bool` scan the skCls.matrix array to find the idx by inf name.
+        :param th: `int` threads decoding / decompressing the file while the weights are set. Defaults to one per
+                   core, 0 reads the file on the main thread.
+        :param pf: `int` number of decoded skinClusters to hold ready ahead of the one being set. Default 2.
+        :param su: `bool` skip the skinClusters whose current weights hash the same as the saved ones, they're
+                   already in that state. The current weights are read to hash them, which is quicker than setting.
+        :param pr: `bool` prune each vertex to its mi largest weights, drop the ones under pe and normalize the rest.
+                   Also normalizes the vertices that lost weight to missing influences.
+        :param mi: `int` max influences per vertex for pr. Defaults to the maxInf saved with the skinCluster.
+        :param pe: `float` weights below this are dropped by pr. Default 0.001
+        :param prf: `str` path to write a json report of where the time went, per phase, with the Maya API call
+                    counts. An empty string displays the json instead.
+        :param mb: `float` megabytes to keep the weights being worked on under. Each skinCluster is set in vertex
+                   chunks sized to fit, after the decoded skinClusters held for pf and the undo copies kept so far,
+                   and the peak python memory for the run is displayed at the end. Measuring the peak slows the load.
+        :param nu: `bool` don't keep the replaced weights for undo, the load can't be undone. For big loads under mb,
+                   the undo copies grow with every skinCluster set.
 
         It's important to note the following:
         If you've got an existing mesh and you're loading the weights back on it, the weightList logical indices should
         match the matrix logical indicies and you won't need to set the nameCheck to true.
         If you've rebound since saving you should prob force a name check to make sure
         that any logical indicies that may now be differrent(but match an id in the json) can be resolved by influence names.
-        This will practically double the time to load skinWeights though.
+        The check is done once per skinCluster, so it costs about the same as a load without it.
+        Saved influences that aren't on the skinCluster are skipped and listed in a warning at the end.
         USage:
             fp="C:/temp/agathaV01.json"
             # Verts no nameCheck
@@ -77,111 +145,280 @@ class LoadSkinWeights(om2.MPxCommand):
             cmds.jbdLoadWeights(fp=fp, ns="", sv=True, nc=False)
             # Full load mesh sel
             cmds.jbdLoadWeights(fp=fp, ns="", sv=False, nc=False)
+            # Full load, 4 influences a vertex at most
+            cmds.jbdLoadWeights(fp=fp, pr=True, mi=4)
+            # Where does the time go?
+            cmds.jbdLoadWeights(fp=fp, prf="C:/temp/loadProfile.json")
+            # On a small farm node, stay under 256 MB
+            cmds.jbdLoadWeights(fp=fp, mb=256, nu=True)
         """
         self.parseArgs(args)
-
-        ids, geoList = self.resolve()
+        profiler = None
+        with u_profiling.PeakMemory(enabled=self.memoryBudget is not None) as memory:
+            if self.profile is None:
+                self.load()
+            else:
+                with u_profiling.Profiler(kPluginCmdName) as profiler:
+                    self.load()
+
+        if profiler is not None:
+            self.displayInfo(u_profiling.writeReport(profiler, self.profile))
+        if self.memoryBudget is not None:
+            self.displayInfo(memory.summary(self.memoryBudget))
+
+    def load(self):
+        with u_profiling.phase("resolve selection"):
+            ids, geoList = self.resolve()
         if geoList is None:
             return
 
         start = time.time()
-        with open(self.filepath) as infile:
-            data = sjson.load(infile)
-        self.displayInfo("Time to load json: {}".format(time.time() - start))
+        # Find the skinClusters for all the geo in one go
+        geoSelList = om2.MSelectionList()
+        for geoName in geoList:
+            geoSelList.add(geoName)
+        skinClustersByGeo = u_skinCluster.findSkinClusters(geoSelList)
+
+        unchanged = set()
+        if self.skipUnchanged:
+            with u_profiling.phase("find unchanged"):
+                unchanged, fileHashes = self.findUnchanged(geoSelList)
+            if unchanged:
+                self.displayInfo(
+                    "Skipping {} unchanged skinClusters".format(len(unchanged))
+                )
+                ## Don't even read the geo that's entirely unchanged
+                fileGeo = {}
+                for geoName, skName in fileHashes:
+                    fileGeo.setdefault(geoName, set()).add((geoName, skName))
+                geoList = [
+                    g for g in geoList if not fileGeo.get(g, set()) <= unchanged
+                ]
+
+        ## The file is decoded on a background thread, so the next skinCluster is being read while this one is set.
+        skinClusterHandles = {}
+        records = u_weightFiles.iterWeights(
+            self.filepath,
+            geoNames=geoList,
+            vertexIds=set().union(*ids.values()) if self.selectedVerts else None,
+            workers=self.threads,
+            prefetch=self.prefetch if self.threads != 0 else 0,
+        )
+        with closing(u_profiling.timedIter(records, "wait for file")) as records:
+            for weights in records:
+                geoName = weights.geoName
+                if (geoName, weights.skinCluster) in unchanged:
+                    continue
+
+                selList = om2.MSelectionList()
+                selList.add(geoName)
+
+                if geoName not in skinClusterHandles:
+                    self.displayInfo("Setting weights for geoName: {}".format(geoName))
+                    # Do we have a skinCluster on this geo??
+                    skinClusters = skinClustersByGeo.get(
+                        om2.MDagPath.getAPathTo(selList.getDependNode(0)).fullPathName()
+                    )
+                    skinClusterHandles[geoName] = skinClusters[0] if skinClusters else None
+
+                skinClusterMObjH = self.applyWeights(
+                    selList, weights, skinClusterHandles[geoName], ids.get(geoName, ())
+                )
+                if skinClusterMObjH is None:
+                    return
+                skinClusterHandles[geoName] = skinClusterMObjH
+
+        if self.missingInfluences:
+            self.displayWarning(
+                "Influences missing from the skinClusters, their weights were skipped: {}".format(
+                    "; ".join(
+                        "{}: {}".format(skName, ", ".join(names))
+                        for skName, names in self.missingInfluences.items()
+                    )
+                )
+            )
+
+        if self.overBudget:
+            self.displayWarning(
+                "The decoded weights{} alone are over the mb budget for {}, try a lower pf{}.".format(
+                    "" if self.noUndo else " and undo copies",
+                    ", ".join(self.overBudget),
+                    "" if self.noUndo else " or nu=True",
+                )
+            )
+
+        if self.notUndoable:
+            self.displayWarning(
+                "Weights were set through the plugs on {}, undo won't restore them!".format(
+                    ", ".join(self.notUndoable)
+                )
+            )
+
+        self.displayInfo(
+            "Success: Time to load skinWeights: {}".format(time.time() - start)
+        )
 
-        for geoName, skData in data.items():
-            if geoList is not None and geoName not in geoList:
+    def findUnchanged(self, geoSelList):
+        """
+        :param geoSelList: `MSelectionList` of the geo being loaded
+        :return: (`set` of (geoName, skinClusterName) whose weights hash the same as the ones in the file,
+                 `OrderedDict` the hashes read from the file)
+        """
+        fileHashes = u_weightFiles.readHashes(self.filepath)
+        quantized = u_weightFiles.isQuantized(self.filepath)
+        unchanged = set()
+        for chunks in u_skinCluster.iterSkinWeightData(
+            geo=geoSelList,
+            chunkRows=u_weightFiles.CHUNK_ROWS,
+            memoryBudget=self.memoryBudget,
+        ):
+            chunks = iter(chunks)
+            first = next(chunks, None)
+            if first is None:
                 continue
 
-            self.displayInfo("Setting weights for geoName: {}".format(geoName))
+            key = (first.geoName, first.skinCluster)
+            if fileHashes.get(key) is None:
+                continue
 
-            selList = om2.MSelectionList()
-            selList.add(geoName)
+            recordHash = u_weightFiles.contentHash(
+                itertools.chain([first], chunks), quantize=quantized
+            )
+            if recordHash == fileHashes[key]:
+                unchanged.add(key)
 
-            geoMObjH = om2.MObjectHandle(selList.getDependNode(0))
-            # Do we have a skinCluster on this geo??
-            skinClusterMObjH = u_skinCluster.findSkinCluster(geoMObjH)
+        return unchanged, fileHashes
 
-            # if not lets make one now from the influence list!
-            for skCLS, weightData in skData.items():
-                if skinClusterMObjH is None:
-                    self.displayInfo(
-                        "No skinCluster found for {}! Attempting to make one now..".format(
-                            geoName
-                        )
-                    )
-                    influences = [
-                        "{}:{}".format(self.namespace, j)
-                        for j in weightData["influences"]
-                    ]
-                    maxInf = weightData["maxInf"]
-                    cmds.skinCluster(
-                        influences + [geoName],
-                        frontOfChain=False,
-                        n=skCLS,
-                        maximumInfluences=maxInf,
-                    )
+    def applyWeights(self, selList, weights, skinClusterMObjH, geoIds=()):
+        """
+        :param selList: `MSelectionList` holding just the geo
+        :param weights: `SkinWeightData` for one of the geo's skinClusters
+        :param skinClusterMObjH: `MObjectHandle` the geo's skinCluster. None to make one from the influences.
+        :param geoIds: `set` of the selected vertex ids on the geo for sv
+        :return: `MObjectHandle` of the skinCluster the weights were set on, None if it's not valid
+        """
+        geoName = weights.geoName
+        skCLS = weights.skinCluster
+        # if not lets make one now from the influence list!
+        if skinClusterMObjH is None:
+            self.displayInfo(
+                "No skinCluster found for {}! Attempting to make one now..".format(
+                    geoName
+                )
+            )
+            influences = [
+                "{}:{}".format(self.namespace, j) for j in weights.influences
+            ]
+            maxInf = weights.maxInf
+            ## Through the modifier so undo removes it again
+            command = ["skinCluster", "-foc", "false", "-n", '"{}"'.format(skCLS)]
+            if maxInf is not None:
+                command.extend(["-mi", str(maxInf)])
+            command.extend('"{}"'.format(n) for n in influences + [geoName])
+            self.myDGMod.commandToExecute(" ".join(command))
+            with u_profiling.phase("create skinCluster"):
+                self.myDGMod.doIt()
+
+        ## Now proceed as we should have a valid skinCluster
+        selList.add(skCLS)
+        skinClusterMObjH = om2.MObjectHandle(selList.getDependNode(1))
+
+        weightPlug = u_plugs.findPlugOnNode(skinClusterMObjH, "weightList")
+        matrixPlug = u_plugs.findPlugOnNode(skinClusterMObjH, "matrix")
+        if weightPlug.isNull or matrixPlug.isNull:
+            self.displayWarning(
+                ".weightList or .matrix plug not found on skinCluster!"
+            )
+            return None
 
-                ## Now proceed as we should have a valid skinCluster
-                selList.add(skCLS)
-                skinClusterMObjH = om2.MObjectHandle(selList.getDependNode(1))
+        # Sel verts and we're merging weights we might have clashing logical indices so we check against inf names
+        targetLogicalIndices, missing = u_skinCluster.buildInfluenceRemap(
+            skinClusterMObjH, weights, nameCheck=self.forceNameCheck
+        )
+        if missing:
+            self.missingInfluences[skCLS] = missing
+
+        if self.prune:
+            with u_profiling.phase("prune"):
+                weights = weights.pruned(
+                    maxInf=self.maxInfluences or weights.maxInf,
+                    epsilon=self.pruneEpsilon,
+                    dropColumns=[
+                        column
+                        for column, logicalIndex in enumerate(targetLogicalIndices)
+                        if logicalIndex == SkinWeightData.NO_INDEX
+                    ],
+                )
+
+        rows = range(len(weights))
+        if self.selectedVerts:
+            rows = [r for r, idx in enumerate(weights.vertexIds) if idx in geoIds]
+
+        chunkRows = self.chunkRowsForBudget(skinClusterMObjH, weights)
+        for start in range(0, len(rows), chunkRows):
+            snapshots = u_skinCluster.setSkinClusterWeights(
+                skinClusterMObjH,
+                weights,
+                targetLogicalIndices,
+                rows=rows[start:start + chunkRows],
+                returnOldWeights=not self.noUndo,
+            )
+            if self.noUndo:
+                continue
+            if snapshots is None:
+                if skCLS not in self.notUndoable:
+                    self.notUndoable.append(skCLS)
+                continue
 
-                weights = weightData["weights"]
-                weightPlug = u_plugs.findPlugOnNode(skinClusterMObjH, "weightList")
-                matrixPlug = u_plugs.findPlugOnNode(skinClusterMObjH, "matrix")
-                if weightPlug.isNull or matrixPlug.isNull:
-                    self.displayWarning(
-                        ".weightList or .matrix plug not found on skinCluster!"
-                    )
-                    return
+            self.snapshots.append(snapshots)
+            self.snapshotBytes += sum(snapshot.byteSize() for snapshot in snapshots)
 
-                if self.forceNameCheck:
-                    # Cache the current matrix locigal indices influence names
-                    self.matrixCacheById = {}
-                    self.matrixCacheByName = {}
-                    for i in matrixPlug.getExistingArrayAttributeIndices():
-                        skInfName = om2.MNamespace.stripNamespaceFromName(
-                            om2.MFnDagNode(
-                                matrixPlug.elementByLogicalIndex(i).source().node()
-                            ).name()
-                        )
-                        self.matrixCacheById[i] = skInfName
-                        self.matrixCacheByName[skInfName] = i
-
-                for idx, weightList in weights.items():
-                    if self.selectedVerts and int(idx) not in ids:
-                        continue
-
-                    p = weightPlug.elementByLogicalIndex(int(idx))
-                    c = p.child(0)
-
-                    ## Set ALL existing array indices to 0
-                    existing = c.getExistingArrayAttributeIndices()
-                    for x in range(len(existing)):
-                        c.elementByLogicalIndex(existing[x]).setFloat(0)
-
-                    ## Now set the saved weights
-                    for eachWeight in weightList:
-                        id = eachWeight[0]
-                        val = eachWeight[1]
-                        inf = eachWeight[2]
-
-                        # Sel verts and we're merging weights we might have clashing logical indices so we check against inf names
-                        if self.forceNameCheck:
-                            if self.matrixCacheById[id] != inf:
-                                if inf in self.matrixCacheByName.keys():
-                                    id = self.matrixCacheByName[inf]
-                                else:
-                                    continue
-
-                        c.elementByLogicalIndex(id).setFloat(val)
+        return skinClusterMObjH
 
-        self.displayInfo(
-            "Success: Time to load skinWeights: {}".format(time.time() - start)
+    def chunkRowsForBudget(self, skinClusterMObjH, weights):
+        """
+        :param skinClusterMObjH: `MObjectHandle` the skinCluster being set, its influences are the width of the
+                                 dense block setWeights() takes
+        :param weights: `SkinWeightData` being set
+        :return: `int` rows to set per setWeights() call, all of them without a memoryBudget
+        """
+        if self.memoryBudget is None:
+            return max(len(weights), 1)
+
+        ## The decoded skinClusters held at once. The one being set, plus with a prefetch the ones queued up and the
+        ## one being decoded. pr holds the pruned copy as well as the decoded one.
+        heldRecords = 1
+        if self.threads != 0 and self.prefetch:
+            heldRecords += self.prefetch + 1
+        if self.prune:
+            heldRecords += 1
+        ## The sparse before / after undo copies this one adds, on top of the ones already kept
+        if not self.noUndo:
+            heldRecords += 2
+
+        budget = self.memoryBudget - heldRecords * weights.byteSize() - self.snapshotBytes
+        if budget <= 0:
+            self.overBudget.append(weights.skinCluster)
+            budget = self.memoryBudget
+
+        return u_skinCluster.rowsForBudget(
+            budget,
+            len(u_skinCluster.getSkinClusterInfo(skinClusterMObjH).influences),
+            u_skinCluster.SET_DENSE_COPIES,
         )
 
+    def undoIt(self):
+        for before, _ in reversed(self.snapshots):
+            before.restore()
+        self.myDGMod.undoIt()
+
+    def redoIt(self):
+        self.myDGMod.doIt()
+        for _, after in self.snapshots:
+            after.restore()
+
     def isUndoable(self):
-        return False
+        return not self.noUndo
 
     def parseArgs(self, args):
         argData = om2.MArgParser(self.syntax, args)
@@ -194,6 +431,25 @@ class LoadSkinWeights(om2.MPxCommand):
             self.selectedVerts = argData.flagArgumentBool("sv", 0)
         if argData.isFlagSet("nc"):
             self.forceNameCheck = argData.flagArgumentBool("nc", 0)
+        if argData.isFlagSet("th"):
+            self.threads = argData.flagArgumentInt("th", 0)
+        if argData.isFlagSet("pf"):
+            self.prefetch = argData.flagArgumentInt("pf", 0)
+        if argData.isFlagSet("su"):
+            self.skipUnchanged = argData.flagArgumentBool("su", 0)
+        if argData.isFlagSet("pr"):
+            self.prune = argData.flagArgumentBool("pr", 0)
+        if argData.isFlagSet("mi"):
+            self.maxInfluences = argData.flagArgumentInt("mi", 0)
+        if argData.isFlagSet("pe"):
+            self.pruneEpsilon = argData.flagArgumentDouble("pe", 0)
+        if argData.isFlagSet("prf"):
+            self.profile = argData.flagArgumentString("prf", 0)
+        if argData.isFlagSet("mb"):
+            ## Held in bytes
+            self.memoryBudget = int(argData.flagArgumentDouble("mb", 0) * 1048576) or None
+        if argData.isFlagSet("nu"):
+            self.noUndo = argData.flagArgumentBool("nu", 0)
 
     def syntaxCreator(self):
         self.syntax = om2.MSyntax()
@@ -203,6 +459,15 @@ class LoadSkinWeights(om2.MPxCommand):
         self.syntax.addFlag("ns", "namespace", om2.MSyntax.kString)
         self.syntax.addFlag("sv", "selectedVerts", om2.MSyntax.kBoolean)
         self.syntax.addFlag("nc", "forceNameCheck", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("th", "threads", om2.MSyntax.kLong)
+        self.syntax.addFlag("pf", "prefetch", om2.MSyntax.kLong)
+        self.syntax.addFlag("su", "skipUnchanged", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("pr", "prune", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("mi", "maxInfluences", om2.MSyntax.kLong)
+        self.syntax.addFlag("pe", "pruneEpsilon", om2.MSyntax.kDouble)
+        self.syntax.addFlag("prf", "profile", om2.MSyntax.kString)
+        self.syntax.addFlag("mb", "memoryBudget", om2.MSyntax.kDouble)
+        self.syntax.addFlag("nu", "noUndo", om2.MSyntax.kBoolean)
 
     @staticmethod
     def cmdCreator():
@@ -240,6 +505,9 @@ def initializePlugin(mobject):
 # Uninitialize the script plug-in
 def uninitializePlugin(mobject):
     mplugin = om2.MFnPlugin(mobject)
+    u_skinCluster.clearSkinClusterInfoCache()
+    u_plugs.clearPlugPathCache()
+    u_plugs.clearPlugAccessorCache()
     try:
         mplugin.deregisterCommand(kPluginCmdName)
         sys.stderr.write(
@@ -1,12 +1,27 @@
 #  Copyright (c) 2020.  James B Dunlop
 import logging
+from collections import OrderedDict
 
 import maya.api.OpenMaya as om2
 
+from pluginUtils import profiling as mpu_profiling
 from pluginUtils import types as mpu_types
 
 logger = logging.getLogger(__name__)
 
+## Entries kept in each of the fetchMPlugFromConnectionData() caches, least recently used are dropped first
+PLUG_PATH_CACHE_SIZE = 4096
+## (MObjectHandle.hashCode(), plug path): (MObjectHandle, MPlug)
+_PLUG_PATHS = OrderedDict()
+## MObjectHandle.hashCode(): set of its _PLUG_PATHS keys, to drop a node's plugs when it's removed
+_PLUG_PATH_KEYS = {}
+## Node name: MObjectHandle
+_NODE_HANDLES = OrderedDict()
+_PLUG_PATH_CALLBACKS = []
+## (Attribute MObjectHandle.hashCode(), isArray, isCompound): _PlugAccessor, the get / set functions for its plugs.
+## An array plug and its element plugs share the attribute but aren't read the same way.
+_PLUG_ACCESSORS = {}
+
 
 # <editor-fold desc="Find Plug functions">
 
@@ -48,143 +63,198 @@ def getPlugFromAttributeName(node, attributeName):
 # </editor-fold>
 
 
-# <editor-fold desc="Get Plug functions">
+# <editor-fold desc="Plug accessors">
+_COMPOUND_TYPES = (
+    om2.MFn.kAttribute3Double,
+    om2.MFn.kAttribute3Float,
+    om2.MFn.kCompoundAttribute,
+)
+_INT_TYPES = (
+    om2.MFnNumericData.kShort,
+    om2.MFnNumericData.kInt,
+    om2.MFnNumericData.kLong,
+    om2.MFnNumericData.kByte,
+)
+_DOUBLE_TYPES = (
+    om2.MFnNumericData.kFloat,
+    om2.MFnNumericData.kDouble,
+    om2.MFnNumericData.kAddr,
+)
+
+
+class _PlugAccessor(object):
+    """
+    How to get / set the plugs of one attribute, worked out from the attribute's type the first time one of its
+    plugs is used. See _plugAccessor().
+    """
 
+    __slots__ = ("handle", "plugType", "getter", "setter")
+
+    def __init__(self, handle, plugType=None, getter=None, setter=None):
+        """
+        :param handle: `MObjectHandle` of the attribute
+        :param plugType: mpu_types value, list of them for a compound's children
+        :param getter: function(mplug) returning the value, None if it can't be read
+        :param setter: function(mplug, value), None if it can't be set
+        """
+        self.handle = handle
+        self.plugType = plugType
+        self.getter = getter
+        self.setter = setter
+
+
+def _getCompound(mplug):
+    return [getMPlugValue(mplug.child(c)) for c in range(mplug.numChildren())]
+
+
+def _setCompound(mplug, value):
+    for x in range(mplug.numChildren()):
+        if not mplug.child(x).isConnected:
+            mplug.child(x).setFloat(value[x])
+
+
+def _getDistance(mplug):
+    return mplug.asMDistance().asCentimeters()
 
-def getMPlugValue(mplug):
-    # type: (MPlug) -> any
-    if not om2.MObjectHandle(mplug.node()).isValid():
-        return
 
+def _getAngle(mplug):
+    return mplug.asMAngle().asDegrees()
+
+
+def _getMatrix(mplug):
+    return om2.MFnMatrixData(mplug.asMObject()).matrix()
+
+
+def _buildPlugAccessor(mplug, handle):
     pAttribute = mplug.attribute()
     apiType = pAttribute.apiType()
-    # Float Groups - rotate, translate, scale; Com2pounds
-    if apiType in [
-        om2.MFn.kAttribute3Double,
-        om2.MFn.kAttribute3Float,
-        om2.MFn.kCompoundAttribute,
-    ]:
-        result = []
+    # Float Groups - rotate, translate, scale; Compounds
+    if apiType in _COMPOUND_TYPES:
         if mplug.isCompound:
-            for c in range(mplug.numChildren()):
-                result.append(getMPlugValue(mplug.child(c)))
-            return result
+            return _PlugAccessor(
+                handle,
+                [getMPlugType(mplug.child(c)) for c in range(mplug.numChildren())],
+                _getCompound,
+                _setCompound,
+            )
 
     # Distance
-    elif apiType in [om2.MFn.kDoubleLinearAttribute, om2.MFn.kFloatLinearAttribute]:
-        return mplug.asMDistance().asCentimeters()
+    elif apiType in (om2.MFn.kDoubleLinearAttribute, om2.MFn.kFloatLinearAttribute):
+        return _PlugAccessor(handle, mpu_types.FLOAT, _getDistance, om2.MPlug.setFloat)
 
     # Angle
-    elif apiType in [om2.MFn.kDoubleAngleAttribute, om2.MFn.kFloatAngleAttribute]:
-        return mplug.asMAngle().asDegrees()
+    elif apiType in (om2.MFn.kDoubleAngleAttribute, om2.MFn.kFloatAngleAttribute):
+        return _PlugAccessor(handle, mpu_types.FLOAT, _getAngle, om2.MPlug.setFloat)
 
     # TYPED
     elif apiType == om2.MFn.kTypedAttribute:
         pType = om2.MFnTypedAttribute(pAttribute).attrType()
         # Matrix
         if pType == om2.MFnData.kMatrix:
-            return om2.MFnMatrixData(mplug.asMObject()).matrix()
+            return _PlugAccessor(handle, mpu_types.MATRIXF44, _getMatrix)
         # String
         elif pType == om2.MFnData.kString:
-            return mplug.asString()
+            return _PlugAccessor(handle, mpu_types.STRING, om2.MPlug.asString)
 
     # MATRIX
     elif apiType == om2.MFn.kMatrixAttribute:
-        return om2.MFnMatrixData(mplug.asMObject()).matrix()
+        return _PlugAccessor(handle, mpu_types.MATRIXF44, _getMatrix)
 
     # NUMBERS
     elif apiType == om2.MFn.kNumericAttribute:
         pType = om2.MFnNumericAttribute(pAttribute).numericType()
         if pType == om2.MFnNumericData.kBoolean:
-            return mplug.asBool()
-        elif pType in [
-            om2.MFnNumericData.kShort,
-            om2.MFnNumericData.kInt,
-            om2.MFnNumericData.kLong,
-            om2.MFnNumericData.kByte,
-        ]:
-            return mplug.asInt()
-        elif pType in [
-            om2.MFnNumericData.kFloat,
-            om2.MFnNumericData.kDouble,
-            om2.MFnNumericData.kAddr,
-        ]:
-            return mplug.asDouble()
+            return _PlugAccessor(handle, mpu_types.BOOL, om2.MPlug.asBool, om2.MPlug.setBool)
+        elif pType in _INT_TYPES:
+            return _PlugAccessor(handle, mpu_types.INT, om2.MPlug.asInt, om2.MPlug.setInt)
+        elif pType in _DOUBLE_TYPES:
+            return _PlugAccessor(handle, mpu_types.DOUBLE, om2.MPlug.asDouble, om2.MPlug.setDouble)
 
     # Enum
     elif apiType == om2.MFn.kEnumAttribute:
-        return mplug.asInt()
+        return _PlugAccessor(handle, mpu_types.INT, om2.MPlug.asInt, om2.MPlug.setInt)
 
+    elif apiType == om2.MFn.kMessageAttribute:
+        return _PlugAccessor(handle, mpu_types.MESSAGE)
 
-def getMPlugType(mplug):
-    # type: (MPlug) -> int
+    return _PlugAccessor(handle)
+
+
+def _plugAccessor(mplug):
+    """
+    :return: `_PlugAccessor` for the plug's attribute from the cache, built and cached if there isn't one yet
+    """
+    handle = om2.MObjectHandle(mplug.attribute())
+    key = (handle.hashCode(), mplug.isArray, mplug.isCompound)
+    accessor = _PLUG_ACCESSORS.get(key)
+    if accessor is not None and accessor.handle == handle and accessor.handle.isValid():
+        return accessor
+
+    accessor = _buildPlugAccessor(mplug, handle)
+    _PLUG_ACCESSORS[key] = accessor
+
+    return accessor
+
+
+def clearPlugAccessorCache():
+    """
+    Drops the cached get / set functions per attribute, eg: when the plugin is unloaded.
+    """
+    _PLUG_ACCESSORS.clear()
+# </editor-fold>
+
+
+# <editor-fold desc="Get Plug functions">
+
+
+def getMPlugValue(mplug):
+    # type: (MPlug) -> any
     if not om2.MObjectHandle(mplug.node()).isValid():
         return
 
-    pAttribute = mplug.attribute()
-    apiType = pAttribute.apiType()
+    mpu_profiling.count("api.plugGet")
+    getter = _plugAccessor(mplug).getter
+    if getter is not None:
+        return getter(mplug)
 
-    # Float Groups - rotate, translate, scale; Com2pounds
-    if apiType in [
-        om2.MFn.kAttribute3Double,
-        om2.MFn.kAttribute3Float,
-        om2.MFn.kCompoundAttribute,
-    ]:
-        result = []
-        if mplug.isCompound:
-            for c in range(mplug.numChildren()):
-                result.append(getMPlugType(mplug.child(c)))
-            return result
 
-    # Distance
-    elif apiType in [om2.MFn.kDoubleLinearAttribute, om2.MFn.kFloatLinearAttribute]:
-        return mpu_types.FLOAT
+def getMPlugValues(plugs):
+    # type: (list) -> list
+    """
+    getMPlugValue() for a lot of plugs at once, eg: to snapshot a node's attributes.
 
-    # Angle
-    elif apiType in [om2.MFn.kDoubleAngleAttribute, om2.MFn.kFloatAngleAttribute]:
-        return mpu_types.FLOAT
+    :param plugs: iterable of `MPlug`, eg: an MPlugArray
+    :return: list of the values in the same order, None for the ones that can't be read
+    """
+    values = []
+    lastNode = None
+    nodeValid = False
+    for mplug in plugs:
+        node = mplug.node()
+        if lastNode is None or node != lastNode:
+            lastNode = node
+            nodeValid = om2.MObjectHandle(node).isValid()
+        if not nodeValid:
+            values.append(None)
+            continue
 
-    # TYPED
-    elif apiType == om2.MFn.kTypedAttribute:
-        pType = om2.MFnTypedAttribute(pAttribute).attrType()
-        # Matrix
-        if pType == om2.MFnData.kMatrix:
-            return mpu_types.MATRIXF44
-        # String
-        elif pType == om2.MFnData.kString:
-            return mpu_types.STRING
+        getter = _plugAccessor(mplug).getter
+        values.append(getter(mplug) if getter is not None else None)
 
-    # MATRIX
-    elif apiType == om2.MFn.kMatrixAttribute:
-        return mpu_types.MATRIXF44
+    mpu_profiling.count("api.plugGet", len(values))
+    return values
 
-    # NUMBERS
-    elif apiType == om2.MFn.kNumericAttribute:
-        pType = om2.MFnNumericAttribute(pAttribute).numericType()
-        if pType == om2.MFnNumericData.kBoolean:
-            return mpu_types.BOOL
-
-        elif pType in [
-            om2.MFnNumericData.kShort,
-            om2.MFnNumericData.kInt,
-            om2.MFnNumericData.kLong,
-            om2.MFnNumericData.kByte,
-        ]:
-            return mpu_types.INT
-
-        elif pType in [
-            om2.MFnNumericData.kFloat,
-            om2.MFnNumericData.kDouble,
-            om2.MFnNumericData.kAddr,
-        ]:
-            return mpu_types.DOUBLE
 
-    # Enum
-    elif apiType == om2.MFn.kEnumAttribute:
-        return mpu_types.INT
+def getMPlugType(mplug):
+    # type: (MPlug) -> int
+    if not om2.MObjectHandle(mplug.node()).isValid():
+        return
 
-    elif apiType == om2.MFn.kMessageAttribute:
-        return mpu_types.MESSAGE
+    plugType = _plugAccessor(mplug).plugType
+    if isinstance(plugType, list):
+        return list(plugType)
+
+    return plugType
 
 
 def getMPlugFromLongName(nodeLongName, plugName):
@@ -237,41 +307,41 @@ def getMPlugChildFromLongName(nodeLongName, plugName, index):
 
 # <editor-fold desc="Set Plug functions">
 def setMPlugValue(mplug, value):
-    plugType = getMPlugType(mplug)
-    status = False
-    if plugType == "message":
-        return
+    """
+    :return: `bool` if the value was set. Compounds set their unconnected children and return False.
+    """
+    mpu_profiling.count("api.plugSet")
+    return _setValue(_plugAccessor(mplug), mplug, value)
 
-    pAttribute = mplug.attribute()
-    apiType = pAttribute.apiType()
-    if apiType in [om2.MFn.kAttribute3Double, om2.MFn.kAttribute3Float, om2.MFn.kCompoundAttribute]:
-        if mplug.isCompound:
-            for x in range(mplug.numChildren()):
-                if not mplug.child(x).isConnected:
-                    mplug.child(x).setFloat(value[x])
 
-    elif plugType == mpu_types.FLOAT:
-        mplug.setFloat(value)
-        status = True
+def setMPlugValues(plugs, values):
+    # type: (list, list) -> list
+    """
+    setMPlugValue() for a lot of plugs at once, eg: to restore a getMPlugValues() snapshot.
 
-    elif plugType == mpu_types.MATRIXF44:
-        pass
-        # mplug.setMatrix(value)
-        # status = True
+    :param plugs: sequence of `MPlug`, eg: an MPlugArray
+    :param values: sequence of the values, one per plug
+    :return: list of `bool` if each value was set
+    """
+    if len(plugs) != len(values):
+        raise ValueError(
+            "Got {} values for {} plugs!".format(len(values), len(plugs))
+        )
 
-    elif plugType == mpu_types.INT:
-        mplug.setInt(value)
-        status = True
+    mpu_profiling.count("api.plugSet", len(plugs))
+    return [
+        _setValue(_plugAccessor(mplug), mplug, value)
+        for mplug, value in zip(plugs, values)
+    ]
 
-    elif plugType == mpu_types.BOOL:
-        mplug.setBool(value)
-        status = True
 
-    elif plugType == mpu_types.DOUBLE:
-        mplug.setDouble(value)
-        status = True
+def _setValue(accessor, mplug, value):
+    if accessor.setter is None:
+        return False
 
-    return status
+    accessor.setter(mplug, value)
+    ## The compounds set what they can child by child
+    return accessor.setter is not _setCompound
 # </editor-fold>
 
 
@@ -292,60 +362,89 @@ def fetchIndexedPlugData(mplug, plgData=None):
     eg:
         plgData = [[False, True, u'cvs[0]', 0], [True, False, u'jd_hermiteArrayCrv1.cvs', None]]
         plgData = [isElement, isChild, plugName, plgIdx], [isElement, isChild, plugName, plgIdx]]
+    Walks up from the plug a parent at a time, the plugName is the attribute's long name.
     """
-    logger.debug("Iter Ascendants: \t\t%s" % mplug.name())
     if plgData is None:
         plgData = list()
 
-    isIndexedMPlug = isMPlugIndexed(mplug)
-    currentPlug = [None] * 4
-    parentPlug = None
-
-    if isIndexedMPlug and mplug.isElement:
-        logger.debug("\t\t\t\t\t\t\t\tISELEMENT!")
-        partialName = mplug.partialName(False, False, False, False, True, True)
-        currentPlug[3] = mplug.logicalIndex()
-        logger.debug("\t\t\t\t\t\t\t\tarrayIndex: %s" % mplug.logicalIndex())
-
-    elif isIndexedMPlug and mplug.isChild:
-        logger.debug("\t\t\t\t\t\t\t\tISCHILD!")
-        partialName = mplug.partialName(False, False, False, False, True, True)
-        parentPlug = mplug.parent()
-        for x in range(parentPlug.numChildren()):
-            if parentPlug.child(x) == mplug:
-                logger.debug("\t\t\t\t\t\t\t\tchildIndex: %s" % x)
-                currentPlug[3] = x
-                break
-
-    else:
-        logger.debug("\t\t\t\t\t\t\t\tISFIRST!")
-        partialName = mplug.partialName(False, False, False, False, True, True)
-
-    # And because maya is  DICK and can still leave a [0] in the name.. lets split if we find one.. grrr
-    if "." in partialName:
-        partialName = partialName.split(".")[-1]
+    while True:
+        isElement = mplug.isElement
+        isChild = mplug.isChild
+        attribute = mplug.attribute()
+        parentPlug = None
+        plgIdx = None
+        if isElement:
+            plgIdx = mplug.logicalIndex()
+        elif isChild:
+            parentPlug = mplug.parent()
+            plgIdx = _childIndex(parentPlug, attribute)
+
+        plgData.append([isElement, isChild, om2.MFnAttribute(attribute).name, plgIdx])
+        # Now keep going up the line cause we want the full path to the connected plug which might be a
+        # compound.child(0).array(0) etc
+        if parentPlug is None:
+            logger.debug("plgData: %s", plgData)
+            return plgData
+
+        mplug = parentPlug
+
+
+def _childIndex(parentPlug, attribute):
+    """
+    :param parentPlug: `MPlug` compound
+    :param attribute: `MObject` attribute of one of its children
+    :return: `int` index of the child, None if it isn't one
+    """
+    mFnCompound = om2.MFnCompoundAttribute(parentPlug.attribute())
+    for x in range(mFnCompound.numChildren()):
+        if mFnCompound.child(x) == attribute:
+            return x
 
-    if "[" in partialName:
-        partialName = partialName.split("[")[0]
 
-    currentPlug[0] = mplug.isElement
-    currentPlug[1] = mplug.isChild
-    currentPlug[2] = partialName
+def fetchMPlugFromConnectionData(nodeLongName, plugData):
+    """
+    Rebuilds the plug from fetchIndexedPlugData() plugData. The node is looked up by name once and the plug is
+    cached against the node and plugData, so fetching it again is a dict lookup. Renaming / reparenting any node
+    drops the names looked up, removing a node drops its plugs.
 
-    logger.debug("\t\t\t\t\t\t\t\tcurrentPlug: %s" % currentPlug)
-    plgData.append(currentPlug)
-    if parentPlug is None:
-        logger.debug("\t\t\t\t\t\t\t\tPLUG IS NEITHER ELEMENT OR CHILD.")
-        logger.debug("\t\t\t\t\t\t\t\tPLGDATA: %s" % plgData)
-        logger.debug("###########")
-        return plgData
+    :param nodeLongName: `str`
+    :param plugData: list from fetchIndexedPlugData()
+    :return: `MPlug`
+    """
+    handle = getNodeHandle(nodeLongName)
+    if handle is None:
+        return _walkPlugData(nodeLongName, plugData)
+
+    key = (handle.hashCode(), tuple(tuple(p) for p in plugData))
+    cached = _PLUG_PATHS.get(key)
+    if cached is not None and cached[0] == handle and cached[0].isValid():
+        mpu_profiling.count("cache.plugPath.hit")
+        _PLUG_PATHS.move_to_end(key)
+        return om2.MPlug(cached[1])
+
+    mpu_profiling.count("cache.plugPath.miss")
+    mPlug = _walkPlugData(nodeLongName, plugData, handle=handle)
+    if mPlug.isNull:
+        return mPlug
+
+    _PLUG_PATHS[key] = (handle, om2.MPlug(mPlug))
+    _PLUG_PATH_KEYS.setdefault(key[0], set()).add(key)
+    if len(_PLUG_PATHS) > PLUG_PATH_CACHE_SIZE:
+        oldKey, _ = _PLUG_PATHS.popitem(last=False)
+        nodeKeys = _PLUG_PATH_KEYS.get(oldKey[0])
+        if nodeKeys is not None:
+            nodeKeys.discard(oldKey)
+            if not nodeKeys:
+                del _PLUG_PATH_KEYS[oldKey[0]]
 
-    # Now keep going up the line cause we want the full path to the connected plug which might be a
-    # compound.child(0).array(0) etc
-    return fetchIndexedPlugData(parentPlug, plgData)
+    return mPlug
 
 
-def fetchMPlugFromConnectionData(nodeLongName, plugData):
+def _walkPlugData(nodeLongName, plugData, handle=None):
+    """
+    :param handle: `MObjectHandle` of the node, None finds it by nodeLongName
+    :return: `MPlug`
+    """
     copyPlugData = plugData[:]
     mPlug = None
 
@@ -356,7 +455,10 @@ def fetchMPlugFromConnectionData(nodeLongName, plugData):
         logger.debug("\t%-- s %s %s %s" % (plgIsElement, plgIsChild, plgPlugName, plgIndex))
 
         if mPlug is None:
-            mPlug = getMPlugFromLongName(nodeLongName, plgPlugName)
+            if handle is None:
+                mPlug = getMPlugFromLongName(nodeLongName, plgPlugName)
+            else:
+                mPlug = findPlugOnNode(handle, plgPlugName)
             if plgIsElement:
                 mPlug = mPlug.elementByLogicalIndex(plgIndex)
             elif plgIsChild:
@@ -382,4 +484,72 @@ def fetchMPlugFromConnectionData(nodeLongName, plugData):
 
     logger.debug("FINAL PLUG %s" % mPlug.name())
     return mPlug
+
+
+def getNodeHandle(nodeLongName):
+    """
+    :param nodeLongName: `str`
+    :return: `MObjectHandle` from the cache, looked up and cached if it isn't there. None if there's no such node.
+    """
+    handle = _NODE_HANDLES.get(nodeLongName)
+    if handle is not None and handle.isValid():
+        mpu_profiling.count("cache.nodeHandle.hit")
+        _NODE_HANDLES.move_to_end(nodeLongName)
+        return handle
+
+    mpu_profiling.count("cache.nodeHandle.miss")
+    mSel = om2.MSelectionList()
+    try:
+        mSel.add(str(nodeLongName))
+        handle = om2.MObjectHandle(mSel.getDependNode(0))
+    except RuntimeError:
+        return None
+
+    _watchPlugPaths()
+    _NODE_HANDLES[nodeLongName] = handle
+    if len(_NODE_HANDLES) > PLUG_PATH_CACHE_SIZE:
+        _NODE_HANDLES.popitem(last=False)
+
+    return handle
+
+
+def clearPlugPathCache():
+    """
+    Drops the cached node handles and plugs and removes their callbacks, eg: when the plugin is unloaded. Every
+    plugin using them calls it on unload, the next lookup just fills the cache and adds the callbacks again.
+    """
+    _NODE_HANDLES.clear()
+    _PLUG_PATHS.clear()
+    _PLUG_PATH_KEYS.clear()
+    if _PLUG_PATH_CALLBACKS:
+        om2.MMessage.removeCallbacks(_PLUG_PATH_CALLBACKS)
+        del _PLUG_PATH_CALLBACKS[:]
+
+
+def _watchPlugPaths():
+    if _PLUG_PATH_CALLBACKS:
+        return
+
+    _PLUG_PATH_CALLBACKS.extend(
+        [
+            om2.MNodeMessage.addNameChangedCallback(om2.MObject(), _onNodeRenamed),
+            om2.MDagMessage.addParentAddedCallback(_onNodeReparented),
+            om2.MDGMessage.addNodeRemovedCallback(_onNodeRemoved),
+        ]
+    )
+
+
+def _onNodeRenamed(node, previousName, clientData):
+    ## The long names of everything under it change too
+    _NODE_HANDLES.clear()
+
+
+def _onNodeReparented(child, parent, clientData):
+    _NODE_HANDLES.clear()
+
+
+def _onNodeRemoved(node, clientData):
+    ## The names looked up for it fail isValid() from here on
+    for key in _PLUG_PATH_KEYS.pop(om2.MObjectHandle(node).hashCode(), ()):
+        _PLUG_PATHS.pop(key, None)
 # </editor-fold>
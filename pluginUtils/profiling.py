@@ -0,0 +1,295 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Nested phase timers and call counters for the commands' -profile report, and the peak memory measuring for their
+-memoryBudget.
+
+Nothing is recorded unless a Profiler is running. phase() hands back a shared do nothing context and count()
+returns straight away, so the calls stay in the code for good.
+
+Each thread times its phases under its own stack. The phases run on the pipeline threads (encode, file write,
+decode) start at the top level and overlap the main thread's, so the top level can add up to more than the run.
+
+usage:
+    with profiling.Profiler("saveSkinWeights") as profiler:
+        with profiling.phase("resolve selection"):
+            ...
+        profiling.count("api.getWeights")
+    profiler.write("C:/temp/saveProfile.json")
+"""
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+## The running Profiler, None when profiling is off
+_ACTIVE = None
+_END = object()
+
+
+class Phase(object):
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.children = OrderedDict()
+
+    def toDict(self):
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "calls": self.calls,
+            "children": [child.toDict() for child in self.children.values()],
+        }
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ("_profiler", "_name", "_phase", "_start")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._phase = self._profiler._push(self._name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self._profiler._pop(self._phase, time.perf_counter() - self._start)
+        return False
+
+
+class Profiler(object):
+    """
+    Times the phases run between start() and stop() as a tree, and counts the calls passed to count().
+    """
+
+    def __init__(self, command):
+        """
+        :param command: `str` name of the command being profiled, the root of the phase tree
+        """
+        self.command = command
+        self.root = Phase(command)
+        self.counters = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+        return False
+
+    def start(self):
+        global _ACTIVE
+        if _ACTIVE is not None and _ACTIVE is not self:
+            logger.warning(
+                "Already profiling {}, {} isn't profiled.".format(_ACTIVE.command, self.command)
+            )
+            return self
+
+        self._start = time.perf_counter()
+        _ACTIVE = self
+        return self
+
+    def stop(self):
+        global _ACTIVE
+        if _ACTIVE is not self:
+            return
+
+        _ACTIVE = None
+        self.root.seconds += time.perf_counter() - self._start
+        self.root.calls += 1
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = [self.root]
+        return stack
+
+    def _push(self, name):
+        stack = self._stack()
+        parent = stack[-1]
+        with self._lock:
+            phase = parent.children.get(name)
+            if phase is None:
+                phase = parent.children[name] = Phase(name)
+        stack.append(phase)
+
+        return phase
+
+    def _pop(self, phase, seconds):
+        stack = self._stack()
+        if stack[-1] is phase:
+            stack.pop()
+        with self._lock:
+            phase.seconds += seconds
+            phase.calls += 1
+
+    def count(self, name, calls=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + calls
+
+    def report(self):
+        """
+        :return: `dict` with the command, total seconds, the nested phases and the counters
+        """
+        with self._lock:
+            return {
+                "command": self.command,
+                "seconds": self.root.seconds,
+                "phases": [phase.toDict() for phase in self.root.children.values()],
+                "counters": dict(self.counters),
+            }
+
+    def write(self, filepath):
+        """
+        :param filepath: `str` path for the json report
+        """
+        with open(filepath, "w") as outfile:
+            json.dump(self.report(), outfile, indent=2)
+
+    def summary(self):
+        """
+        :return: `str` one line of the top level phases, slowest first
+        """
+        phases = sorted(self.root.children.values(), key=lambda p: p.seconds, reverse=True)
+        return "{} in {:.3f} secs: {}".format(
+            self.command,
+            self.root.seconds,
+            ", ".join("{} {:.3f}".format(p.name, p.seconds) for p in phases),
+        )
+
+
+def phase(name):
+    """
+    :param name: `str` phase name, the same name under the same parent adds up into one phase
+    :return: context manager timing the phase, nested in the phase it's entered from
+    """
+    if _ACTIVE is None:
+        return _NULL_TIMER
+    return _Timer(_ACTIVE, name)
+
+
+def count(name, calls=1):
+    """
+    :param name: `str` counter name, eg: "api.getWeights"
+    :param calls: `int` to add to the counter
+    """
+    if _ACTIVE is not None:
+        _ACTIVE.count(name, calls)
+
+
+def timedIter(iterable, name):
+    """
+    Times each item being pulled from iterable as the phase name, on the thread pulling them. eg: the time spent
+    waiting on a pipelined reader.
+
+    :return: generator of the items in iterable, closing it closes iterable
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            with phase(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+
+class PeakMemory(object):
+    """
+    Measures the peak python memory allocated, with tracemalloc, while it's entered. Only what python allocates is
+    traced, Maya's own arrays, eg: the MDoubleArray from getWeights(), aren't in it.
+    Tracing slows python allocations down a lot, so it's only for when it's asked for.
+
+    usage:
+        with profiling.PeakMemory() as memory:
+            ...
+        print(memory.summary(512 * 1024 * 1024))
+    """
+
+    def __init__(self, enabled=True):
+        """
+        :param enabled: `bool` False does nothing, so the with block doesn't need to change when it's not wanted
+        """
+        self.enabled = enabled
+        self.peak = 0
+        self._baseline = 0
+        self._started = False
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):
+            ## Already being traced, python 3.9+ can start the peak over from here
+            tracemalloc.reset_peak()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if not self.enabled:
+            return False
+
+        self.peak = max(tracemalloc.get_traced_memory()[1] - self._baseline, 0)
+        if self._started:
+            tracemalloc.stop()
+
+        return False
+
+    def summary(self, memoryBudget=None):
+        """
+        :param memoryBudget: `int` bytes the run was meant to stay under
+        :return: `str` one line of the peak, against the budget if there is one
+        """
+        message = "Peak python memory {:.1f} MB".format(self.peak / 1048576.0)
+        if memoryBudget:
+            message += " of the {:.1f} MB budget".format(memoryBudget / 1048576.0)
+            if self.peak > memoryBudget:
+                message += ", over budget!"
+
+        return message
+
+
+def isProfiling():
+    return _ACTIVE is not None
+
+
+def writeReport(profiler, filepath):
+    """
+    Used by the commands' -profile flag.
+
+    :param profiler: `Profiler` that has been stopped
+    :param filepath: `str` path for the json report. Empty to return the json instead of writing it.
+    :return: `str` message for the command to display
+    """
+    if not filepath:
+        return json.dumps(profiler.report())
+
+    profiler.write(filepath)
+    return "Profile written to {}. {}".format(filepath, profiler.summary())
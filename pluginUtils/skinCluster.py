@@ -1,15 +1,34 @@
 #  Copyright (c) 2020.  James B Dunlop
 import logging
+from collections import OrderedDict
 
 import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
 import maya.cmds as cmds
 
 import pluginUtils.skinCluster as mPlugUtils_skin
 import pluginUtils.plugs as mPlugUtils_plugs
+import pluginUtils.profiling as mPlugUtils_profiling
+from pluginUtils.weightData import SkinWeightData
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 
+## SkinClusterInfo per skinCluster, keyed by MObjectHandle.hashCode()
+_SKIN_CLUSTER_INFO = {}
+_INFLUENCE_NAME_CALLBACK = []
+
+## The attributes the geometry comes in on, walking up the deformer history
+_GEOMETRY_INPUTS = ("inMesh", "create", "inputGeometry", "inputPolymesh")
+
+## Dense (vertices x influences) copies of a chunk alive at once. Reading: getWeights()' MDoubleArray and the
+## array copy of it. Setting: toDense()'s block, its MDoubleArray and the replaced weights setWeights() hands back.
+READ_DENSE_COPIES = 2
+SET_DENSE_COPIES = 3
+## Bytes per vertex / weight of a sparse chunk, see SkinWeightData
+SPARSE_ROW_BYTES = 8
+SPARSE_WEIGHT_BYTES = 10
+
 
 def iterForSkinCluster(node):
     """
@@ -41,34 +60,144 @@ def findSkinCluster(mesh):
         logger.warning("Destination mesh MObject is no longer valid!")
         return
 
-    dagPath = om2.MDagPath()
-    geo = dagPath.getAPathTo(mesh.object())
-
-    ## Does it have a valid number of shapes?
-    if geo.numberOfShapesDirectlyBelow() != 0:
-        ## Fetch the shape of the geo now.
-        shapeMobj = geo.extendToShape().node()
-        mFn_shape = om2.MFnDependencyNode(shapeMobj)
-        apiType = shapeMobj.apiType()
-        if apiType == om2.MFn.kMesh:
-            ## Look at the inMesh attr for the source
-            inMesh_attr = mFn_shape.attribute("inMesh")
-        elif apiType == om2.MFn.kNurbsCurve:
-            inMesh_attr = mFn_shape.attribute("create")
-        else:
+    selList = om2.MSelectionList()
+    selList.add(mesh.object())
+    for skinClusters in findSkinClusters(selList).values():
+        if skinClusters:
+            return skinClusters[0]
+
+
+def findSkinClusters(selectionList):
+    """
+    Finds the skinClusters for all the geo in one pass. The geometry history of each shape is walked upstream
+    and every node visited is memoized, so geo sharing history (or a skinCluster deforming several shapes)
+    is only walked once.
+
+    :param selectionList: `MSelectionList` of geo transforms or shapes
+    :return: `OrderedDict` of geo full path name: list of skinCluster `MObjectHandle`, nearest the shape first.
+             In selection order, geo with no skinCluster maps to an empty list.
+    """
+    memo = {}
+    skinClusters = OrderedDict()
+    with mPlugUtils_profiling.phase("find skinClusters"):
+        for x in range(selectionList.length()):
+            geo = om2.MDagPath.getAPathTo(selectionList.getDependNode(x))
+            geoName = geo.fullPathName()
+            if geoName in skinClusters:
+                continue
+
+            skinClusters[geoName] = []
+            if geo.apiType() not in (om2.MFn.kMesh, om2.MFn.kNurbsCurve):
+                geo = _findShape(geo)
+                ## Does it have a valid shape?
+                if geo is None:
+                    continue
+
+            shapeMobj = geo.node()
+            apiType = shapeMobj.apiType()
+            if apiType not in (om2.MFn.kMesh, om2.MFn.kNurbsCurve):
+                logger.warning(
+                    "This type of om2.MFn node is not supported! int: {}".format(apiType)
+                )
+                continue
+
+            skinClusters[geoName] = list(_historySkinClusters(shapeMobj, memo))
+
+    return skinClusters
+
+
+def _findShape(transformPath):
+    """
+    :param transformPath: `MDagPath` to a transform
+    :return: `MDagPath` to its first mesh / nurbsCurve shape that isn't an intermediate object, else its first
+             shape that isn't, so the caller can warn about it. None if it has no shapes.
+    """
+    shapes = []
+    for x in range(transformPath.numberOfShapesDirectlyBelow()):
+        shapePath = om2.MDagPath(transformPath)
+        try:
+            shapePath.extendToShape(x)
+        except RuntimeError as e:
             logger.warning(
-                "This type of om2.MFn node is not supported! int: {}".format(apiType)
+                "Skipping shape {} of {}: {}".format(x, transformPath.fullPathName(), e)
             )
-            return
+            continue
+
+        if om2.MFnDagNode(shapePath).isIntermediateObject:
+            continue
+        if shapePath.apiType() in (om2.MFn.kMesh, om2.MFn.kNurbsCurve):
+            return shapePath
+        shapes.append(shapePath)
 
-        inMesh_plug = om2.MPlug(shapeMobj, inMesh_attr)
-        getSource = inMesh_plug.source().node()
+    return shapes[0] if shapes else None
 
-        ## Now use the iterForSkinCluster() function to find the skinCluster in the connected network.
-        skinClusterNode_MObjH = iterForSkinCluster(getSource)
 
-        if skinClusterNode_MObjH is not None:
-            return skinClusterNode_MObjH
+def _geometryInputPlug(node, outputPlug=None):
+    """
+    :param node: `MObject` in the geometry history
+    :param outputPlug: `MPlug` on node the walk came in through, picks the deformer input for that output
+    :return: `MPlug` the geometry comes into node on, None at the end of the history
+    """
+    mFn = om2.MFnDependencyNode(node)
+    if node.hasFn(om2.MFn.kGeometryFilt):
+        index = 0
+        if outputPlug is not None and outputPlug.isElement:
+            index = outputPlug.logicalIndex()
+        return mFn.findPlug("input", False).elementByLogicalIndex(index).child(
+            mFn.attribute("inputGeometry")
+        )
+
+    for attrName in _GEOMETRY_INPUTS:
+        if mFn.hasAttribute(attrName):
+            return mFn.findPlug(attrName, False)
+
+
+def _historyKey(node, outputPlug):
+    """
+    A deformer's history depends on which of its outputs the walk came in through, eg: a lattice deforming
+    several skinned meshes has a different skinCluster upstream of each input.
+
+    :return: (`int` MObjectHandle.hashCode(), `int` the input followed upstream)
+    """
+    index = 0
+    if node.hasFn(om2.MFn.kGeometryFilt) and outputPlug.isElement:
+        index = outputPlug.logicalIndex()
+
+    return om2.MObjectHandle(node).hashCode(), index
+
+
+def _historySkinClusters(shapeMobj, memo):
+    """
+    :param memo: `dict` of _historyKey(): skinClusters upstream of that node / input, filled in as we go
+    :return: tuple of skinCluster `MObjectHandle`, nearest the shape first
+    """
+    chain = []
+    visited = set()
+    found = ()
+    plug = _geometryInputPlug(shapeMobj)
+    while plug is not None:
+        source = plug.source()
+        if source.isNull:
+            break
+
+        node = source.node()
+        key = _historyKey(node, source)
+        if key in memo:
+            found = memo[key]
+            break
+        if key in visited:
+            break
+
+        visited.add(key)
+        chain.append((key, node))
+        plug = _geometryInputPlug(node, source)
+
+    for key, node in reversed(chain):
+        if node.hasFn(om2.MFn.kSkinClusterFilter):
+            found = (om2.MObjectHandle(node),) + found
+        memo[key] = found
+
+    return found
 
 
 def findInfluences(skinClusterMobjH=None):
@@ -76,97 +205,641 @@ def findInfluences(skinClusterMobjH=None):
     returns all the valid influences from the .matrix attribute on the skinCluster node.
 
     :param mesh: MObjectHandle for the skinCluster. Using the handles here may be playing it a little too safe. But meh.
-    :return: MObject
+    :return: list of `str` influence names, namespace stripped
     """
     if not skinClusterMobjH.isValid():
         logger.warning("Skincluster is no longer valid! Did it get deleted?")
         return
 
-    skClsMFnDep = om2.MFnDependencyNode(skinClusterMobjH.object())
-    mtxAttr = skClsMFnDep.attribute("matrix")
-    matrixPlug = om2.MPlug(skinClusterMobjH.object(), mtxAttr)
+    return list(getSkinClusterInfo(skinClusterMobjH).influences)
 
-    ## Get a list of all the valid connected indices in the matrix array now.
-    indices = matrixPlug.getExistingArrayAttributeIndices()
-    influences = []
-    for idx in indices:
-        name = om2.MFnDependencyNode(
-            matrixPlug.elementByLogicalIndex(idx).source().node()
-        ).absoluteName()
-        influences.append(str(om2.MNamespace.stripNamespaceFromName(name)))
 
-    return influences
+class SkinClusterInfo(object):
+    """
+    The .matrix logical index <-> influence maps for a skinCluster. Get these through getSkinClusterInfo() so they
+    are only built once and shared by all the commands. The cached info is dropped when a .matrix connection
+    changes, an influence is renamed or the skinCluster is removed.
 
+    The lists are in influence position order, ie: the column order of MFnSkinCluster.getWeights()
+    """
 
-def fetchSkinWeights(geo=None, skipZeroWeights=True):
+    def __init__(self, skinClusterMObjH):
+        self.handle = skinClusterMObjH
+        self._callbacks = []
+        try:
+            self._build()
+        except RuntimeError:
+            self._buildFromPlugs()
+
+    def _reset(self):
+        self.influences = []
+        self.logicalIndices = []
+        self.influenceObjects = []
+        self.positionByLogicalIndex = {}
+        self.nameByLogicalIndex = {}
+        self.logicalIndexByName = {}
+        self._influenceHashes = set()
+
+    def _build(self):
+        self._reset()
+        mFnSkin = oma2.MFnSkinCluster(self.handle.object())
+        influencePaths = mFnSkin.influenceObjects()
+        for x in range(len(influencePaths)):
+            self._addInfluence(
+                mFnSkin.indexForInfluenceObject(influencePaths[x]),
+                influencePaths[x].node(),
+            )
+
+    def _buildFromPlugs(self):
+        self._reset()
+        matrixPlug = mPlugUtils_plugs.findPlugOnNode(self.handle, "matrix")
+        if matrixPlug.isNull:
+            logger.warning(".matrix plug not found on skinCluster!")
+            return
+
+        for idx in matrixPlug.getExistingArrayAttributeIndices():
+            source = matrixPlug.elementByLogicalIndex(idx).source()
+            if source.isNull:
+                continue
+            self._addInfluence(idx, source.node())
+
+    def _addInfluence(self, logicalIndex, mobj):
+        name = str(
+            om2.MNamespace.stripNamespaceFromName(om2.MFnDependencyNode(mobj).name())
+        )
+        self.positionByLogicalIndex[logicalIndex] = len(self.influences)
+        self.influences.append(name)
+        self.logicalIndices.append(logicalIndex)
+        self.influenceObjects.append(mobj)
+        self.nameByLogicalIndex[logicalIndex] = name
+        self.logicalIndexByName[name] = logicalIndex
+        self._influenceHashes.add(om2.MObjectHandle(mobj).hashCode())
+
+    def isValid(self):
+        return self.handle.isValid()
+
+    def hasInfluence(self, mobj):
+        return om2.MObjectHandle(mobj).hashCode() in self._influenceHashes
+
+    def watch(self):
+        node = self.handle.object()
+        self._callbacks = [
+            om2.MNodeMessage.addAttributeChangedCallback(
+                node, _onSkinClusterAttributeChanged, self.handle.hashCode()
+            ),
+            om2.MNodeMessage.addNodePreRemovalCallback(
+                node, _onSkinClusterRemoved, self.handle.hashCode()
+            ),
+        ]
+
+    def unwatch(self):
+        if self._callbacks:
+            om2.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+
+def getSkinClusterInfo(skinClusterMObjH):
     """
-    If you send in a list of geo, we'll use that. Else we assume we're working off selected.
+    :param skinClusterMObjH: `MObjectHandle` for the skinCluster
+    :return: `SkinClusterInfo` from the cache, built and cached if there isn't one yet
+    """
+    key = skinClusterMObjH.hashCode()
+    info = _SKIN_CLUSTER_INFO.get(key)
+    if info is not None:
+        if info.isValid() and info.handle == skinClusterMObjH:
+            mPlugUtils_profiling.count("cache.skinClusterInfo.hit")
+            return info
+        invalidateSkinClusterInfo(key)
+
+    mPlugUtils_profiling.count("cache.skinClusterInfo.miss")
+    with mPlugUtils_profiling.phase("influence info"):
+        info = SkinClusterInfo(skinClusterMObjH)
+    info.watch()
+    _SKIN_CLUSTER_INFO[key] = info
+    if not _INFLUENCE_NAME_CALLBACK:
+        _INFLUENCE_NAME_CALLBACK.append(
+            om2.MNodeMessage.addNameChangedCallback(
+                om2.MObject(), _onInfluenceNameChanged
+            )
+        )
 
-    :param geoList: MSelectionList of geo to itr
-    :param skipZeroWeights: if you want to avoid saving all 0.0 weight data
-    :return: dict
+    return info
+
+
+def invalidateSkinClusterInfo(key):
+    """
+    :param key: `int` MObjectHandle.hashCode() of the skinCluster
+    """
+    info = _SKIN_CLUSTER_INFO.pop(key, None)
+    if info is not None:
+        info.unwatch()
+
+
+def clearSkinClusterInfoCache():
+    """
+    Drops all the cached SkinClusterInfo and removes their callbacks, eg: when the plugin is unloaded.
+    """
+    for key in list(_SKIN_CLUSTER_INFO):
+        invalidateSkinClusterInfo(key)
+
+    if _INFLUENCE_NAME_CALLBACK:
+        om2.MMessage.removeCallbacks(_INFLUENCE_NAME_CALLBACK)
+        del _INFLUENCE_NAME_CALLBACK[:]
+
+
+def _onSkinClusterAttributeChanged(msg, plug, otherPlug, clientData):
+    if not msg & (
+        om2.MNodeMessage.kConnectionMade | om2.MNodeMessage.kConnectionBroken
+    ):
+        return
+
+    if om2.MFnAttribute(plug.attribute()).name == "matrix":
+        invalidateSkinClusterInfo(clientData)
+
+
+def _onSkinClusterRemoved(node, clientData):
+    invalidateSkinClusterInfo(clientData)
+
+
+def _onInfluenceNameChanged(node, previousName, clientData):
+    for key, info in list(_SKIN_CLUSTER_INFO.items()):
+        if info.hasInfluence(node):
+            invalidateSkinClusterInfo(key)
+
+
+def getGeometryComponents(dagPath, vertexIds=None):
+    """
+    Builds the single indexed vertex/cv component for the shape.
+
+    :param dagPath: `MDagPath` to the kMesh or kNurbsCurve shape
+    :param vertexIds: list of `int` ids. None for all of them.
+    :return: `MObject`
     """
-    weightData = {}
-    for x in range(geo.length()):
-        geoMObjH = om2.MObjectHandle(geo.getDependNode(x))
-        geoName = om2.MNamespace.stripNamespaceFromName(
-            om2.MFnDependencyNode(geoMObjH.object()).name()
+    apiType = dagPath.apiType()
+    if apiType == om2.MFn.kMesh:
+        componentType = om2.MFn.kMeshVertComponent
+    elif apiType == om2.MFn.kNurbsCurve:
+        componentType = om2.MFn.kCurveCVComponent
+    else:
+        logger.warning(
+            "This type of om2.MFn node is not supported! int: {}".format(apiType)
         )
-        skinClusterMObjH = findSkinCluster(geoMObjH)
-        if skinClusterMObjH is None:
-            logger.warning("Skipping {} has no skinCluster!".format(geoName))
-            continue
+        return
 
-        skName = str(
-            om2.MNamespace.stripNamespaceFromName(
-                om2.MFnDependencyNode(skinClusterMObjH.object()).name()
-            )
+    mFnComponent = om2.MFnSingleIndexedComponent()
+    components = mFnComponent.create(componentType)
+    if vertexIds is None:
+        mFnComponent.setCompleteData(om2.MItGeometry(dagPath).count())
+    else:
+        mFnComponent.addElements(list(vertexIds))
+
+    return components
+
+
+def getSkinClusterGeometry(skinClusterMObjH):
+    """
+    :param skinClusterMObjH: `MObjectHandle` for the skinCluster
+    :return: `MDagPath` to the deformed shape
+    """
+    mFnSkin = oma2.MFnSkinCluster(skinClusterMObjH.object())
+    return mFnSkin.getPathAtIndex(mFnSkin.indexForOutputConnection(0))
+
+
+def rowsForBudget(memoryBudget, influenceCount, denseCopies, sparseChunks=0):
+    """
+    How many vertices a chunk can hold so that working on it stays under memoryBudget. That's denseCopies of the
+    (vertices x influences) block plus sparseChunks of it, taking the worst case of every influence weighted.
+
+    :param memoryBudget: `int` bytes
+    :param influenceCount: `int` influences on the skinCluster, the width of the dense block
+    :param denseCopies: `int` READ_DENSE_COPIES or SET_DENSE_COPIES
+    :param sparseChunks: `int` sparse chunks held at the same time, eg: queued for writing
+    :return: `int` vertices per chunk, at least 1
+    """
+    influenceCount = max(influenceCount, 1)
+    rowBytes = denseCopies * 8 * influenceCount + sparseChunks * (
+        SPARSE_ROW_BYTES + SPARSE_WEIGHT_BYTES * influenceCount
+    )
+
+    return max(int(memoryBudget // rowBytes), 1)
+
+
+def fetchSkinClusterWeights(skinClusterMObjH, geoName, skName, skipZeroWeights=True):
+    """
+    Pulls the weights for the whole skinCluster in one MFnSkinCluster.getWeights() call.
+    Falls back to walking the weightList plugs if the bulk call can't be used.
+
+    :param skinClusterMObjH: `MObjectHandle` for the skinCluster
+    :param geoName: `str` name to store the data against
+    :param skName: `str` skinCluster name to store the data against
+    :param skipZeroWeights: if you want to avoid saving all 0.0 weight data
+    :return: `SkinWeightData`
+    """
+    return next(
+        iterSkinClusterWeights(
+            skinClusterMObjH, geoName, skName, skipZeroWeights=skipZeroWeights
+        ),
+        None,
+    )
+
+
+def iterSkinClusterWeights(
+    skinClusterMObjH,
+    geoName,
+    skName,
+    skipZeroWeights=True,
+    chunkRows=None,
+    memoryBudget=None,
+    heldChunks=0,
+):
+    """
+    Same as fetchSkinClusterWeights() but reads the vertices chunkRows at a time with a getWeights() call per chunk,
+    so only one chunk of weights needs to be held in memory. All the chunks share the same influences.
+
+    :param chunkRows: `int` number of vertices per chunk. None reads them all in one go.
+    :param memoryBudget: `int` bytes. Caps chunkRows, from this skinCluster's influence count, so reading a chunk
+                         stays under it. See rowsForBudget().
+    :param heldChunks: `int` earlier chunks the caller holds on to while the next is read, eg: queued for writing
+    :return: generator of `SkinWeightData`, always at least one for a valid skinCluster
+    """
+    maxInf = cmds.skinCluster(skName, q=True, maximumInfluences=True)
+    try:
+        mFnSkin = oma2.MFnSkinCluster(skinClusterMObjH.object())
+        shapePath = getSkinClusterGeometry(skinClusterMObjH)
+        if getGeometryComponents(shapePath, []) is None:
+            raise RuntimeError("Unsupported geometry for getWeights!")
+
+        info = getSkinClusterInfo(skinClusterMObjH)
+        influences = info.influences
+        logicalIndices = info.logicalIndices
+        vertexCount = om2.MItGeometry(shapePath).count()
+    except RuntimeError as e:
+        logger.warning(
+            "Bulk weight read failed for {}, falling back to plugs: {}".format(skName, e)
         )
+        with mPlugUtils_profiling.phase("read weights from plugs"):
+            data = _fetchSkinClusterWeightsFromPlugs(
+                skinClusterMObjH, geoName, skName, maxInf, skipZeroWeights
+            )
+        if data is not None:
+            yield data
+        return
 
-        influences = findInfluences(skinClusterMObjH)
-        ## Add the data to the dict
-        weightData[geoName] = {}
-        weightData[geoName][skName] = {}
-        weightData[geoName][skName]["influences"] = influences
-        weightData[geoName][skName]["maxInf"] = cmds.skinCluster(
-            skName, q=True, maximumInfluences=True
+    if memoryBudget:
+        budgetRows = rowsForBudget(
+            memoryBudget, len(influences), READ_DENSE_COPIES, heldChunks + 1
         )
-        weightData[geoName][skName]["weights"] = {}
+        chunkRows = min(chunkRows or budgetRows, budgetRows)
+
+    if not chunkRows or chunkRows >= vertexCount:
+        chunkRows = max(vertexCount, 1)
+
+    for start in range(0, max(vertexCount, 1), chunkRows):
+        end = min(start + chunkRows, vertexCount)
+        data = SkinWeightData(geoName, skName, influences, logicalIndices, maxInf=maxInf)
+        if end > start:
+            with mPlugUtils_profiling.phase("read weights"):
+                if start == 0 and end == vertexCount:
+                    components = getGeometryComponents(shapePath)
+                else:
+                    components = getGeometryComponents(shapePath, range(start, end))
+                mPlugUtils_profiling.count("api.getWeights")
+                weights, numInf = mFnSkin.getWeights(shapePath, components)
+                data.addDenseRows(
+                    range(start, end), weights, skipZeroWeights=skipZeroWeights
+                )
+
+        yield data
 
-        ## Fetch the weights now
-        weightPlug = mPlugUtils_plugs.findPlugOnNode(skinClusterMObjH, "weightList")
-        matrixPlug = mPlugUtils_plugs.findPlugOnNode(skinClusterMObjH, "matrix")
-        if weightPlug.isNull or matrixPlug.isNull:
-            logger.warning(".weightList or .matrix plug not found on skinCluster!")
-            return
 
-        weightCount = weightPlug.getExistingArrayAttributeIndices()
-        for x in range(len(weightCount)):
-            # .weightList[x]
-            p = weightPlug.elementByLogicalIndex(weightCount[x])
-            # .weights
-            c = p.child(0)
-
-            ## Now fetch the list of idx numbers that should relate to the inf [23, 66, 99]
-            w = c.getExistingArrayAttributeIndices()
-
-            ## For each idx we're going to build a tuple (idx, infName, weightVal)
-            weightList = list()
-            for i in range(len(w)):
-                childPlug = c.elementByLogicalIndex(w[i])
-                weightValue = mPlugUtils_plugs.getMPlugValue(childPlug)
+def _fetchSkinClusterWeightsFromPlugs(
+    skinClusterMObjH, geoName, skName, maxInf, skipZeroWeights=True
+):
+    """
+    The slow path. Walks weightList[v].weights[i] one plug at a time.
+
+    :return: `SkinWeightData`
+    """
+    weightPlug = mPlugUtils_plugs.findPlugOnNode(skinClusterMObjH, "weightList")
+    matrixPlug = mPlugUtils_plugs.findPlugOnNode(skinClusterMObjH, "matrix")
+    if weightPlug.isNull or matrixPlug.isNull:
+        logger.warning(".weightList or .matrix plug not found on skinCluster!")
+        return
+
+    info = getSkinClusterInfo(skinClusterMObjH)
+    data = SkinWeightData(
+        geoName, skName, info.influences, info.logicalIndices, maxInf=maxInf
+    )
+    columnsByLogicalIndex = dict(info.positionByLogicalIndex)
+
+    weightCount = weightPlug.getExistingArrayAttributeIndices()
+    for x in range(len(weightCount)):
+        # .weightList[x]
+        p = weightPlug.elementByLogicalIndex(weightCount[x])
+        # .weights
+        c = p.child(0)
+
+        ## Now fetch the list of idx numbers that should relate to the inf [23, 66, 99]
+        w = c.getExistingArrayAttributeIndices()
+
+        columns = []
+        values = []
+        weightValues = mPlugUtils_plugs.getMPlugValues(
+            [c.elementByLogicalIndex(w[i]) for i in range(len(w))]
+        )
+        for i, weightValue in enumerate(weightValues):
+            if skipZeroWeights and weightValue == 0.0:
+                continue
+
+            column = columnsByLogicalIndex.get(w[i])
+            if column is None:
                 infName = om2.MNamespace.stripNamespaceFromName(
                     om2.MFnDagNode(
                         matrixPlug.elementByLogicalIndex(w[i]).source().node()
                     ).name()
                 )
+                column = data.addInfluence(str(infName), w[i])
+                columnsByLogicalIndex[w[i]] = column
+
+            columns.append(column)
+            values.append(weightValue)
+
+        data.addRow(weightCount[x], columns, values)
+
+    return data
 
-                if skipZeroWeights and weightValue == 0.0:
-                    continue
 
-                idx = w[i]
-                weightList.append((idx, weightValue, infName))
+def iterSkinWeightData(
+    geo=None,
+    skipZeroWeights=True,
+    chunkRows=None,
+    memoryBudget=None,
+    heldChunks=0,
+    skinClustersByGeo=None,
+):
+    """
+    :param geo: MSelectionList of geo to itr
+    :param skipZeroWeights: if you want to avoid saving all 0.0 weight data
+    :param chunkRows: `int` number of vertices read per chunk. None reads each skinCluster in one go.
+    :param memoryBudget: `int` bytes to size each skinCluster's chunks to, see iterSkinClusterWeights()
+    :param heldChunks: `int` chunks the caller holds on to while the next is read
+    :param skinClustersByGeo: `OrderedDict` from findSkinClusters() if the caller already has it, geo is ignored
+    :return: generator of iterSkinClusterWeights() chunk generators, one per skinCluster
+    """
+    if skinClustersByGeo is None:
+        skinClustersByGeo = findSkinClusters(geo)
+
+    for geoPath, skinClusters in skinClustersByGeo.items():
+        geoName = om2.MNamespace.stripNamespaceFromName(geoPath.split("|")[-1])
+        if not skinClusters:
+            logger.warning("Skipping {} has no skinCluster!".format(geoName))
+            continue
+
+        for skinClusterMObjH in skinClusters:
+            skName = str(
+                om2.MNamespace.stripNamespaceFromName(
+                    om2.MFnDependencyNode(skinClusterMObjH.object()).name()
+                )
+            )
+
+            yield iterSkinClusterWeights(
+                skinClusterMObjH,
+                geoName,
+                skName,
+                skipZeroWeights=skipZeroWeights,
+                chunkRows=chunkRows,
+                memoryBudget=memoryBudget,
+                heldChunks=heldChunks,
+            )
 
-            weightData[geoName][skName]["weights"][str(x)] = weightList
+
+def fetchSkinWeightData(geo=None, skipZeroWeights=True):
+    """
+    :param geo: MSelectionList of geo to itr
+    :param skipZeroWeights: if you want to avoid saving all 0.0 weight data
+    :return: list of `SkinWeightData`, one per skinCluster
+    """
+    weightData = []
+    for chunks in iterSkinWeightData(geo=geo, skipZeroWeights=skipZeroWeights):
+        data = next(chunks, None)
+        if data is None:
+            return
+
+        weightData.append(data)
 
     return weightData
+
+
+def fetchSkinWeights(geo=None, skipZeroWeights=True):
+    """
+    If you send in a list of geo, we'll use that. Else we assume we're working off selected.
+
+    :param geoList: MSelectionList of geo to itr
+    :param skipZeroWeights: if you want to avoid saving all 0.0 weight data
+    :return: dict
+    """
+    weightData = fetchSkinWeightData(geo=geo, skipZeroWeights=skipZeroWeights)
+    if weightData is None:
+        return
+
+    ## Add the data to the dict
+    data = {}
+    for skData in weightData:
+        data.setdefault(skData.geoName, {})[skData.skinCluster] = skData.toDict()
+
+    return data
+
+
+def buildInfluenceRemap(skinClusterMObjH, data, nameCheck=False):
+    """
+    Works out where each saved influence goes once per skinCluster, so the weights themselves are only remapped by
+    column when they're expanded for setWeights.
+
+    :param skinClusterMObjH: `MObjectHandle` for the skinCluster being loaded onto
+    :param data: `SkinWeightData` being loaded
+    :param nameCheck: `bool` find the influence by name where the saved logical index holds a different influence
+    :return: (list of `int` .matrix logical index for each influence column, SkinWeightData.NO_INDEX if the
+             influence isn't on the skinCluster, list of `str` the missing influences)
+    """
+    with mPlugUtils_profiling.phase("influence mapping"):
+        info = getSkinClusterInfo(skinClusterMObjH)
+        targets = []
+        missing = []
+        for column, infName in enumerate(data.influences):
+            logicalIndex = data.logicalIndices[column]
+            if nameCheck and info.nameByLogicalIndex.get(logicalIndex) != infName:
+                logicalIndex = info.logicalIndexByName.get(infName, SkinWeightData.NO_INDEX)
+            elif logicalIndex not in info.positionByLogicalIndex:
+                logicalIndex = SkinWeightData.NO_INDEX
+
+            if logicalIndex == SkinWeightData.NO_INDEX:
+                missing.append(infName)
+            targets.append(logicalIndex)
+
+    return targets, missing
+
+
+class WeightsSnapshot(object):
+    """
+    The weights of some vertices on a skinCluster, put back with one bulk MFnSkinCluster.setWeights() call.
+    They're held as a sparse SkinWeightData and only expanded to the dense (vertices x influences) block to restore,
+    so an undo record is a few weights a vertex instead of one per influence.
+    """
+
+    def __init__(self, skinClusterMObjH, shapePath, components, influences, weights, targets=None):
+        """
+        :param skinClusterMObjH: `MObjectHandle` for the skinCluster
+        :param shapePath: `MDagPath` to the deformed shape
+        :param components: `MObject` the vertex components
+        :param influences: `MIntArray` influence positions the weights are for
+        :param weights: `SkinWeightData`, or a vertex major `MDoubleArray` to compact()
+        :param targets: list of `int` influence position for each column of weights. None if they're the same.
+        """
+        self.skinClusterMObjH = skinClusterMObjH
+        self.shapePath = shapePath
+        self.components = components
+        self.influences = influences
+        self.weights = weights
+        self.targets = targets
+
+    def compact(self):
+        """
+        Swaps dense weights for a sparse SkinWeightData of the non zero ones, it's expanded again to restore.
+        """
+        if isinstance(self.weights, SkinWeightData):
+            return
+
+        width = len(self.influences)
+        sparse = SkinWeightData("", "", range(width), range(width))
+        sparse.addDenseRows(range(len(self.weights) // max(width, 1)), self.weights)
+        self.weights = sparse
+        self.targets = None
+
+    def byteSize(self):
+        """
+        :return: `int` bytes held by the weights, see SkinWeightData.byteSize()
+        """
+        if isinstance(self.weights, SkinWeightData):
+            return self.weights.byteSize()
+
+        return 8 * len(self.weights)
+
+    def restore(self):
+        width = len(self.influences)
+        targets = self.targets
+        if targets is None:
+            targets = range(width)
+        weights = om2.MDoubleArray(self.weights.toDense(targets, width)[1])
+
+        mPlugUtils_profiling.count("api.setWeights")
+        mFnSkin = oma2.MFnSkinCluster(self.skinClusterMObjH.object())
+        mFnSkin.setWeights(self.shapePath, self.components, self.influences, weights, False)
+
+
+def setSkinClusterWeights(
+    skinClusterMObjH, data, targetLogicalIndices, rows=None, returnOldWeights=False
+):
+    """
+    Writes the weights with a single MFnSkinCluster.setWeights() call with normalize off.
+    Every influence on the skinCluster is written for the vertices, so any existing weights are zeroed.
+    Falls back to setting the weightList plugs if the bulk call can't be used.
+
+    :param skinClusterMObjH: `MObjectHandle` for the skinCluster
+    :param data: `SkinWeightData` to apply
+    :param targetLogicalIndices: list of `int` .matrix logical index to write each influence column to. -1 skips it.
+    :param rows: list of `int` rows of the data to apply. None for all of them.
+    :param returnOldWeights: `bool` snapshot the weights being replaced, eg: to undo the load
+    :return: (`WeightsSnapshot` before, `WeightsSnapshot` after) with returnOldWeights, both sparse. None if
+             nothing was set, or the plugs had to be used, as there's no bulk way back from that.
+    """
+    if rows is None:
+        rows = range(len(data))
+    if not len(rows):
+        return
+
+    try:
+        with mPlugUtils_profiling.phase("set weights"):
+            mFnSkin = oma2.MFnSkinCluster(skinClusterMObjH.object())
+            shapePath = getSkinClusterGeometry(skinClusterMObjH)
+
+            info = getSkinClusterInfo(skinClusterMObjH)
+            positionByLogicalIndex = info.positionByLogicalIndex
+
+            targets = []
+            for logicalIndex in targetLogicalIndices:
+                if logicalIndex == SkinWeightData.NO_INDEX:
+                    targets.append(SkinWeightData.NO_INDEX)
+                elif logicalIndex in positionByLogicalIndex:
+                    targets.append(positionByLogicalIndex[logicalIndex])
+                else:
+                    raise RuntimeError(
+                        "No influence connected to .matrix[{}]!".format(logicalIndex)
+                    )
+
+            vertexIds, weights = data.toDense(targets, len(info.influences), rows)
+            components = getGeometryComponents(shapePath, vertexIds)
+            if components is None:
+                raise RuntimeError("Unsupported geometry for setWeights!")
+
+            influences = om2.MIntArray(list(range(len(info.influences))))
+            newWeights = om2.MDoubleArray(weights)
+            mPlugUtils_profiling.count("api.setWeights")
+            if not returnOldWeights:
+                mFnSkin.setWeights(shapePath, components, influences, newWeights, False)
+                return
+
+            oldWeights = mFnSkin.setWeights(
+                shapePath, components, influences, newWeights, False, True
+            )
+            before = WeightsSnapshot(
+                skinClusterMObjH, shapePath, components, influences, oldWeights
+            )
+            before.compact()
+            ## Redo expands a sparse copy of just the rows set, rather than holding another dense copy or the
+            ## whole record
+            after = WeightsSnapshot(
+                skinClusterMObjH, shapePath, components, influences, data.subset(rows), targets
+            )
+            return before, after
+    except RuntimeError as e:
+        logger.warning(
+            "Bulk weight write failed for {}, falling back to plugs: {}".format(
+                data.skinCluster, e
+            )
+        )
+        with mPlugUtils_profiling.phase("set weights from plugs"):
+            _setSkinClusterWeightsFromPlugs(
+                skinClusterMObjH, data, targetLogicalIndices, rows
+            )
+
+
+def _setSkinClusterWeightsFromPlugs(skinClusterMObjH, data, targetLogicalIndices, rows):
+    """
+    The slow path. Zeroes then sets weightList[v].weights[i] one plug at a time.
+    """
+    weightPlug = mPlugUtils_plugs.findPlugOnNode(skinClusterMObjH, "weightList")
+    if weightPlug.isNull:
+        logger.warning(".weightList plug not found on skinCluster!")
+        return
+
+    offsets = data.offsets
+    plugSets = 0
+    for r in rows:
+        p = weightPlug.elementByLogicalIndex(data.vertexIds[r])
+        c = p.child(0)
+
+        ## Set ALL existing array indices to 0
+        existing = c.getExistingArrayAttributeIndices()
+        for x in range(len(existing)):
+            c.elementByLogicalIndex(existing[x]).setFloat(0)
+        plugSets += len(existing) + offsets[r + 1] - offsets[r]
+
+        ## Now set the saved weights
+        for x in range(offsets[r], offsets[r + 1]):
+            logicalIndex = targetLogicalIndices[data.columns[x]]
+            if logicalIndex == SkinWeightData.NO_INDEX:
+                continue
+
+            c.elementByLogicalIndex(logicalIndex).setFloat(data.values[x])
+
+    mPlugUtils_profiling.count("api.plugSet", plugSets)
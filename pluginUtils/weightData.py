@@ -0,0 +1,416 @@
+#  Copyright (c) 2020.  James B Dunlop
+import math
+from array import array
+
+## Optional, pruning and the dense <-> sparse conversions fall back to python per vertex without it.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+## Rows per numpy block when pruning, keeps the dense (rows x influences) block small
+PRUNE_BLOCK_ROWS = 16384
+
+
+class SkinWeightData(object):
+    """
+    Sparse weights for a single skinCluster stored as flat arrays (CSR).
+
+    Row r holds the weights for vertexIds[r]. Its entries live in
+    columns[offsets[r]:offsets[r + 1]] and values[offsets[r]:offsets[r + 1]], where a column is the
+    position of the influence in the influences / logicalIndices lists.
+    """
+
+    NO_INDEX = -1
+
+    def __init__(self, geoName, skinCluster, influences, logicalIndices, maxInf=None):
+        self.geoName = geoName
+        self.skinCluster = skinCluster
+        self.influences = list(influences)
+        self.logicalIndices = list(logicalIndices)
+        self.maxInf = maxInf
+
+        self.vertexIds = array("I")
+        self.offsets = array("I", [0])
+        self.columns = array("H")
+        self.values = array("d")
+
+    @staticmethod
+    def _sortedWeights(skData, vertexIds=None):
+        """
+        :return: list of (int vertexId, weightList) in ascending vertex order, filtered to vertexIds
+        """
+        weights = [(int(vertexId), w) for vertexId, w in skData["weights"].items()]
+        if vertexIds is not None:
+            weights = [w for w in weights if w[0] in vertexIds]
+        weights.sort(key=lambda w: w[0])
+
+        return weights
+
+    @classmethod
+    def fromDict(cls, geoName, skinCluster, skData, version=1, vertexIds=None):
+        """
+        :param skData: `dict` for a single skinCluster in the saveSkinWeights json layout
+        :param version: `int` json schema version skData was saved with
+        :param vertexIds: `set` of `int` vertices to keep. None for all of them.
+        :return: `SkinWeightData` with the rows in ascending vertex order
+        """
+        if version >= 2:
+            return cls._fromDictV2(geoName, skinCluster, skData, vertexIds)
+
+        data = cls(geoName, skinCluster, [], [], maxInf=skData.get("maxInf"))
+
+        ## The influences list doesn't store the logical indices, so they get picked up from the weights.
+        unresolved = {}
+        for infName in skData.get("influences", []):
+            unresolved[infName] = data.addInfluence(infName, cls.NO_INDEX)
+
+        columnsByKey = {}
+        for vertexId, weightList in cls._sortedWeights(skData, vertexIds):
+            columns = []
+            values = []
+            for idx, value, infName in weightList:
+                column = columnsByKey.get((idx, infName))
+                if column is None:
+                    column = unresolved.pop(infName, None)
+                    if column is None:
+                        column = data.addInfluence(infName, idx)
+                    else:
+                        data.logicalIndices[column] = idx
+                    columnsByKey[(idx, infName)] = column
+
+                columns.append(column)
+                values.append(value)
+
+            data.addRow(vertexId, columns, values)
+
+        return data
+
+    @classmethod
+    def _fromDictV2(cls, geoName, skinCluster, skData, vertexIds=None):
+        data = cls(
+            geoName,
+            skinCluster,
+            skData["influences"],
+            skData["logicalIndices"],
+            maxInf=skData.get("maxInf"),
+        )
+        for vertexId, weightList in cls._sortedWeights(skData, vertexIds):
+            if weightList:
+                columns, values = zip(*weightList)
+            else:
+                columns, values = (), ()
+            data.addRow(vertexId, columns, values)
+
+        return data
+
+    def __len__(self):
+        return len(self.vertexIds)
+
+    @property
+    def influenceCount(self):
+        return len(self.influences)
+
+    def byteSize(self):
+        """
+        :return: `int` bytes held by the weight arrays, not counting the python objects around them
+        """
+        return sum(
+            len(a) * a.itemsize
+            for a in (self.vertexIds, self.offsets, self.columns, self.values)
+        )
+
+    def addInfluence(self, name, logicalIndex):
+        """
+        :param name: `str` influence name, namespace stripped
+        :param logicalIndex: `int` index in the skinCluster.matrix array
+        :return: `int` column for the influence
+        """
+        self.influences.append(name)
+        self.logicalIndices.append(logicalIndex)
+
+        return len(self.influences) - 1
+
+    def addRow(self, vertexId, columns, values):
+        self.vertexIds.append(vertexId)
+        self.columns.extend(columns)
+        if isinstance(values, array) and values.typecode != self.values.typecode:
+            values = values.tolist()
+        self.values.extend(values)
+        self.offsets.append(len(self.values))
+
+    def addRows(self, vertexIds, offsets, columns, values):
+        """
+        Append a block of rows that is already in CSR layout, eg: a chunk read back from a file.
+
+        :param offsets: sequence of `int` row offsets into columns / values, starting at 0
+        """
+        base = len(self.values)
+        self.vertexIds.extend(vertexIds)
+        self.offsets.extend([base + o for o in offsets[1:]])
+        self.columns.extend(columns)
+        if not isinstance(values, array) or values.typecode != self.values.typecode:
+            values = array(self.values.typecode, values)
+        self.values.extend(values)
+
+    def addDenseRows(self, vertexIds, weights, skipZeroWeights=True):
+        """
+        Add a (vertices x influences) block, eg: the flat result of MFnSkinCluster.getWeights()
+
+        :param vertexIds: list of `int` vertex ids, one per row of the block
+        :param weights: flat sequence of `float`, row major with one column per influence
+        :param skipZeroWeights: if you want to avoid storing all 0.0 weight data
+        """
+        numInf = self.influenceCount
+        if not isinstance(weights, array):
+            weights = array("d", weights)
+        if numpy is not None:
+            self._addDenseBlock(vertexIds, weights, skipZeroWeights)
+            return
+
+        allColumns = list(range(numInf))
+        for r, vertexId in enumerate(vertexIds):
+            row = weights[r * numInf:(r + 1) * numInf]
+            if skipZeroWeights:
+                columns = [c for c in allColumns if row[c] != 0.0]
+                self.columns.extend(columns)
+                self.values.extend([row[c] for c in columns])
+            else:
+                self.columns.extend(allColumns)
+                self.values.extend(row)
+
+            self.vertexIds.append(vertexId)
+            self.offsets.append(len(self.values))
+
+    def _addDenseBlock(self, vertexIds, weights, skipZeroWeights):
+        rowCount = len(vertexIds)
+        if not rowCount:
+            return
+
+        numInf = self.influenceCount
+        block = numpy.frombuffer(weights, dtype=numpy.float64)[:rowCount * numInf].reshape(rowCount, numInf)
+        if skipZeroWeights:
+            rows, columns = numpy.nonzero(block)
+            values = block[rows, columns]
+            counts = numpy.bincount(rows, minlength=rowCount)
+        else:
+            columns = numpy.tile(numpy.arange(numInf), rowCount)
+            values = block.ravel()
+            counts = numpy.full(rowCount, numInf)
+
+        self.addRows(
+            vertexIds,
+            [0] + numpy.cumsum(counts).tolist(),
+            array("H", columns.astype(numpy.uint16).tobytes()),
+            array("d", values.tobytes()),
+        )
+
+    def subset(self, rows):
+        """
+        :param rows: list of `int` rows to copy, eg: the ones set from a chunk
+        :return: `SkinWeightData` with the same influences and just those rows, in that order
+        """
+        result = self.__class__(
+            self.geoName,
+            self.skinCluster,
+            self.influences,
+            self.logicalIndices,
+            maxInf=self.maxInf,
+        )
+        offsets = self.offsets
+        if isinstance(rows, range) and rows.step == 1:
+            ## A contiguous block is sliced straight across
+            start, end = rows.start, max(rows.stop, rows.start)
+            first = offsets[start]
+            result.addRows(
+                self.vertexIds[start:end],
+                [o - first for o in offsets[start:end + 1]],
+                self.columns[first:offsets[end]],
+                self.values[first:offsets[end]],
+            )
+            return result
+
+        for r in rows:
+            start, end = offsets[r], offsets[r + 1]
+            result.addRow(self.vertexIds[r], self.columns[start:end], self.values[start:end])
+
+        return result
+
+    def toDense(self, targets, width, rows=None):
+        """
+        Expands the rows into a (rows x width) block, eg: for MFnSkinCluster.setWeights()
+
+        :param targets: list of `int` destination column for each influence column. -1 drops the column.
+        :param width: `int` number of columns in the block
+        :param rows: list of `int` rows to expand. None for all of them.
+        :return: (list of `int` vertexIds, flat `array` of float)
+        """
+        if rows is None:
+            rows = range(len(self))
+        if numpy is not None and len(rows):
+            return self._toDenseBlock(targets, width, rows)
+
+        offsets = self.offsets
+        columns = self.columns
+        values = self.values
+        vertexIds = []
+        weights = array("d", [0.0]) * (len(rows) * width)
+        for i, r in enumerate(rows):
+            vertexIds.append(self.vertexIds[r])
+            base = i * width
+            for x in range(offsets[r], offsets[r + 1]):
+                target = targets[columns[x]]
+                if target != self.NO_INDEX:
+                    weights[base + target] = values[x]
+
+        return vertexIds, weights
+
+    def _toDenseBlock(self, targets, width, rows):
+        rows = numpy.asarray(rows, dtype=numpy.intp)
+        offsets = numpy.frombuffer(self.offsets, dtype=self.offsets.typecode).astype(numpy.intp)
+        starts = offsets[rows]
+        counts = offsets[rows + 1] - starts
+
+        ## The positions of every stored weight of the rows, row by row
+        rowIndex = numpy.repeat(numpy.arange(len(rows)), counts)
+        positions = numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts) + numpy.arange(
+            int(counts.sum())
+        )
+        columns = numpy.frombuffer(self.columns, dtype=self.columns.typecode)[positions]
+        values = numpy.frombuffer(self.values, dtype=numpy.float64)[positions]
+
+        targetColumns = numpy.asarray(targets, dtype=numpy.intp)[columns]
+        keep = targetColumns != self.NO_INDEX
+        dense = numpy.zeros((len(rows), width))
+        dense[rowIndex[keep], targetColumns[keep]] = values[keep]
+
+        vertexIds = numpy.frombuffer(self.vertexIds, dtype=self.vertexIds.typecode)[rows].tolist()
+        return vertexIds, array("d", dense.tobytes())
+
+    def pruned(self, maxInf=None, epsilon=0.0, dropColumns=()):
+        """
+        Keeps the maxInf largest weights of each vertex, drops the ones under epsilon and normalizes what's left to
+        sum to 1.0. With numpy it's done a block of rows at a time, else per vertex.
+
+        :param maxInf: `int` weights to keep per vertex. None keeps them all.
+        :param epsilon: `float` weights below this are dropped
+        :param dropColumns: iterable of `int` influence columns to drop first, eg: influences missing from the
+                            skinCluster, so the rest are normalized without them
+        :return: `SkinWeightData` with the same rows and influences. A vertex with nothing left has no weights.
+        """
+        result = self.__class__(
+            self.geoName,
+            self.skinCluster,
+            self.influences,
+            self.logicalIndices,
+            maxInf=self.maxInf,
+        )
+        dropColumns = set(dropColumns)
+        if numpy is None:
+            self._pruneRows(result, maxInf, epsilon, dropColumns)
+            return result
+
+        for start in range(0, len(self), PRUNE_BLOCK_ROWS):
+            self._pruneBlock(
+                result,
+                start,
+                min(start + PRUNE_BLOCK_ROWS, len(self)),
+                maxInf,
+                epsilon,
+                dropColumns,
+            )
+
+        return result
+
+    def _pruneBlock(self, result, start, end, maxInf, epsilon, dropColumns):
+        rowCount = end - start
+        width = self.influenceCount
+        offsets = numpy.asarray(self.offsets[start:end + 1], dtype=numpy.int64)
+        first, last = int(offsets[0]), int(offsets[-1])
+
+        dense = numpy.zeros((rowCount, width))
+        rows = numpy.repeat(numpy.arange(rowCount), numpy.diff(offsets))
+        dense[rows, numpy.asarray(self.columns[first:last], dtype=numpy.intp)] = numpy.asarray(
+            self.values[first:last], dtype=numpy.float64
+        )
+
+        if dropColumns:
+            dense[:, sorted(dropColumns)] = 0.0
+        if maxInf is not None and maxInf < width:
+            ## Zero all but the maxInf largest of each row
+            smallest = numpy.argpartition(dense, width - maxInf - 1, axis=1)
+            numpy.put_along_axis(dense, smallest[:, :width - maxInf], 0.0, axis=1)
+        dense[dense < max(epsilon, 0.0)] = 0.0
+
+        totals = dense.sum(axis=1, keepdims=True)
+        numpy.divide(dense, totals, out=dense, where=totals > 0.0)
+
+        rows, columns = numpy.nonzero(dense)
+        counts = numpy.bincount(rows, minlength=rowCount)
+        result.addRows(
+            self.vertexIds[start:end],
+            [0] + numpy.cumsum(counts).tolist(),
+            array("H", columns.astype(numpy.uint16).tobytes()),
+            array("d", dense[rows, columns].tobytes()),
+        )
+
+    def _pruneRows(self, result, maxInf, epsilon, dropColumns):
+        epsilon = max(epsilon, 0.0)
+        for vertexId, columns, values in self.iterRows():
+            row = sorted(
+                (
+                    (v, c)
+                    for c, v in zip(columns, values)
+                    if c not in dropColumns and v >= epsilon and v > 0.0
+                ),
+                reverse=True,
+            )
+            if maxInf is not None:
+                row = row[:maxInf]
+            row.sort(key=lambda w: w[1])
+
+            total = math.fsum(v for v, _ in row)
+            result.addRow(
+                vertexId, [c for _, c in row], [v / total for v, _ in row]
+            )
+
+    def iterRows(self):
+        """
+        :return: generator of (vertexId, columns, values)
+        """
+        offsets = self.offsets
+        for r, vertexId in enumerate(self.vertexIds):
+            start, end = offsets[r], offsets[r + 1]
+            yield vertexId, self.columns[start:end], self.values[start:end]
+
+    def toDict(self, version=1):
+        """
+        v1 stores [logicalIndex, value, influenceName] per weight.
+        v2 stores the influences and their logical indices once and [column, value] per weight.
+
+        :param version: `int` json schema version to build
+        :return: `dict` in the saveSkinWeights json layout for a single skinCluster
+        """
+        weights = {}
+        if version >= 2:
+            for vertexId, columns, values in self.iterRows():
+                weights[str(vertexId)] = [[c, v] for c, v in zip(columns, values)]
+
+            return {
+                "influences": self.influences,
+                "logicalIndices": self.logicalIndices,
+                "maxInf": self.maxInf,
+                "weights": weights,
+            }
+
+        for vertexId, columns, values in self.iterRows():
+            weights[str(vertexId)] = [
+                (self.logicalIndices[c], v, self.influences[c])
+                for c, v in zip(columns, values)
+            ]
+
+        return {
+            "influences": self.influences,
+            "maxInf": self.maxInf,
+            "weights": weights,
+        }
@@ -0,0 +1,1679 @@
+#  Copyright (c) 2020.  James B Dunlop
+"""
+Reading and writing of the saveSkinWeights / loadSkinWeights files.
+
+Two formats are supported, the loader picks the right one from the first bytes of the file.
+
+json v2: {"version": 2, "meshes": {geoName: {skinClusterName: {
+            "influences": [infName], "logicalIndices": [int], "maxInf": int,
+            "weights": {"vtxId": [[influencesPosition, value]]}, "hash": str}}}}
+json v1: {geoName: {skinClusterName: {"influences": [], "maxInf": int, "weights": {"vtxId": [[idx, value, infName]]}}}}
+         Still read, no longer written.
+
+binary (.skwb), little endian, one record per skinCluster in CSR layout:
+    header:     magic "SKWB", uint16 version, uint16 flags, uint32 reserved
+    record:     str geoName, str skinClusterName, int32 maxInf (-1 for None), uint16 influenceCount,
+                str influences[influenceCount], int32 logicalIndices[influenceCount], chunk..., end chunk
+    chunk:      uint32 rowCount, uint32 weightCount,
+                uint32 vertexIds[rowCount], uint32 offsets[rowCount + 1],
+                uint16 columns[weightCount], float32 values[weightCount]
+    end chunk:  a chunk header with a rowCount of 0
+    str:        uint16 byteLength, utf-8 bytes
+    The vertexIds are ascending within a record, so a row can be found by id without reading the rest of the
+    chunk. Selected vertex loads use that through mmap and only touch the rows they need.
+
+    version 2 sets FLAG_INDEXED and puts an index after the last record so a loader can seek straight to the
+    records for the selected geo:
+    index:      utf-8 json {"records": [{"geo": geoName, "skinCluster": skinClusterName, "offset": int,
+                                         "hash": str}]}
+    trailer:    uint64 indexOffset, uint32 indexLength, magic "SKWI"
+
+    FLAG_COMPRESSED swaps the chunk layout for independently compressed chunks, so they can be (de)compressed on
+    a thread pool and a selected vertex load only has to inflate the chunks holding those vertices:
+    chunk:      uint32 rowCount, uint32 weightCount, uint32 firstVertexId, uint32 lastVertexId,
+                uint8 codec, uint32 dataLength, data
+    end chunk:  a chunk header with a rowCount of 0
+    data is the uncompressed chunk arrays run through the codec. A chunk that doesn't shrink is stored as is.
+
+    FLAG_QUANTIZED stores the values as uint16 fixed point, value * 65535, instead of float32.
+    Each vertex is rounded with largest remainders, so every stored value is the floor or ceil of the exact
+    one and a vertex that summed to 1.0 still sums to exactly 65535. On load each vertex is divided by its sum,
+    which makes the maximum error per weight less than 1 / 65535 (~1.53e-05) for normalized vertices, and
+    the loaded weights of every vertex sum to 1.0. Values are clamped to 0.0 - 1.0 first.
+
+    FLAG_PATCH marks a delta save against a reference file. The vertex ids are split into blocks of
+    DELTA_BLOCK_VERTICES and a record only holds the blocks that changed since the reference:
+    index:      {"patch": {"base": path relative to this file, "baseHash": sha1 of the base file,
+                           "baseStamp": [size, mtime in ns] of the base file},
+                 "records": [{"geo", "skinCluster", "offset", "blocks": [int]}]}
+    Loading checks the base's size and mtime against baseStamp and only hashes the whole base when they differ,
+    eg: it's been copied, or for patches saved before the stamp.
+    A record's rows replace those blocks of the base record, base vertices in them that aren't in the patch are
+    dropped. A record without blocks, eg: the influences changed, replaces the whole base record. Records not in
+    the patch are loaded from the base as is. The base can be a patch itself, giving a chain back to a full file.
+
+The "hash" of a record is contentHash() of the weights that were saved, the influences, logical indices, maxInf
+and the non zero weights as float32. It's the same whatever the format or skipZeroWeights, so it can be
+compared against the current weights in the scene to tell if they've changed since. A quantized file hashes the
+weights as they load back, quantized and divided out again, so weights loaded from it match its hash.
+"""
+import hashlib
+import math
+import json
+import logging
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pluginUtils import profiling as u_profiling
+
+## Optional, mayapy doesn't always ship it. The standard json reads / writes the same files just slower, so the
+## json format and batchExportSkinWeights work without it.
+try:
+    import simplejson as sjson
+except ImportError:
+    import json as sjson
+
+## Optional codecs, zlib is always there.
+try:
+    import lz4.block as lz4Block
+except ImportError:
+    lz4Block = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from pluginUtils.weightData import SkinWeightData
+
+logger = logging.getLogger(__name__)
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+BINARY_EXTENSIONS = (".skwb",)
+
+JSON_VERSION = 2
+
+BINARY_MAGIC = b"SKWB"
+BINARY_VERSION = 2
+INDEX_MAGIC = b"SKWI"
+FLAG_INDEXED = 0x1
+FLAG_COMPRESSED = 0x2
+FLAG_QUANTIZED = 0x4
+FLAG_PATCH = 0x8
+KNOWN_FLAGS = FLAG_INDEXED | FLAG_COMPRESSED | FLAG_QUANTIZED | FLAG_PATCH
+CHUNK_ROWS = 16384
+DELTA_BLOCK_VERTICES = 1024
+QUANTIZE_SCALE = 65535
+QUANTIZE_MAX_ERROR = 1.0 / QUANTIZE_SCALE
+
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_LZ4 = "lz4"
+COMPRESSION_ZSTD = "zstd"
+_CODEC_NONE = 0
+_CODECS = {COMPRESSION_ZLIB: 1, COMPRESSION_LZ4: 2, COMPRESSION_ZSTD: 3}
+
+_HEADER = struct.Struct("<4sHHI")
+_CHUNK = struct.Struct("<II")
+_ZCHUNK = struct.Struct("<IIIIBI")
+_STR = struct.Struct("<H")
+_INFLUENCES = struct.Struct("<iH")
+_TRAILER = struct.Struct("<QI4s")
+_SWAP = sys.byteorder != "little"
+_END = object()
+
+
+def formatFromPath(filepath):
+    """
+    :param filepath: `str` path to the weights file
+    :return: `str` the format to write based on the file extension
+    """
+    if os.path.splitext(filepath)[-1].lower() in BINARY_EXTENSIONS:
+        return FORMAT_BINARY
+
+    return FORMAT_JSON
+
+
+def detectFormat(filepath):
+    """
+    :param filepath: `str` path to an existing weights file
+    :return: `str` the format of the file based on its contents
+    """
+    with open(filepath, "rb") as infile:
+        if infile.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            return FORMAT_BINARY
+
+    return FORMAT_JSON
+
+
+def availableCompression():
+    """
+    :return: list of `str` compression codecs that can be written / read in this session
+    """
+    codecs = [COMPRESSION_ZLIB]
+    if lz4Block is not None:
+        codecs.append(COMPRESSION_LZ4)
+    if zstandard is not None:
+        codecs.append(COMPRESSION_ZSTD)
+
+    return codecs
+
+
+def writeWeights(
+    filepath, weightData, fmt=None, compression=None, workers=None, quantize=False
+):
+    """
+    :param filepath: `str` path including filename.ext
+    :param weightData: list of `SkinWeightData`
+    :param fmt: `str` FORMAT_JSON or FORMAT_BINARY. None picks by the file extension.
+    :param compression: `str` codec from availableCompression(), binary only. None to not compress.
+    :param workers: `int` encoding / compression threads. None lets the pool decide, 0 for none.
+    :param quantize: `bool` store the weights as uint16 fixed point, binary only.
+    """
+    with openWriter(
+        filepath, fmt=fmt, compression=compression, workers=workers, quantize=quantize
+    ) as writer:
+        for skData in weightData:
+            writer.writeRecord([skData])
+
+
+def openWriter(
+    filepath,
+    fmt=None,
+    compression=None,
+    workers=None,
+    quantize=False,
+    reference=None,
+    skipUnchanged=False,
+):
+    """
+    Streaming writer, each skinCluster is written to disk as its chunks come in. The chunks are encoded and
+    written on background threads while the caller fetches the next ones.
+    Use it as a context manager; if anything raises the partial file is removed and an existing file is kept.
+
+    :param filepath: `str` path including filename.ext
+    :param fmt: `str` FORMAT_JSON or FORMAT_BINARY. None picks by the file extension.
+    :param compression: `str` codec from availableCompression(), binary only. None to not compress.
+    :param workers: `int` encoding / compression threads. None lets the pool decide, 0 does it all in the
+                    calling thread.
+    :param quantize: `bool` store the weights as uint16 fixed point, binary only.
+    :param reference: `str` path to an earlier save of the same geo, binary only. Writes a patch holding just
+                      the vertex blocks that changed since. The patch is quantized if the reference is.
+    :param skipUnchanged: `bool` when saving over an existing binary file, copy the records whose contentHash
+                          hasn't changed across as they are instead of encoding them again. Not used with a
+                          reference, the patch already leaves them out.
+    :return: `WeightFileWriter`
+    """
+    if fmt is None:
+        fmt = formatFromPath(filepath)
+
+    if compression is not None and compression not in availableCompression():
+        raise ValueError("Compression {} is not available!".format(compression))
+
+    if reference is not None:
+        if fmt != FORMAT_BINARY:
+            raise ValueError("Patches are only supported for the binary format!")
+        return DeltaWeightWriter(
+            filepath,
+            reference,
+            compression=compression,
+            workers=workers,
+            quantize=quantize,
+        )
+
+    if fmt == FORMAT_BINARY:
+        if (
+            skipUnchanged
+            and os.path.isfile(filepath)
+            and detectFormat(filepath) == FORMAT_BINARY
+        ):
+            return UpdatingWeightWriter(
+                filepath, compression=compression, workers=workers, quantize=quantize
+            )
+        return BinaryWeightWriter(
+            filepath, compression=compression, workers=workers, quantize=quantize
+        )
+    elif fmt == FORMAT_JSON:
+        if compression is not None:
+            raise ValueError("Compression is only supported for the binary format!")
+        if quantize:
+            raise ValueError("Quantizing is only supported for the binary format!")
+        return JsonWeightWriter(filepath, workers=workers)
+
+    raise ValueError("Unknown weight file format: {}".format(fmt))
+
+
+def readWeights(filepath, geoNames=None, vertexIds=None, workers=None):
+    """
+    :param filepath: `str` path to the weights file
+    :param geoNames: list of `str` geo to read. None for all of them.
+    :param vertexIds: iterable of `int` vertices to read. None for all of them.
+    :param workers: `int` decompression threads for compressed binary files. None lets the pool decide.
+    :return: list of `SkinWeightData`
+    """
+    return list(
+        iterWeights(
+            filepath, geoNames=geoNames, vertexIds=vertexIds, workers=workers, prefetch=0
+        )
+    )
+
+
+def iterWeights(filepath, geoNames=None, vertexIds=None, workers=None, prefetch=2):
+    """
+    Reads the file a skinCluster at a time. With a prefetch the records are decoded (and decompressed) on a
+    background thread, up to prefetch records ahead of the caller, so the caller can be applying one while the
+    next is being read.
+    Use it with contextlib.closing() if you might not run it to the end, that stops the background thread.
+    A patch is read on top of its chain of base files, those records come out once the whole chain is read.
+
+    :param prefetch: `int` decoded records to hold ready. 0 reads them on the calling thread as they're asked for.
+    :return: generator of `SkinWeightData` in file order
+    """
+    if vertexIds is not None:
+        vertexIds = set(vertexIds)
+
+    chain = readPatchChain(filepath)
+    if len(chain) > 1:
+        records = _iterPatched(
+            chain, geoNames=geoNames, vertexIds=vertexIds, workers=workers
+        )
+    elif detectFormat(filepath) == FORMAT_BINARY:
+        records = iterBinary(
+            filepath, geoNames=geoNames, vertexIds=vertexIds, workers=workers
+        )
+    else:
+        records = iterJson(filepath, geoNames=geoNames, vertexIds=vertexIds)
+
+    if not prefetch:
+        return records
+
+    return _prefetch(records, prefetch)
+
+
+def _prefetch(iterable, size):
+    """
+    Runs iterable on a background thread, up to size items ahead of the caller. Anything it raises is raised
+    again here.
+    """
+    ready = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                ready.put((item, None))
+                if stopped.is_set():
+                    break
+        except Exception as e:
+            ready.put((_END, e))
+            return
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+        ready.put((_END, None))
+
+    thread = threading.Thread(target=produce, name="WeightFileReader")
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = ready.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        ## Stopped early, keep the queue moving until the reader sees it
+        stopped.set()
+        while thread.is_alive():
+            try:
+                ready.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        thread.join()
+
+
+class WeightFileWriter(object):
+    """
+    The hooks hand their data to _emit() / _submit() instead of writing it. Unless workers is 0 the _submit() work,
+    encoding and compressing the weights, runs on a thread pool and a writer thread puts everything in the file
+    in the order it was queued. That way the caller carries on pulling the next weights out of Maya while the
+    previous ones are encoded and written. The queue is bounded so a slow disk holds the caller back instead of
+    the memory growing.
+    Everything goes to filepath + ".tmp" which only replaces filepath once the file is complete, so a save that
+    fails part way leaves any existing file as it was.
+    """
+
+    mode = "wb"
+
+    def __init__(self, filepath, workers=None):
+        """
+        :param workers: `int` encoding threads. None lets the pool decide, 0 does it all on the calling thread.
+        """
+        self.filepath = filepath
+        self.tempPath = filepath + ".tmp"
+        self._outfile = open(self.tempPath, self.mode)
+        self._pool = None
+        self._pending = None
+        self._writerThread = None
+        self._error = None
+        self._aborted = False
+        ## Chunks the writer can still be holding on to after writeRecord() has moved on to the next
+        self.heldChunks = 0
+        if workers != 0:
+            self._pool = ThreadPoolExecutor(max_workers=workers)
+            self._pending = queue.Queue(maxsize=2 * (workers or os.cpu_count() or 1))
+            ## Queued, plus the one being written
+            self.heldChunks = self._pending.maxsize + 1
+            self._writerThread = threading.Thread(
+                target=self._writeLoop, name="WeightFileWriter"
+            )
+            self._writerThread.daemon = True
+            self._writerThread.start()
+
+        self._writeHeader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            try:
+                self.close()
+            except Exception:
+                self._discard()
+                raise
+            return
+
+        self._aborted = True
+        self._stopPipeline()
+        self._discard()
+
+    def writeRecord(self, chunks, recordHash=None):
+        """
+        :param chunks: iterable of `SkinWeightData` for one skinCluster, eg: from iterSkinClusterWeights().
+                       The influences etc are taken from the first chunk.
+        :param recordHash: `str` contentHash() to store for the record. None hashes the chunks as they're written.
+        """
+        hasher = None
+        for skData in chunks:
+            if hasher is None:
+                hasher = _ContentHasher(skData, quantize=self._hashQuantized())
+                self._beginRecord(skData)
+            if recordHash is None:
+                hasher.update(skData)
+            self._writeRows(skData)
+
+        if hasher is not None:
+            self._endRecord(recordHash or hasher.hexdigest())
+
+    def close(self):
+        if self._outfile.closed:
+            return
+
+        try:
+            with u_profiling.phase("finish writing"):
+                self._stopPipeline()
+            if self._error is not None:
+                raise self._error
+            self._writeFooter()
+        finally:
+            self._outfile.close()
+        self._replaceTarget()
+
+    def _emit(self, data, record=None):
+        """
+        :param data: `bytes` / `str` to write, or a `Future` returning them
+        :param record: passed to _recordStarted() with the file offset data is written at
+        """
+        if self._pending is None:
+            self._write(data, record)
+            return
+
+        if self._error is not None:
+            raise self._error
+        self._pending.put((data, record))
+
+    def _submit(self, fn, *args):
+        """
+        Queues fn(*args) to run on the pool, its result is written in order with the rest.
+        """
+        if self._pool is None:
+            self._write(fn(*args))
+            return
+
+        self._emit(self._pool.submit(fn, *args))
+
+    def _write(self, data, record=None):
+        if isinstance(data, Future):
+            data = data.result()
+        with u_profiling.phase("file write"):
+            if record is not None:
+                self._recordStarted(record, self._outfile.tell())
+            self._outfile.write(data)
+
+    def _writeLoop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            if self._aborted or self._error is not None:
+                continue
+
+            try:
+                self._write(*item)
+            except Exception as e:
+                self._error = e
+
+    def _stopPipeline(self):
+        if self._writerThread is not None:
+            self._pending.put(None)
+            self._writerThread.join()
+            self._writerThread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _replaceTarget(self):
+        os.replace(self.tempPath, self.filepath)
+
+    def _discard(self):
+        if not self._outfile.closed:
+            self._outfile.close()
+        if os.path.exists(self.tempPath):
+            os.remove(self.tempPath)
+
+    def _hashQuantized(self):
+        """
+        :return: `bool` the weights are stored quantized, so they're hashed that way
+        """
+        return False
+
+    def _writeHeader(self):
+        pass
+
+    def _beginRecord(self, skData):
+        raise NotImplementedError
+
+    def _writeRows(self, skData):
+        raise NotImplementedError
+
+    def _endRecord(self, contentHash):
+        pass
+
+    def _writeFooter(self):
+        """
+        Runs once everything queued has been written.
+        """
+        pass
+
+    def _recordStarted(self, record, offset):
+        pass
+
+
+# <editor-fold desc="json">
+def _encodeJsonRows(skData, separator=""):
+    with u_profiling.phase("encode"):
+        return separator + ", ".join(
+            '"{}": {}'.format(vertexId, sjson.dumps(list(zip(columns, values))))
+            for vertexId, columns, values in skData.iterRows()
+        )
+
+
+class JsonWeightWriter(WeightFileWriter):
+    mode = "w"
+
+    def __init__(self, filepath, workers=None):
+        self._geoName = None
+        self._rowCount = 0
+        super(JsonWeightWriter, self).__init__(filepath, workers=workers)
+
+    def _writeHeader(self):
+        self._emit('{{"version": {}, "meshes": {{'.format(JSON_VERSION))
+
+    def _beginRecord(self, skData):
+        text = []
+        if skData.geoName != self._geoName:
+            if self._geoName is not None:
+                text.append("}, ")
+            text.append("{}: {{".format(sjson.dumps(skData.geoName)))
+            self._geoName = skData.geoName
+        else:
+            text.append(", ")
+
+        text.append(
+            '{}: {{"influences": {}, "logicalIndices": {}, "maxInf": {}, "weights": {{'.format(
+                sjson.dumps(skData.skinCluster),
+                sjson.dumps(skData.influences),
+                sjson.dumps(skData.logicalIndices),
+                sjson.dumps(skData.maxInf),
+            )
+        )
+        self._emit("".join(text))
+        self._rowCount = 0
+
+    def _writeRows(self, skData):
+        if not len(skData):
+            return
+
+        separator = ", " if self._rowCount else ""
+        self._rowCount += len(skData)
+        self._submit(_encodeJsonRows, skData, separator)
+
+    def _endRecord(self, contentHash):
+        self._emit('}}, "hash": {}}}'.format(sjson.dumps(contentHash)))
+
+    def _writeFooter(self):
+        if self._geoName is not None:
+            self._write("}")
+        self._write("}}")
+
+
+def writeJson(filepath, weightData):
+    writeWeights(filepath, weightData, fmt=FORMAT_JSON)
+
+
+def readJson(filepath, geoNames=None, vertexIds=None):
+    return list(iterJson(filepath, geoNames=geoNames, vertexIds=vertexIds))
+
+
+def iterJson(filepath, geoNames=None, vertexIds=None):
+    """
+    The json has to be parsed in one go, the records are built from it as they're asked for.
+
+    :return: generator of `SkinWeightData`
+    """
+    with u_profiling.phase("file read"), open(filepath) as infile:
+        data = sjson.load(infile)
+
+    ## v1 files are just the meshes dict, there is no version.
+    version = data.get("version")
+    if isinstance(version, int):
+        meshes = data["meshes"]
+    else:
+        version = 1
+        meshes = data
+
+    for geoName, skData in meshes.items():
+        if geoNames is not None and geoName not in geoNames:
+            continue
+
+        for skName, weights in skData.items():
+            with u_profiling.phase("decode"):
+                record = SkinWeightData.fromDict(
+                    geoName, skName, weights, version=version, vertexIds=vertexIds
+                )
+            yield record
+# </editor-fold>
+
+
+# <editor-fold desc="binary">
+def _toBytes(values):
+    if _SWAP:
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def _fromBytes(typecode, buffer):
+    values = array(typecode)
+    values.frombytes(buffer)
+    if _SWAP:
+        values.byteswap()
+
+    return values
+
+
+def _packStr(value):
+    encoded = value.encode("utf-8")
+    return _STR.pack(len(encoded)) + encoded
+
+
+def _readStr(infile):
+    (length,) = _STR.unpack(infile.read(_STR.size))
+    return infile.read(length).decode("utf-8")
+
+
+def _readExactly(infile, size):
+    buffer = infile.read(size)
+    if len(buffer) != size:
+        raise IOError("Unexpected end of weights file!")
+
+    return buffer
+
+
+def _valueType(flags):
+    """
+    :return: `str` array typecode the chunk values are stored as
+    """
+    return "H" if flags & FLAG_QUANTIZED else "f"
+
+
+def _chunkSize(rowCount, weightCount, valueType="f"):
+    return 8 * rowCount + 4 + (2 + array(valueType).itemsize) * weightCount
+
+
+def _quantizeRows(offsets, values, start, end):
+    """
+    Largest remainder rounding per vertex, see the module docs for the error bound.
+
+    :return: `array` of uint16 for the values of rows start:end
+    """
+    quantized = array("H")
+    for r in range(start, end):
+        row = [
+            min(max(v, 0.0), 1.0) * QUANTIZE_SCALE
+            for v in values[offsets[r]:offsets[r + 1]]
+        ]
+        steps = [int(v) for v in row]
+        short = int(round(sum(row))) - sum(steps)
+        if short > 0:
+            for i in sorted(range(len(row)), key=lambda i: steps[i] - row[i])[:short]:
+                steps[i] += 1
+        quantized.extend(steps)
+
+    return quantized
+
+
+def _dequantizeRow(quantized):
+    """
+    :param quantized: sequence of uint16 values for one vertex
+    :return: list of `float` that sums to 1.0, or all 0.0 if the vertex had no weight
+    """
+    total = sum(quantized)
+    if not total:
+        return [0.0] * len(quantized)
+
+    row = [q / float(total) for q in quantized]
+    ## Fold the float rounding into the largest weight so the vertex sums to exactly 1.0
+    largest = row.index(max(row))
+    row[largest] = 0.0
+    row[largest] = 1.0 - math.fsum(row)
+    ## The rest of the row's sum was itself rounded, so it can still land an ulp off
+    for _ in range(4):
+        residual = 1.0 - math.fsum(row)
+        if not residual:
+            break
+        row[largest] += residual
+
+    return row
+
+
+def _dequantizeRows(offsets, quantized):
+    values = array("d")
+    for r in range(len(offsets) - 1):
+        values.extend(_dequantizeRow(quantized[offsets[r]:offsets[r + 1]]))
+
+    return values
+
+
+def _encodeChunk(skData, start, end, quantize=False):
+    """
+    :return: (rowCount, weightCount, `bytes` the uncompressed chunk arrays) for rows start:end
+    """
+    offsets = skData.offsets
+    first, last = offsets[start], offsets[end]
+    if quantize:
+        values = _quantizeRows(offsets, skData.values, start, end)
+    else:
+        values = array("f", skData.values[first:last])
+
+    payload = b"".join(
+        (
+            _toBytes(skData.vertexIds[start:end]),
+            _toBytes(array("I", [o - first for o in offsets[start:end + 1]])),
+            _toBytes(skData.columns[first:last]),
+            _toBytes(values),
+        )
+    )
+
+    return end - start, last - first, payload
+
+
+def _decodeChunk(payload, rowCount, weightCount, valueType="f"):
+    """
+    :return: (vertexIds, offsets, columns, values) arrays of an uncompressed chunk, quantized values are
+             returned as normalized floats
+    """
+    view = memoryview(payload)
+    idsEnd = 4 * rowCount
+    offsetsEnd = idsEnd + 4 * (rowCount + 1)
+    columnsEnd = offsetsEnd + 2 * weightCount
+
+    offsets = _fromBytes("I", view[idsEnd:offsetsEnd])
+    values = _fromBytes(valueType, view[columnsEnd:])
+    if valueType == "H":
+        values = _dequantizeRows(offsets, values)
+
+    return (
+        _fromBytes("I", view[:idsEnd]),
+        offsets,
+        _fromBytes("H", view[offsetsEnd:columnsEnd]),
+        values,
+    )
+
+
+def _compressChunk(compression, header, payload):
+    """
+    Runs on the writer's thread pool. zlib, lz4 and zstd all release the GIL while they work.
+
+    :param header: (rowCount, weightCount, firstVertexId, lastVertexId)
+    :return: `bytes` the compressed chunk including its header
+    """
+    if compression == COMPRESSION_LZ4:
+        data = lz4Block.compress(payload)
+    elif compression == COMPRESSION_ZSTD:
+        data = zstandard.ZstdCompressor().compress(payload)
+    else:
+        data = zlib.compress(payload)
+
+    codec = _CODECS[compression]
+    if len(data) >= len(payload):
+        codec, data = _CODEC_NONE, payload
+
+    return _ZCHUNK.pack(*(header + (codec, len(data)))) + data
+
+
+def _decompressChunk(codec, data):
+    if codec == _CODEC_NONE:
+        return data
+    elif codec == _CODECS[COMPRESSION_ZLIB]:
+        return zlib.decompress(data)
+    elif codec == _CODECS[COMPRESSION_LZ4]:
+        if lz4Block is None:
+            raise IOError("Weights file is lz4 compressed and lz4 is not installed!")
+        return lz4Block.decompress(data)
+    elif codec == _CODECS[COMPRESSION_ZSTD]:
+        if zstandard is None:
+            raise IOError("Weights file is zstd compressed and zstandard is not installed!")
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    raise IOError("Unknown compression codec {} in weights file!".format(codec))
+
+
+def _decompressChunks(chunks, pool=None):
+    """
+    :param chunks: list of (rowCount, weightCount, codec, data)
+    :param pool: `ThreadPoolExecutor` to decompress on. None to decompress in place.
+    :return: generator of (rowCount, weightCount, payload) in chunk order
+    """
+    if pool is None:
+        payloads = (_decompressChunk(c[2], c[3]) for c in chunks)
+    else:
+        payloads = pool.map(_decompressChunk, [c[2] for c in chunks], [c[3] for c in chunks])
+
+    for chunk, payload in zip(chunks, payloads):
+        yield chunk[0], chunk[1], payload
+
+
+def _packChunk(skData, start, end, quantize=False, compression=None):
+    """
+    Runs on the writer's thread pool.
+
+    :return: `bytes` the chunk for rows start:end including its header
+    """
+    with u_profiling.phase("encode"):
+        rowCount, weightCount, payload = _encodeChunk(skData, start, end, quantize=quantize)
+        if compression is None:
+            return _CHUNK.pack(rowCount, weightCount) + payload
+
+        header = (rowCount, weightCount, skData.vertexIds[start], skData.vertexIds[end - 1])
+        return _compressChunk(compression, header, payload)
+
+
+class BinaryWeightWriter(WeightFileWriter):
+    """
+    Each chunk is encoded, and compressed, as its own job on the pool so a big skinCluster spreads over the
+    threads too.
+    """
+
+    def __init__(self, filepath, compression=None, workers=None, quantize=False):
+        self._compression = compression
+        self._quantize = quantize
+        self._index = []
+        self._record = None
+        super(BinaryWeightWriter, self).__init__(filepath, workers=workers)
+
+    def _hashQuantized(self):
+        return self._quantize
+
+    def _flags(self):
+        flags = FLAG_INDEXED
+        if self._compression is not None:
+            flags |= FLAG_COMPRESSED
+        if self._quantize:
+            flags |= FLAG_QUANTIZED
+
+        return flags
+
+    def _writeHeader(self):
+        flags = self._flags()
+        self._emit(_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flags, 0))
+
+    def _recordStarted(self, record, offset):
+        record["offset"] = offset
+        self._index.append(record)
+
+    def _beginRecord(self, skData):
+        maxInf = skData.maxInf if skData.maxInf is not None else -1
+        header = [
+            _packStr(skData.geoName),
+            _packStr(skData.skinCluster),
+            _INFLUENCES.pack(maxInf, skData.influenceCount),
+        ]
+        header.extend(_packStr(infName) for infName in skData.influences)
+        header.append(_toBytes(array("i", skData.logicalIndices)))
+
+        ## The writer thread fills in the offset, the hash is added once the rows are all in
+        self._record = self._indexRecord(skData)
+        self._emit(b"".join(header), record=self._record)
+
+    def _indexRecord(self, skData):
+        """
+        :return: `dict` index entry for the record, it gets its offset once written
+        """
+        return {"geo": skData.geoName, "skinCluster": skData.skinCluster}
+
+    def _indexData(self):
+        return {"records": self._index}
+
+    def _writeRows(self, skData):
+        for start in range(0, len(skData), CHUNK_ROWS):
+            self._submit(
+                _packChunk,
+                skData,
+                start,
+                min(start + CHUNK_ROWS, len(skData)),
+                self._quantize,
+                self._compression,
+            )
+
+    def _endRecord(self, contentHash):
+        self._record["hash"] = contentHash
+        if self._compression is None:
+            self._emit(_CHUNK.pack(0, 0))
+        else:
+            self._emit(_ZCHUNK.pack(0, 0, 0, 0, _CODEC_NONE, 0))
+
+    def _writeFooter(self):
+        ## Plain json, the index is tiny and this way it doesn't depend on simplejson being around.
+        index = json.dumps(self._indexData()).encode("utf-8")
+        indexOffset = self._outfile.tell()
+        self._write(index)
+        self._write(_TRAILER.pack(indexOffset, len(index), INDEX_MAGIC))
+
+
+def writeBinary(filepath, weightData, compression=None, quantize=False):
+    writeWeights(
+        filepath,
+        weightData,
+        fmt=FORMAT_BINARY,
+        compression=compression,
+        quantize=quantize,
+    )
+
+
+# <editor-fold desc="hashes">
+def _nonZeroRows(skData, values=None):
+    """
+    :param values: sequence of `float` to use in place of skData.values, eg: quantized
+    :return: (vertexIds, offsets, columns, values) of skData without the 0.0 weights
+    """
+    if values is None:
+        values = skData.values
+    if 0.0 not in values:
+        return skData.vertexIds, skData.offsets, skData.columns, values
+
+    offsets = array("I", [0])
+    columns = array("H")
+    nonZero = array("d")
+    for r in range(len(skData)):
+        for x in range(skData.offsets[r], skData.offsets[r + 1]):
+            if values[x] != 0.0:
+                columns.append(skData.columns[x])
+                nonZero.append(values[x])
+        offsets.append(len(nonZero))
+
+    return skData.vertexIds, offsets, columns, nonZero
+
+
+class _ContentHasher(object):
+    """
+    Hashes a record chunk by chunk, see the module docs for what goes in.
+    """
+
+    def __init__(self, skData, quantize=False):
+        """
+        :param quantize: `bool` hash the values as they load back from a quantized file
+        """
+        self._quantize = quantize
+        self._digest = hashlib.sha1(
+            json.dumps(
+                [skData.influences, skData.logicalIndices, skData.maxInf]
+            ).encode("utf-8")
+        )
+
+    def update(self, skData):
+        with u_profiling.phase("hash"):
+            values = None
+            if self._quantize:
+                values = _dequantizeRows(
+                    skData.offsets,
+                    _quantizeRows(skData.offsets, skData.values, 0, len(skData)),
+                )
+            vertexIds, offsets, columns, values = _nonZeroRows(skData, values)
+            rowLengths = array(
+                "I", [offsets[r + 1] - offsets[r] for r in range(len(vertexIds))]
+            )
+            for block in (vertexIds, rowLengths, columns, array("f", values)):
+                self._digest.update(_toBytes(block))
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def contentHash(chunks, quantize=False):
+    """
+    :param chunks: iterable of `SkinWeightData` for one skinCluster, eg: from iterSkinClusterWeights()
+    :param quantize: `bool` hash the values as they'd be saved and loaded back quantized, see isQuantized()
+    :return: `str` hash of the weights, the same one saved with them. None if there weren't any chunks.
+    """
+    hasher = None
+    for skData in chunks:
+        if hasher is None:
+            hasher = _ContentHasher(skData, quantize=quantize)
+        hasher.update(skData)
+
+    return hasher.hexdigest() if hasher is not None else None
+
+
+def readHashes(filepath):
+    """
+    :param filepath: `str` path to a weights file, a patch is read through its chain of bases
+    :return: `OrderedDict` of (geoName, skinClusterName): `str` contentHash, None for files saved before hashes
+    """
+    hashes = OrderedDict()
+    for path in readPatchChain(filepath):
+        if detectFormat(path) == FORMAT_BINARY:
+            for record in readIndex(path) or []:
+                hashes[(record["geo"], record["skinCluster"])] = record.get("hash")
+            continue
+
+        with open(path) as infile:
+            data = sjson.load(infile)
+        for geoName, skData in data.get("meshes", {}).items():
+            for skName, weights in skData.items():
+                hashes[(geoName, skName)] = weights.get("hash")
+
+    return hashes
+
+
+def _recordSpans(infile):
+    """
+    :return: `dict` of (geoName, skinClusterName): (index record, start, end) file offsets of each record
+    """
+    records = _readIndex(infile)
+    infile.seek(-_TRAILER.size, os.SEEK_END)
+    indexOffset = _TRAILER.unpack(_readExactly(infile, _TRAILER.size))[0]
+
+    starts = sorted(r["offset"] for r in records) + [indexOffset]
+    spans = {}
+    for record in records:
+        end = starts[bisect_right(starts, record["offset"])]
+        spans[(record["geo"], record["skinCluster"])] = (record, record["offset"], end)
+
+    return spans
+
+
+class UpdatingWeightWriter(BinaryWeightWriter):
+    """
+    Saves over an existing binary file, records whose contentHash matches the one in the existing file are copied
+    across byte for byte instead of being encoded again. Each record is joined up to hash it before it's written,
+    so this holds a skinCluster at a time in memory rather than a chunk.
+    """
+
+    def __init__(self, filepath, compression=None, workers=None, quantize=False):
+        self.copiedCount = 0
+        self.writtenCount = 0
+        self._previous = open(filepath, "rb")
+        try:
+            version, flags = _readHeader(self._previous, filepath)
+            self._spans = _recordSpans(self._previous) if flags & FLAG_INDEXED else {}
+            super(UpdatingWeightWriter, self).__init__(
+                filepath,
+                compression=compression,
+                workers=workers,
+                quantize=quantize,
+            )
+        except Exception:
+            self._previous.close()
+            raise
+
+        ## Chunks can only be copied across if they're stored the same way, the codec is per chunk.
+        if flags != self._flags():
+            self._spans = {}
+
+    def writeRecord(self, chunks, recordHash=None):
+        skData = _joinChunks(chunks)
+        if skData is None:
+            return
+
+        recordHash = recordHash or contentHash([skData], quantize=self._quantize)
+        span = self._spans.get((skData.geoName, skData.skinCluster))
+        if span is not None and span[0].get("hash") == recordHash:
+            record, start, end = span
+            self._previous.seek(start)
+            self._emit(
+                _readExactly(self._previous, end - start),
+                record={
+                    "geo": record["geo"],
+                    "skinCluster": record["skinCluster"],
+                    "hash": recordHash,
+                },
+            )
+            self.copiedCount += 1
+            return
+
+        self.writtenCount += 1
+        super(UpdatingWeightWriter, self).writeRecord([skData], recordHash=recordHash)
+
+    def close(self):
+        try:
+            super(UpdatingWeightWriter, self).close()
+        finally:
+            self._previous.close()
+
+    def _replaceTarget(self):
+        ## Windows won't replace a file that's still open
+        self._previous.close()
+        super(UpdatingWeightWriter, self)._replaceTarget()
+
+    def _discard(self):
+        self._previous.close()
+        super(UpdatingWeightWriter, self)._discard()
+# </editor-fold>
+
+
+# <editor-fold desc="patches">
+def _fileHash(filepath):
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as infile:
+        for block in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def _fileStamp(filepath):
+    """
+    :return: list of `int` [size, mtime in ns], cheap to check before hashing the whole file
+    """
+    stat = os.stat(filepath)
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _iterBlocks(skData):
+    """
+    :return: generator of (block, startRow, endRow) for each DELTA_BLOCK_VERTICES block of vertex ids in skData
+    """
+    vertexIds = skData.vertexIds
+    start = 0
+    while start < len(vertexIds):
+        block = vertexIds[start] // DELTA_BLOCK_VERTICES
+        end = bisect_left(vertexIds, (block + 1) * DELTA_BLOCK_VERTICES, start)
+        yield block, start, end
+        start = end
+
+
+def blockHashes(skData, quantize=False):
+    """
+    :param quantize: `bool` hash the values as they'd be quantized
+    :return: `dict` of block: `str` hash of the rows in the block, as they'd be stored in a binary file
+    """
+    return {
+        block: hashlib.sha1(_encodeChunk(skData, start, end, quantize=quantize)[2]).hexdigest()
+        for block, start, end in _iterBlocks(skData)
+    }
+
+
+def _headerKey(skData):
+    return tuple(skData.influences), tuple(skData.logicalIndices), skData.maxInf
+
+
+def _emptyLike(skData):
+    return SkinWeightData(
+        skData.geoName,
+        skData.skinCluster,
+        skData.influences,
+        skData.logicalIndices,
+        maxInf=skData.maxInf,
+    )
+
+
+def _addRowRange(target, skData, start, end):
+    first, last = skData.offsets[start], skData.offsets[end]
+    target.addRows(
+        skData.vertexIds[start:end],
+        [o - first for o in skData.offsets[start:end + 1]],
+        skData.columns[first:last],
+        skData.values[first:last],
+    )
+
+
+def _joinChunks(chunks):
+    """
+    :return: `SkinWeightData` with the rows of all the chunks, None if there weren't any chunks
+    """
+    joined = None
+    for x, skData in enumerate(chunks):
+        if not x:
+            joined = skData
+            continue
+        if x == 1:
+            first, joined = joined, _emptyLike(joined)
+            _addRowRange(joined, first, 0, len(first))
+        _addRowRange(joined, skData, 0, len(skData))
+
+    return joined
+
+
+def _patchRecord(base, patch, blocks):
+    """
+    :param blocks: iterable of `int` blocks in patch that replace the ones in base
+    :return: `SkinWeightData` base with the blocks swapped for the patch's rows
+    """
+    blocks = set(blocks)
+    ranges = [(b, base, s, e) for b, s, e in _iterBlocks(base) if b not in blocks]
+    ranges.extend((b, patch, s, e) for b, s, e in _iterBlocks(patch))
+    ranges.sort(key=lambda r: r[0])
+
+    merged = _emptyLike(patch)
+    for _, skData, start, end in ranges:
+        _addRowRange(merged, skData, start, end)
+
+    return merged
+
+
+class DeltaWeightWriter(BinaryWeightWriter):
+    """
+    Writes a patch against a reference file. The reference is hashed per vertex block up front and each record is
+    joined up to compare it, so this holds a skinCluster at a time in memory rather than a chunk.
+    """
+
+    def __init__(
+        self, filepath, reference, compression=None, workers=None, quantize=False
+    ):
+        """
+        :param reference: `str` path to the full file or patch to compare against
+        """
+        if os.path.exists(filepath) and os.path.samefile(filepath, reference):
+            raise ValueError("A patch can't overwrite its own reference file!")
+
+        referenceQuantized = isQuantized(reference)
+        if quantize and not referenceQuantized:
+            raise ValueError("Can't quantize a patch against a float reference file!")
+
+        self.blockCount = 0
+        self.changedBlockCount = 0
+        self._blocks = None
+        self._reference = {}
+        for skData in iterWeights(reference, workers=workers, prefetch=0):
+            self._reference[(skData.geoName, skData.skinCluster)] = (
+                _headerKey(skData),
+                blockHashes(skData, quantize=referenceQuantized),
+            )
+
+        folder = os.path.dirname(os.path.abspath(filepath))
+        try:
+            base = os.path.relpath(os.path.abspath(reference), folder)
+        except ValueError:
+            ## Different drive on windows
+            base = os.path.abspath(reference)
+        self._patch = {
+            "base": base,
+            "baseHash": _fileHash(reference),
+            "baseStamp": _fileStamp(reference),
+        }
+
+        super(DeltaWeightWriter, self).__init__(
+            filepath,
+            compression=compression,
+            workers=workers,
+            quantize=referenceQuantized,
+        )
+
+    def writeRecord(self, chunks, recordHash=None):
+        skData = _joinChunks(chunks)
+        if skData is None:
+            return
+
+        hashes = blockHashes(skData, quantize=self._quantize)
+        self.blockCount += len(hashes)
+        ## The hash is of the whole record, as it'll load, not just the blocks in the patch
+        recordHash = recordHash or contentHash([skData], quantize=self._quantize)
+
+        self._blocks = None
+        reference = self._reference.get((skData.geoName, skData.skinCluster))
+        if reference is not None and reference[0] == _headerKey(skData):
+            referenceHashes = reference[1]
+            self._blocks = sorted(
+                block
+                for block in set(hashes).union(referenceHashes)
+                if hashes.get(block) != referenceHashes.get(block)
+            )
+            if not self._blocks:
+                return
+
+            self.changedBlockCount += len(set(self._blocks).intersection(hashes))
+            patch = _emptyLike(skData)
+            changed = set(self._blocks)
+            for block, start, end in _iterBlocks(skData):
+                if block in changed:
+                    _addRowRange(patch, skData, start, end)
+            skData = patch
+        else:
+            self.changedBlockCount += len(hashes)
+
+        super(DeltaWeightWriter, self).writeRecord([skData], recordHash=recordHash)
+
+    def _flags(self):
+        return super(DeltaWeightWriter, self)._flags() | FLAG_PATCH
+
+    def _indexRecord(self, skData):
+        record = super(DeltaWeightWriter, self)._indexRecord(skData)
+        if self._blocks is not None:
+            record["blocks"] = self._blocks
+
+        return record
+
+    def _indexData(self):
+        index = super(DeltaWeightWriter, self)._indexData()
+        index["patch"] = self._patch
+
+        return index
+
+
+def isQuantized(filepath):
+    """
+    :param filepath: `str` path to an existing weights file
+    :return: `bool` True for a binary file with quantized weights
+    """
+    if detectFormat(filepath) != FORMAT_BINARY:
+        return False
+
+    with open(filepath, "rb") as infile:
+        return bool(_readHeader(infile, filepath)[1] & FLAG_QUANTIZED)
+
+
+def _readPatchIndex(filepath):
+    """
+    :return: `dict` the index of a patch file, None if filepath isn't a patch
+    """
+    if detectFormat(filepath) != FORMAT_BINARY:
+        return
+
+    with open(filepath, "rb") as infile:
+        version, flags = _readHeader(infile, filepath)
+        if not flags & FLAG_PATCH:
+            return
+
+        return _readIndexData(infile)
+
+
+def readPatchChain(filepath):
+    """
+    Follows a patch back through its bases, checking none of them changed since the patch was saved.
+
+    :param filepath: `str` path to a weights file
+    :return: list of `str` paths, the full file first and filepath last. Just filepath if it isn't a patch.
+    """
+    chain = [filepath]
+    while True:
+        index = _readPatchIndex(chain[0])
+        if index is None:
+            return chain
+
+        patch = index["patch"]
+        base = os.path.normpath(
+            os.path.join(os.path.dirname(os.path.abspath(chain[0])), patch["base"])
+        )
+        if not os.path.exists(base):
+            raise IOError(
+                "Base file {} for the patch {} is missing!".format(base, chain[0])
+            )
+        if base in chain:
+            raise IOError("Patch {} has a circular base chain!".format(filepath))
+        ## A multi GB base is only read through to hash it when it looks like it's been touched
+        if (
+            patch.get("baseStamp") != _fileStamp(base)
+            and _fileHash(base) != patch["baseHash"]
+        ):
+            raise IOError(
+                "Base file {} has changed since the patch {} was saved!".format(
+                    base, chain[0]
+                )
+            )
+
+        chain.insert(0, base)
+
+
+def _iterPatched(chain, geoNames=None, vertexIds=None, workers=None):
+    """
+    :param chain: list of `str` paths from readPatchChain()
+    :return: generator of `SkinWeightData` with every patch applied, in the base file order
+    """
+    merged = OrderedDict()
+    for skData in iterWeights(
+        chain[0], geoNames=geoNames, vertexIds=vertexIds, workers=workers, prefetch=0
+    ):
+        merged[(skData.geoName, skData.skinCluster)] = skData
+
+    for filepath in chain[1:]:
+        blocksByRecord = {
+            (r["geo"], r["skinCluster"]): r.get("blocks")
+            for r in _readPatchIndex(filepath)["records"]
+        }
+        for skData in iterBinary(
+            filepath, geoNames=geoNames, vertexIds=vertexIds, workers=workers
+        ):
+            key = (skData.geoName, skData.skinCluster)
+            blocks = blocksByRecord.get(key)
+            if blocks is None or key not in merged:
+                merged[key] = skData
+            else:
+                with u_profiling.phase("apply patch"):
+                    merged[key] = _patchRecord(merged[key], skData, blocks)
+
+    for skData in merged.values():
+        yield skData
+# </editor-fold>
+
+
+def _readHeader(infile, filepath):
+    magic, version, flags, _ = _HEADER.unpack(_readExactly(infile, _HEADER.size))
+    if magic != BINARY_MAGIC:
+        raise IOError("{} is not a binary weights file!".format(filepath))
+    if version > BINARY_VERSION or flags & ~KNOWN_FLAGS:
+        raise IOError(
+            "{} was written by a newer version ({}) of saveSkinWeights!".format(
+                filepath, version
+            )
+        )
+
+    return version, flags
+
+
+def _readIndexData(infile):
+    infile.seek(-_TRAILER.size, os.SEEK_END)
+    indexOffset, indexLength, magic = _TRAILER.unpack(
+        _readExactly(infile, _TRAILER.size)
+    )
+    if magic != INDEX_MAGIC:
+        raise IOError("Weights file index is missing, was the save interrupted?")
+
+    infile.seek(indexOffset)
+    return json.loads(_readExactly(infile, indexLength).decode("utf-8"))
+
+
+def _readIndex(infile):
+    return _readIndexData(infile)["records"]
+
+
+def readIndex(filepath):
+    """
+    :param filepath: `str` path to a binary weights file
+    :return: list of `dict` {"geo", "skinCluster", "offset"} or None if the file has no index
+    """
+    with open(filepath, "rb") as infile:
+        version, flags = _readHeader(infile, filepath)
+        if not flags & FLAG_INDEXED:
+            return
+
+        return _readIndex(infile)
+
+
+def readBinary(filepath, geoNames=None, vertexIds=None, workers=None):
+    """
+    :param workers: `int` decompression threads for compressed files. None lets the pool decide.
+    """
+    return list(
+        iterBinary(filepath, geoNames=geoNames, vertexIds=vertexIds, workers=workers)
+    )
+
+
+def iterBinary(filepath, geoNames=None, vertexIds=None, workers=None):
+    """
+    :param workers: `int` decompression threads for compressed files. None lets the pool decide, 0 for none.
+    :return: generator of `SkinWeightData`
+    """
+    with open(filepath, "rb") as infile:
+        version, flags = _readHeader(infile, filepath)
+        pool = None
+        if flags & FLAG_COMPRESSED and workers != 0:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        try:
+            if flags & FLAG_INDEXED:
+                records = [
+                    r
+                    for r in _readIndex(infile)
+                    if geoNames is None or r["geo"] in geoNames
+                ]
+                if vertexIds is not None and records:
+                    for skData in _iterMappedRows(infile, records, vertexIds, flags, pool):
+                        yield skData
+                    return
+
+                ## Only seek to and decode the records we were asked for
+                for record in records:
+                    infile.seek(record["offset"])
+                    yield _readRecord(infile, vertexIds=vertexIds, flags=flags, pool=pool)
+                return
+
+            while infile.read(1):
+                infile.seek(-1, os.SEEK_CUR)
+                skData = _readRecord(infile, geoNames, vertexIds, flags, pool)
+                if skData is not None:
+                    yield skData
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+
+def _readRecordHeader(infile):
+    geoName = _readStr(infile)
+    skName = _readStr(infile)
+    maxInf, influenceCount = _INFLUENCES.unpack(_readExactly(infile, _INFLUENCES.size))
+    influences = [_readStr(infile) for _ in range(influenceCount)]
+    logicalIndices = _fromBytes("i", _readExactly(infile, 4 * influenceCount))
+
+    return SkinWeightData(
+        geoName,
+        skName,
+        influences,
+        logicalIndices.tolist(),
+        maxInf=maxInf if maxInf != -1 else None,
+    )
+
+
+def _readChunks(infile, flags, skip=False):
+    """
+    :param skip: seek past the chunks without reading them
+    :return: list of (rowCount, weightCount, codec, data) for the rest of the record
+    """
+    compressed = flags & FLAG_COMPRESSED
+    chunkHeader = _ZCHUNK if compressed else _CHUNK
+    chunks = []
+    while True:
+        fields = chunkHeader.unpack(_readExactly(infile, chunkHeader.size))
+        rowCount, weightCount = fields[:2]
+        if not rowCount:
+            break
+
+        if compressed:
+            codec, size = fields[4:]
+        else:
+            codec, size = _CODEC_NONE, _chunkSize(rowCount, weightCount, _valueType(flags))
+
+        if skip:
+            infile.seek(size, os.SEEK_CUR)
+            continue
+
+        chunks.append((rowCount, weightCount, codec, _readExactly(infile, size)))
+
+    return chunks
+
+
+def _readRecord(infile, geoNames=None, vertexIds=None, flags=0, pool=None):
+    with u_profiling.phase("file read"):
+        skData = _readRecordHeader(infile)
+        skip = geoNames is not None and skData.geoName not in geoNames
+        chunks = _readChunks(infile, flags, skip=skip)
+    if skip:
+        return
+
+    with u_profiling.phase("decode"):
+        for rowCount, weightCount, payload in _decompressChunks(chunks, pool):
+            chunkIds, offsets, columns, values = _decodeChunk(
+                payload, rowCount, weightCount, _valueType(flags)
+            )
+            if vertexIds is None:
+                skData.addRows(chunkIds, offsets, columns, values)
+                continue
+
+            for row, vertexId in enumerate(chunkIds):
+                if vertexId in vertexIds:
+                    start, end = offsets[row], offsets[row + 1]
+                    skData.addRow(vertexId, columns[start:end], values[start:end])
+
+    return skData
+
+
+class _MappedArray(object):
+    """
+    Read only view of a little endian array inside the mmapped file. Indexing it only touches that element, and
+    it's a sequence so bisect works on it directly.
+    """
+
+    def __init__(self, buffer, offset, typecode, length):
+        self._buffer = buffer
+        self._offset = offset
+        self._typecode = typecode
+        self._struct = struct.Struct("<" + typecode)
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        return self._struct.unpack_from(
+            self._buffer, self._offset + index * self._struct.size
+        )[0]
+
+    def slice(self, start, end):
+        size = self._struct.size
+        return _fromBytes(
+            self._typecode,
+            self._buffer[self._offset + start * size:self._offset + end * size],
+        )
+
+
+def _addMappedRows(
+    skData, buffer, position, rowCount, weightCount, wanted, valueType="f"
+):
+    """
+    Adds the rows for the wanted vertex ids from an uncompressed chunk starting at buffer[position].
+    A vertex is found through its offset in the chunk when the ids are contiguous, else by bisecting the ids.
+    """
+    chunkIds = _MappedArray(buffer, position, "I", rowCount)
+    offsets = _MappedArray(buffer, position + 4 * rowCount, "I", rowCount + 1)
+    columns = _MappedArray(buffer, position + 8 * rowCount + 4, "H", weightCount)
+    values = _MappedArray(
+        buffer, position + 8 * rowCount + 4 + 2 * weightCount, valueType, weightCount
+    )
+
+    firstId = chunkIds[0]
+    for vertexId in wanted:
+        row = vertexId - firstId
+        if row >= rowCount or chunkIds[row] != vertexId:
+            row = bisect_left(chunkIds, vertexId)
+            if row == rowCount or chunkIds[row] != vertexId:
+                continue
+
+        start, end = offsets[row], offsets[row + 1]
+        rowValues = values.slice(start, end)
+        if valueType == "H":
+            rowValues = _dequantizeRow(rowValues)
+        skData.addRow(vertexId, columns.slice(start, end), rowValues)
+
+
+def _iterMappedRows(infile, records, vertexIds, flags=0, pool=None):
+    """
+    Selected vertex loads. Walks the chunk headers of each record and only decodes the rows for vertexIds.
+    Compressed chunks carry their vertex id range, so only the ones holding wanted vertices get inflated.
+    """
+    wanted = sorted(vertexIds)
+    compressed = flags & FLAG_COMPRESSED
+    valueType = _valueType(flags)
+    buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for record in records:
+            with u_profiling.phase("decode"):
+                infile.seek(record["offset"])
+                skData = _readRecordHeader(infile)
+                position = infile.tell()
+                chunks = []
+                while True:
+                    if compressed:
+                        rowCount, weightCount, firstId, lastId, codec, size = _ZCHUNK.unpack_from(
+                            buffer, position
+                        )
+                        position += _ZCHUNK.size
+                    else:
+                        rowCount, weightCount = _CHUNK.unpack_from(buffer, position)
+                        position += _CHUNK.size
+                        codec, size = _CODEC_NONE, _chunkSize(rowCount, weightCount, valueType)
+                    if not rowCount:
+                        break
+
+                    if not compressed:
+                        chunkIds = _MappedArray(buffer, position, "I", rowCount)
+                        firstId, lastId = chunkIds[0], chunkIds[rowCount - 1]
+
+                    lo = bisect_left(wanted, firstId)
+                    hi = bisect_right(wanted, lastId)
+                    if lo < hi:
+                        chunks.append((rowCount, weightCount, codec, position, size, wanted[lo:hi]))
+                    position += size
+
+                if not compressed:
+                    for rowCount, weightCount, _, start, _, ids in chunks:
+                        _addMappedRows(
+                            skData, buffer, start, rowCount, weightCount, ids, valueType
+                        )
+                else:
+                    payloads = _decompressChunks(
+                        [(c[0], c[1], c[2], buffer[c[3]:c[3] + c[4]]) for c in chunks], pool
+                    )
+                    for chunk, (rowCount, weightCount, payload) in zip(chunks, payloads):
+                        _addMappedRows(
+                            skData, payload, 0, rowCount, weightCount, chunk[5], valueType
+                        )
+
+            yield skData
+    finally:
+        buffer.close()
+# </editor-fold>
@@ -5,6 +5,8 @@ import time
 import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
+from pluginUtils import plugs as u_plugs
+from pluginUtils import profiling as u_profiling
 from pluginUtils import skinCluster as u_skinCluster
 
 kPluginCmdName = "resetSkinCluster"
@@ -15,6 +17,9 @@ class ResetSkinCluster(om2.MPxCommand):
 
     def __init__(self):
         om2.MPxCommand.__init__(self)
+        self.profile = None
+        if not self.hasSyntax():
+            self.syntaxCreator()
 
     def resolve(self):
         ## Resolve the selection and return the skinClusters for the doIt
@@ -22,19 +27,31 @@ class ResetSkinCluster(om2.MPxCommand):
 
         if cmds.ls(sl=True):
             geo = om2.MGlobal.getActiveSelectionList()
-            for x in range(geo.length()):
-                skCls = u_skinCluster.findSkinCluster(
-                    mesh=om2.MObjectHandle(geo.getDependNode(x))
-                )
-                if skCls is not None:
+            for skClsList in u_skinCluster.findSkinClusters(geo).values():
+                for skCls in skClsList:
                     skinClusters.add(skCls.object())
 
         return skinClusters
 
     def doIt(self, args):
+        """
+        :param prf: `str` path to write a json report of where the time went, per phase, with the Maya call counts.
+                    An empty string displays the json instead.
+        """
         # Invoked once when the command is run. If the actions need to be redone Maya will call the redoIt() method
+        self.parseArgs(args)
+        if self.profile is None:
+            self.reset()
+            return
+
+        with u_profiling.Profiler(kPluginCmdName) as profiler:
+            self.reset()
+        self.displayInfo(u_profiling.writeReport(profiler, self.profile))
+
+    def reset(self):
         ## Resolve the selection
-        skinClusters = self.resolve()
+        with u_profiling.phase("resolve selection"):
+            skinClusters = self.resolve()
         if skinClusters.length() == 0:
             self.displayInfo("You must have a valid selection of skinned geometry!")
             return
@@ -46,18 +63,20 @@ class ResetSkinCluster(om2.MPxCommand):
             ## Convert those attributes to MPlugs
             skClsMFnDep = om2.MFnDependencyNode(skinClusters.getDependNode(x))
             bindPrePlug = skClsMFnDep.findPlug("bindPreMatrix", False)
-            matrixPlug = skClsMFnDep.findPlug("matrix", False)
+            skInfo = u_skinCluster.getSkinClusterInfo(
+                om2.MObjectHandle(skinClusters.getDependNode(x))
+            )
 
             ## Find the bindPose node and get it's name
             dagPoseMObj = skClsMFnDep.findPlug("bindPose", False).source().node()
             dagPoseName = om2.MFnDependencyNode(dagPoseMObj).absoluteName()
 
-            ## Get a list of all the valid connected indices in the matrix array now.
-            indices = matrixPlug.getExistingArrayAttributeIndices()
+            ## The valid connected indices in the matrix array and their influences.
             influences = []
-            for idx in indices:
+            for idx, connectedMObj in zip(
+                skInfo.logicalIndices, skInfo.influenceObjects
+            ):
                 ## Get the inverseMatrix plug from the source and put that into the bindPreMatrix
-                connectedMObj = matrixPlug.elementByLogicalIndex(idx).source().node()
                 worldInverseMatrixMFn = om2.MFnDependencyNode(connectedMObj)
                 inverseMtxPlug = worldInverseMatrixMFn.findPlug(
                     "worldInverseMatrix", False
@@ -72,22 +91,25 @@ class ResetSkinCluster(om2.MPxCommand):
                 )
 
                 ## And store the influence on the way through for the bindPose reset
-                nodeMobj = matrixPlug.elementByLogicalIndex(idx).source().node()
-                inf = om2.MFnDependencyNode(nodeMobj)
+                inf = worldInverseMatrixMFn
                 if not inf.hasUniqueName():
-                    infName = om2.MDagPath.getAPathTo(nodeMobj).fullPathName()
+                    infName = om2.MDagPath.getAPathTo(connectedMObj).fullPathName()
                 else:
                     infName = inf.absoluteName()
 
                 influences.append(infName)
 
             ## Set all of the bindPreMatrix now.
-            self.myDGMod.doIt()
+            u_profiling.count("api.newPlugValue", len(influences))
+            with u_profiling.phase("set bindPreMatrix"):
+                self.myDGMod.doIt()
 
             #################################################
             ## Now make sure the bindPose is fixed up or resetBindPose will fail.
             ## Don't know the om2 equiv of this! grrr
-            cmds.dagPose(influences, reset=True, n=dagPoseName)
+            u_profiling.count("cmds.dagPose")
+            with u_profiling.phase("reset bindPose"):
+                cmds.dagPose(influences, reset=True, n=dagPoseName)
 
             self.displayInfo(
                 "Reset: {} in {} secs.".format(skClsMFnDep.name(), time.time() - start)
@@ -102,6 +124,15 @@ class ResetSkinCluster(om2.MPxCommand):
     def isUndoable(self):
         return True
 
+    def parseArgs(self, args):
+        argData = om2.MArgParser(self.syntax, args)
+        if argData.isFlagSet("prf"):
+            self.profile = argData.flagArgumentString("prf", 0)
+
+    def syntaxCreator(self):
+        self.syntax = om2.MSyntax()
+        self.syntax.addFlag("prf", "profile", om2.MSyntax.kString)
+
     @staticmethod
     def cmdCreator():
         return ResetSkinCluster()
@@ -127,6 +158,9 @@ def initializePlugin(mobject):
 
 def uninitializePlugin(mobject):
     mplugin = om2.MFnPlugin(mobject)
+    u_skinCluster.clearSkinClusterInfoCache()
+    u_plugs.clearPlugPathCache()
+    u_plugs.clearPlugAccessorCache()
     try:
         mplugin.deregisterCommand(kPluginCmdName)
         sys.stderr.write(
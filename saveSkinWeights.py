@@ -1,18 +1,17 @@
 #  Copyright (c) 2020.  James B Dunlop
 ###################################################################################
 # The imports and defining the plugin name
+import os
 import sys
 import time
 
 import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
-try:
-    import simplejson as sjson
-except ImportError:
-    print("saveSkinWeights: simplejson not found!")
-
+from pluginUtils import plugs as u_plugs
+from pluginUtils import profiling as u_profiling
 from pluginUtils import skinCluster as u_skinCluster
+from pluginUtils import weightFiles as u_weightFiles
 
 kPluginCmdName = "saveSkinWeights"
 
@@ -22,6 +21,16 @@ class SaveSkinWeights(om2.MPxCommand):
         om2.MPxCommand.__init__(self)
         self.filepath = None
         self.skipZeroWeights = True
+        self.fileFormat = None
+        self.stream = False
+        self.chunkSize = u_weightFiles.CHUNK_ROWS
+        self.compression = None
+        self.quantize = False
+        self.threads = None
+        self.reference = None
+        self.skipUnchanged = False
+        self.profile = None
+        self.memoryBudget = None
 
         if not self.hasSyntax():
             self.syntaxCreator()
@@ -42,23 +51,138 @@ class SaveSkinWeights(om2.MPxCommand):
         """
         :param fp: Path including filename.ext as a string
         :param szw: Store any weights that are 0 in value? Bool
+        :param fmt: `str` "json" or "binary". Defaults to binary for a .skwb fp, else json.
+        :param st: `bool` stream each skinCluster to disk in vertex chunks as it's read, instead of holding
+                   the weights for the whole selection in memory.
+        :param cs: `int` number of vertices per chunk when streaming.
+        :param cmp: `str` compress the binary chunks with "zlib", "lz4" or "zstd". lz4 / zstd need the python
+                    module installed. Chunks are compressed on a thread pool while the weights are being read.
+        :param qt: `bool` store the binary weights as uint16 fixed point. Each weight is within 1/65535 of the
+                   saved value and every vertex loads back normalized to 1.0.
+        :param th: `int` threads encoding / compressing the weights while the next skinCluster is read from
+                   Maya. Defaults to one per core, 0 does it all on the main thread.
+        :param rf: `str` path to an earlier binary save of the same geo. Only the vertex blocks that changed since are
+                   written, as a patch on top of it. loadSkinWeights reads the patch through its chain of bases.
+        :param su: `bool` when saving over an existing binary file, the skinClusters whose weights hash the same as
+                   in that file are copied across as they are instead of being encoded again.
+        :param prf: `str` path to write a json report of where the time went, per phase, with the Maya API call
+                    counts. An empty string displays the json instead.
+        :param mb: `float` megabytes to keep the weights being worked on under. Each skinCluster is read in vertex
+                   chunks sized from its influence count to fit, along with the chunks queued for writing, and
+                   the peak python memory for the run is displayed at the end. Measuring the peak slows the save.
+                   rf / su still join each skinCluster up to compare it.
         USage:
             fp="C:/temp/agathaV01.json"
             cmds.jbdSaveWeights(fp=fp, szw=False)
+            # Compact binary
+            cmds.jbdSaveWeights(fp="C:/temp/agathaV01.skwb", szw=False)
+            # Whole crowd selection with bounded memory
+            cmds.jbdSaveWeights(fp="C:/temp/crowd.skwb", st=True)
+            # Compressed binary
+            cmds.jbdSaveWeights(fp="C:/temp/crowd.skwb", st=True, cmp="zlib")
+            # Smallest binary
+            cmds.jbdSaveWeights(fp="C:/temp/crowd.skwb", st=True, cmp="zlib", qt=True)
+            # Just what changed since the last save
+            cmds.jbdSaveWeights(fp="C:/temp/crowd_fix01.skwb", rf="C:/temp/crowd.skwb")
+            # Rebuild, only re-encode the skinClusters that changed
+            cmds.jbdSaveWeights(fp="C:/temp/crowd.skwb", su=True)
+            # Where does the time go?
+            cmds.jbdSaveWeights(fp="C:/temp/crowd.skwb", prf="C:/temp/saveProfile.json")
+            # On a small farm node, stay under 256 MB
+            cmds.jbdSaveWeights(fp="C:/temp/crowd.skwb", mb=256)
         """
         self.parseArgs(args)
-        geoList = self.resolve()
+        profiler = None
+        with u_profiling.PeakMemory(enabled=self.memoryBudget is not None) as memory:
+            if self.profile is None:
+                self.save()
+            else:
+                with u_profiling.Profiler(kPluginCmdName) as profiler:
+                    self.save()
+
+        if profiler is not None:
+            self.displayInfo(u_profiling.writeReport(profiler, self.profile))
+        if self.memoryBudget is not None:
+            self.displayInfo(memory.summary(self.memoryBudget))
+
+    def save(self):
+        if self.fileFormat not in (
+            None,
+            u_weightFiles.FORMAT_JSON,
+            u_weightFiles.FORMAT_BINARY,
+        ):
+            self.displayError(
+                "Unknown format {}! Use {} or {}".format(
+                    self.fileFormat,
+                    u_weightFiles.FORMAT_JSON,
+                    u_weightFiles.FORMAT_BINARY,
+                )
+            )
+            return
+
+        if self.chunkSize < 1:
+            self.displayError(
+                "Chunk size {} is too small! Use 1 or more vertices".format(self.chunkSize)
+            )
+            return
+
+        if self.compression is not None and (
+            self.compression not in u_weightFiles.availableCompression()
+        ):
+            self.displayError(
+                "Compression {} is not available! Use one of {}".format(
+                    self.compression, u_weightFiles.availableCompression()
+                )
+            )
+            return
+
+        if self.compression is not None or self.quantize:
+            if (
+                self.fileFormat or u_weightFiles.formatFromPath(self.filepath)
+            ) != u_weightFiles.FORMAT_BINARY:
+                self.displayError(
+                    "Compression and quantizing are only supported for binary files!"
+                )
+                return
+
+        if self.reference is not None:
+            if not os.path.isfile(self.reference):
+                self.displayError(
+                    "Reference file {} doesn't exist!".format(self.reference)
+                )
+                return
+            if (
+                self.fileFormat or u_weightFiles.formatFromPath(self.filepath)
+            ) != u_weightFiles.FORMAT_BINARY:
+                self.displayError("Patches are only supported for binary files!")
+                return
+            if os.path.abspath(self.reference) == os.path.abspath(self.filepath):
+                self.displayError("A patch can't overwrite its own reference file!")
+                return
+            if self.quantize and not u_weightFiles.isQuantized(self.reference):
+                self.displayError("Can't quantize a patch against a float reference file!")
+                return
+
+        if self.memoryBudget is not None and (self.reference or self.skipUnchanged):
+            self.displayWarning(
+                "rf / su hold each skinCluster whole to compare it, mb only bounds reading the weights."
+            )
+
+        if self.skipUnchanged and (
+            self.fileFormat or u_weightFiles.formatFromPath(self.filepath)
+        ) != u_weightFiles.FORMAT_BINARY:
+            self.displayWarning(
+                "su=True only skips unchanged skinClusters for binary files, saving them all."
+            )
+
+        with u_profiling.phase("resolve selection"):
+            geoList = self.resolve()
         if geoList is None:
             return
 
         start = time.time()
-        data = u_skinCluster.fetchSkinWeights(
-            geo=geoList, skipZeroWeights=self.skipZeroWeights
-        )
-        if data:
-            with open(self.filepath, "w") as outfile:
-                outfile.write(sjson.dumps(data))
-
+        chunkRows = self.chunkSize if self.stream else None
+        if self.writeSkinWeights(geoList, chunkRows=chunkRows):
             self.displayInfo(
                 "Time to export skinWeights: {}".format(time.time() - start)
             )
@@ -66,6 +190,58 @@ class SaveSkinWeights(om2.MPxCommand):
 
         self.displayError("Nothing to export. Skipping.")
 
+    def writeSkinWeights(self, geoList, chunkRows=None):
+        """
+        Pipelined; the weights are read from Maya here on the main thread while the writer's threads encode,
+        compress and write out the skinClusters / chunks already read.
+        Streaming (a chunkRows) keeps the peak memory to a few chunks no matter how many meshes are selected.
+        A memoryBudget sizes the chunks per skinCluster on top of that, counting the chunks the writer has queued.
+
+        The file is only opened once there's a skinCluster to write, so a save with nothing to export leaves an
+        existing file alone.
+
+        :param chunkRows: `int` vertices per chunk. None reads each skinCluster in one go.
+        :return: `int` number of skinClusters written
+        """
+        skinClustersByGeo = u_skinCluster.findSkinClusters(geoList)
+        if not any(skinClustersByGeo.values()):
+            return 0
+
+        count = 0
+        with u_weightFiles.openWriter(
+            self.filepath,
+            fmt=self.fileFormat,
+            compression=self.compression,
+            workers=self.threads,
+            quantize=self.quantize,
+            reference=self.reference,
+            skipUnchanged=self.skipUnchanged,
+        ) as writer:
+            for chunks in u_skinCluster.iterSkinWeightData(
+                skinClustersByGeo=skinClustersByGeo,
+                skipZeroWeights=self.skipZeroWeights,
+                chunkRows=chunkRows,
+                memoryBudget=self.memoryBudget,
+                heldChunks=writer.heldChunks,
+            ):
+                writer.writeRecord(chunks)
+                count += 1
+
+        if self.reference is not None:
+            self.displayInfo(
+                "Patch holds {} of {} vertex blocks".format(
+                    writer.changedBlockCount, writer.blockCount
+                )
+            )
+        elif isinstance(writer, u_weightFiles.UpdatingWeightWriter):
+            self.displayInfo(
+                "Skipped {} unchanged skinClusters, wrote {}".format(
+                    writer.copiedCount, writer.writtenCount
+                )
+            )
+
+        return count
+
     def isUndoable(self):
         return False
 
@@ -77,6 +253,27 @@ class SaveSkinWeights(om2.MPxCommand):
             self.filepath = argData.flagArgumentString("fp", 0)
         if argData.isFlagSet("szw"):
             self.skipZeroWeights = argData.flagArgumentBool("szw", 0)
+        if argData.isFlagSet("fmt"):
+            self.fileFormat = argData.flagArgumentString("fmt", 0)
+        if argData.isFlagSet("st"):
+            self.stream = argData.flagArgumentBool("st", 0)
+        if argData.isFlagSet("cs"):
+            self.chunkSize = argData.flagArgumentInt("cs", 0)
+        if argData.isFlagSet("cmp"):
+            self.compression = argData.flagArgumentString("cmp", 0) or None
+        if argData.isFlagSet("qt"):
+            self.quantize = argData.flagArgumentBool("qt", 0)
+        if argData.isFlagSet("th"):
+            self.threads = argData.flagArgumentInt("th", 0)
+        if argData.isFlagSet("rf"):
+            self.reference = argData.flagArgumentString("rf", 0) or None
+        if argData.isFlagSet("su"):
+            self.skipUnchanged = argData.flagArgumentBool("su", 0)
+        if argData.isFlagSet("prf"):
+            self.profile = argData.flagArgumentString("prf", 0)
+        if argData.isFlagSet("mb"):
+            ## Held in bytes
+            self.memoryBudget = int(argData.flagArgumentDouble("mb", 0) * 1048576) or None
 
     def syntaxCreator(self):
         self.syntax = om2.MSyntax()
@@ -84,6 +281,16 @@ class SaveSkinWeights(om2.MPxCommand):
         self.syntax.setMaxObjects(2)
         self.syntax.addFlag("fp", "filepath", om2.MSyntax.kString)
         self.syntax.addFlag("szw", "skipZeroWeights", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("fmt", "format", om2.MSyntax.kString)
+        self.syntax.addFlag("st", "stream", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("cs", "chunkSize", om2.MSyntax.kLong)
+        self.syntax.addFlag("cmp", "compression", om2.MSyntax.kString)
+        self.syntax.addFlag("qt", "quantize", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("th", "threads", om2.MSyntax.kLong)
+        self.syntax.addFlag("rf", "reference", om2.MSyntax.kString)
+        self.syntax.addFlag("su", "skipUnchanged", om2.MSyntax.kBoolean)
+        self.syntax.addFlag("prf", "profile", om2.MSyntax.kString)
+        self.syntax.addFlag("mb", "memoryBudget", om2.MSyntax.kDouble)
 
     @staticmethod
     def cmdCreator():
@@ -119,6 +326,9 @@ def initializePlugin(mobject):
 # Uninitialize the script plug-in
 def uninitializePlugin(mobject):
     mplugin = om2.MFnPlugin(mobject)
+    u_skinCluster.clearSkinClusterInfoCache()
+    u_plugs.clearPlugPathCache()
+    u_plugs.clearPlugAccessorCache()
     try:
         mplugin.deregisterCommand(kPluginCmdName)
         sys.stderr.write(
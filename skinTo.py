@@ -5,6 +5,8 @@ import time
 import maya.api.OpenMaya as om2
 import maya.cmds as cmds
 
+from pluginUtils import plugs as u_plugs
+from pluginUtils import profiling as u_profiling
 from pluginUtils import skinCluster as u_skinCluster
 
 kPluginCmdName = "skinTo"
@@ -26,6 +28,7 @@ class SkinTo(om2.MPxCommand):
         self.byUVSpace = SkinTo.default_byUVSpace
         self.uvSpace = SkinTo.default_uvSpace
         self.surfaceAssociation = SkinTo.default_surfaceAssociation
+        self.profile = None
         if not self.hasSyntax():
             self.syntaxCreator()
 
@@ -41,8 +44,19 @@ class SkinTo(om2.MPxCommand):
                          and destination UV sets specified.
         @:param surfaceAssociation: The surfaceAssociation flag controls how the weights are transferred between the
                                 surfaces: "closestPoint", "rayCast", or "closestComponent". The default is closestComponent.
+        @:param profile: path to write a json report of where the time went, per phase, with the Maya call counts.
+                         An empty string displays the json instead.
         """
         self.parseArgs(args)
+        if self.profile is None:
+            self.transfer()
+            return
+
+        with u_profiling.Profiler(kPluginCmdName) as profiler:
+            self.transfer()
+        self.displayInfo(u_profiling.writeReport(profiler, self.profile))
+
+    def transfer(self):
         self.displayInfo("maxInfluences: {}".format(self.maxInfluences))
         self.displayInfo("byUVSpace: {}".format(self.byUVSpace))
         self.displayInfo("surfaceAssociation: {}".format(self.surfaceAssociation))
@@ -50,8 +64,9 @@ class SkinTo(om2.MPxCommand):
 
         start = time.time()
         mySel = om2.MSelectionList()
-        for eachMesh in cmds.ls(sl=True, long=True):
-            mySel.add(eachMesh)
+        with u_profiling.phase("resolve selection"):
+            for eachMesh in cmds.ls(sl=True, long=True):
+                mySel.add(eachMesh)
 
         ## Bail out if bad selection
         if mySel.length() < 2:
@@ -60,18 +75,21 @@ class SkinTo(om2.MPxCommand):
             )
             return
 
+        # Find the skinClusters for the whole selection in one go
+        skinClustersByGeo = u_skinCluster.findSkinClusters(mySel)
+
         # Find the skinCluster and the influences we need to bind.
         sourceMObj = mySel.getDependNode(0)
-        sourceMObjH = om2.MObjectHandle(sourceMObj)
         sourceMFnDep = om2.MFnDependencyNode(sourceMObj)
-        sourceSkCls = u_skinCluster.findSkinCluster(sourceMObjH)
+        sourceSkCls = self._firstSkinCluster(skinClustersByGeo, sourceMObj)
         if sourceSkCls is None:
             self.displayInfo(
                 "No valid skinCluster could be found on {}".format(sourceMFnDep.name())
             )
             return
 
-        bindInfluences = u_skinCluster.findInfluences(sourceSkCls)
+        with u_profiling.phase("find influences"):
+            bindInfluences = u_skinCluster.findInfluences(sourceSkCls)
 
         ## Now bind each mesh to these influences
         for x in range(mySel.length()):
@@ -79,9 +97,8 @@ class SkinTo(om2.MPxCommand):
             if x == 0:
                 continue
             destMObj = mySel.getDependNode(x)
-            destMObjH = om2.MObjectHandle(destMObj)
             destMFnDep = om2.MFnDependencyNode(destMObj)
-            skCls = u_skinCluster.findSkinCluster(destMObjH)
+            skCls = self._firstSkinCluster(skinClustersByGeo, destMObj)
             if skCls is not None:
                 self.displayInfo(
                     "Found a skinCluster on {}. Skipping bind!".format(
@@ -91,37 +108,53 @@ class SkinTo(om2.MPxCommand):
             else:
                 ## Here we have to use CMDS to create the darn skinCluster and xfer!
                 ## Note happy mixing cmds and om2 but short of writing a full om2 bind I'm sticking to this for now.
-                cmds.skinCluster(
-                    bindInfluences + [destMFnDep.name()],
-                    name="{}_skCls".format(destMFnDep.name()),
-                    before=True,
-                    maximumInfluences=self.maxInfluences,
-                )
+                u_profiling.count("cmds.skinCluster")
+                with u_profiling.phase("bind"):
+                    cmds.skinCluster(
+                        bindInfluences + [destMFnDep.name()],
+                        name="{}_skCls".format(destMFnDep.name()),
+                        before=True,
+                        maximumInfluences=self.maxInfluences,
+                    )
 
             ## Now copy the weights over
             srcSkCls_MFnDep = om2.MFnDependencyNode(sourceSkCls.object())
-            if self.byUVSpace:
-                cmds.copySkinWeights(
-                    sourceSkin=srcSkCls_MFnDep.name(),
-                    destinationSkin="{}_skCls".format(destMFnDep.name()),
-                    sa=self.surfaceAssociation,
-                    noMirror=True,
-                    ia=["closestJoint", "label",],
-                    uvSpace=self.uvSpace,
-                )
-            else:
-                cmds.copySkinWeights(
-                    sourceSkin=srcSkCls_MFnDep.name(),
-                    destinationSkin="{}_skCls".format(destMFnDep.name()),
-                    sa=self.surfaceAssociation,
-                    noMirror=True,
-                    ia=["closestJoint", "label",],
-                )
+            u_profiling.count("cmds.copySkinWeights")
+            with u_profiling.phase("copy weights"):
+                if self.byUVSpace:
+                    cmds.copySkinWeights(
+                        sourceSkin=srcSkCls_MFnDep.name(),
+                        destinationSkin="{}_skCls".format(destMFnDep.name()),
+                        sa=self.surfaceAssociation,
+                        noMirror=True,
+                        ia=["closestJoint", "label",],
+                        uvSpace=self.uvSpace,
+                    )
+                else:
+                    cmds.copySkinWeights(
+                        sourceSkin=srcSkCls_MFnDep.name(),
+                        destinationSkin="{}_skCls".format(destMFnDep.name()),
+                        sa=self.surfaceAssociation,
+                        noMirror=True,
+                        ia=["closestJoint", "label",],
+                    )
 
             self.displayInfo(
                 "SkinTo complete! Time taken: {}secs".format(time.time() - start)
             )
 
+    @staticmethod
+    def _firstSkinCluster(skinClustersByGeo, geoMObj):
+        """
+        :param skinClustersByGeo: `OrderedDict` from u_skinCluster.findSkinClusters()
+        :return: `MObjectHandle` of the skinCluster nearest the shape, or None
+        """
+        skinClusters = skinClustersByGeo.get(
+            om2.MDagPath.getAPathTo(geoMObj).fullPathName()
+        )
+        if skinClusters:
+            return skinClusters[0]
+
     def isUndoable(self):
         return False
 
@@ -142,6 +175,8 @@ class SkinTo(om2.MPxCommand):
             self.uvSpace[0] = argData.flagArgumentString("uv1", 0)
         if argData.isFlagSet("uv2"):
             self.uvSpace[1] = argData.flagArgumentString("uv2", 0)
+        if argData.isFlagSet("prf"):
+            self.profile = argData.flagArgumentString("prf", 0)
 
     @staticmethod
     def cmdCreator():
@@ -156,6 +191,7 @@ class SkinTo(om2.MPxCommand):
         self.syntax.addFlag("sa", "surfaceAssociation", om2.MSyntax.kString)
         self.syntax.addFlag("uv1", "UVSpace1", om2.MSyntax.kString)
         self.syntax.addFlag("uv2", "UVSpace2", om2.MSyntax.kString)
+        self.syntax.addFlag("prf", "profile", om2.MSyntax.kString)
 
 
 def maya_useNewAPI():
@@ -184,6 +220,9 @@ def initializePlugin(mobject):
 
 def uninitializePlugin(mobject):
     mplugin = om2.MFnPlugin(mobject)
+    u_skinCluster.clearSkinClusterInfoCache()
+    u_plugs.clearPlugPathCache()
+    u_plugs.clearPlugAccessorCache()
     try:
         mplugin.deregisterCommand(kPluginCmdName)
         sys.stderr.write(
@@ -0,0 +1,51 @@
+#  Copyright (c) 2020.  James B Dunlop
+import math
+import os
+import random
+import sys
+import unittest
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pluginUtils import weightFiles as u_weightFiles
+
+
+class TestQuantize(unittest.TestCase):
+    def _randomRows(self, rowCount, seed):
+        """
+        :return: (`array` offsets, `array` values) of rowCount normalized vertices with 1 - 8 weights each
+        """
+        rand = random.Random(seed)
+        offsets = array("I", [0])
+        values = array("d")
+        for _ in range(rowCount):
+            row = [rand.random() ** 3 for _ in range(rand.randint(1, 8))]
+            total = math.fsum(row)
+            values.extend(v / total for v in row)
+            offsets.append(len(values))
+
+        return offsets, values
+
+    def test_roundTrip(self):
+        for seed in range(20):
+            offsets, values = self._randomRows(2000, seed)
+            quantized = u_weightFiles._quantizeRows(offsets, values, 0, len(offsets) - 1)
+            loaded = u_weightFiles._dequantizeRows(offsets, quantized)
+
+            self.assertEqual(len(loaded), len(values))
+            for r in range(len(offsets) - 1):
+                start, end = offsets[r], offsets[r + 1]
+                row = loaded[start:end]
+                self.assertEqual(math.fsum(row), 1.0)
+                error = max(abs(a - b) for a, b in zip(row, values[start:end]))
+                self.assertLessEqual(error, u_weightFiles.QUANTIZE_MAX_ERROR)
+
+    def test_emptyVertex(self):
+        offsets = array("I", [0, 2])
+        quantized = u_weightFiles._quantizeRows(offsets, array("d", [0.0, 0.0]), 0, 1)
+        self.assertEqual(list(u_weightFiles._dequantizeRows(offsets, quantized)), [0.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
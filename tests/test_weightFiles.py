@@ -0,0 +1,132 @@
+#  Copyright (c) 2020.  James B Dunlop
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pluginUtils import weightFiles as u_weightFiles
+from pluginUtils.weightData import SkinWeightData
+
+
+def _weights(geoName, rowCount, seed=0):
+    data = SkinWeightData(geoName, geoName + "_skCls", ["a", "b", "c"], [0, 1, 2], maxInf=2)
+    for vertexId in range(rowCount):
+        first = (vertexId + seed) % 3
+        data.addRow(vertexId, [first, (first + 1) % 3], [0.75, 0.25])
+
+    return data
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _raisingChunks(self):
+        yield _weights("geo", 10, seed=1)
+        raise RuntimeError("Failed part way through the save")
+
+    def test_failedSaveKeepsFile(self):
+        for ext, skipUnchanged in ((".json", False), (".skwb", False), (".skwb", True)):
+            filepath = os.path.join(self.folder, "weights" + ext)
+            with u_weightFiles.openWriter(filepath) as writer:
+                writer.writeRecord([_weights("geo", 10)])
+            with open(filepath, "rb") as infile:
+                previous = infile.read()
+
+            with self.assertRaises(RuntimeError):
+                with u_weightFiles.openWriter(filepath, skipUnchanged=skipUnchanged) as writer:
+                    writer.writeRecord([_weights("other", 5)])
+                    writer.writeRecord(self._raisingChunks())
+
+            with open(filepath, "rb") as infile:
+                self.assertEqual(infile.read(), previous)
+            self.assertEqual(os.listdir(self.folder), [os.path.basename(filepath)])
+            os.remove(filepath)
+
+
+def _randomWeights(geoName, rowCount, seed):
+    rand = random.Random(seed)
+    influences = ["joint{}".format(i) for i in range(12)]
+    data = SkinWeightData(geoName, geoName + "_skCls", influences, range(12), maxInf=4)
+    for vertexId in range(rowCount):
+        columns = sorted(rand.sample(range(12), rand.randint(1, 4)))
+        values = [rand.random() ** 4 for _ in columns]
+        total = sum(values)
+        data.addRow(vertexId, columns, [v / total for v in values])
+
+    return data
+
+
+class TestQuantizedHash(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.folder, "weights.skwb")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_loadedWeightsMatchTheirHash(self):
+        with u_weightFiles.openWriter(self.filepath, quantize=True) as writer:
+            for seed, geoName in enumerate(("geoA", "geoB")):
+                writer.writeRecord([_randomWeights(geoName, 5000, seed)])
+        fileHashes = u_weightFiles.readHashes(self.filepath)
+
+        ## What a load sets on the skinClusters, then a su save of them straight back
+        loaded = list(u_weightFiles.iterWeights(self.filepath))
+        for skData in loaded:
+            self.assertEqual(
+                u_weightFiles.contentHash([skData], quantize=True),
+                fileHashes[(skData.geoName, skData.skinCluster)],
+            )
+
+        with u_weightFiles.openWriter(self.filepath, quantize=True, skipUnchanged=True) as writer:
+            for skData in loaded:
+                writer.writeRecord([skData])
+        self.assertEqual(writer.copiedCount, 2)
+        self.assertEqual(writer.writtenCount, 0)
+
+
+class TestPatchChain(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.basePath = os.path.join(self.folder, "base.skwb")
+        self.patchPath = os.path.join(self.folder, "patch.skwb")
+        with u_weightFiles.openWriter(self.basePath) as writer:
+            writer.writeRecord([_weights("geo", 3000)])
+        with u_weightFiles.openWriter(self.patchPath, reference=self.basePath) as writer:
+            writer.writeRecord([_weights("geo", 3000, seed=1)])
+
+        self.hashed = []
+        self._fileHash = u_weightFiles._fileHash
+        u_weightFiles._fileHash = lambda filepath: self.hashed.append(filepath) or self._fileHash(filepath)
+
+    def tearDown(self):
+        u_weightFiles._fileHash = self._fileHash
+        shutil.rmtree(self.folder)
+
+    def test_untouchedBaseIsNotHashed(self):
+        self.assertEqual(u_weightFiles.readPatchChain(self.patchPath), [self.basePath, self.patchPath])
+        self.assertEqual(self.hashed, [])
+
+    def test_touchedBaseIsHashed(self):
+        stat = os.stat(self.basePath)
+        os.utime(self.basePath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(u_weightFiles.readPatchChain(self.patchPath), [self.basePath, self.patchPath])
+        self.assertEqual(self.hashed, [self.basePath])
+
+    def test_changedBaseRaises(self):
+        with u_weightFiles.openWriter(self.basePath) as writer:
+            writer.writeRecord([_weights("geo", 3000, seed=2)])
+        with self.assertRaises(IOError):
+            u_weightFiles.readPatchChain(self.patchPath)
+
+
+if __name__ == "__main__":
+    unittest.main()